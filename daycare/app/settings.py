@@ -38,11 +38,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primeiro da lista para medir a requisição inteira (daycare/metrics.py)
+    'daycare.metrics.MetricsMiddleware',
+    'daycare.slowlog.SlowQueryMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Confere a versão dos dados de referência (daycare/refdata.py)
+    'daycare.refdata.ReferenceCacheMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -74,6 +79,18 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Transações IMMEDIATE pegam o lock de escrita no BEGIN e esperam na fila (timeout)
+            # em vez de falhar com "database is locked" ao promover um lock de leitura.
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+            # WAL permite leituras simultâneas enquanto um caixa grava.
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+        },
+        'TEST': {
+            # Banco em arquivo para que os testes de concorrência usem conexões reais entre threads.
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
@@ -115,6 +132,79 @@ USE_L10N = True
 
 STATIC_URL = "/static/"
 
+# Destino do collectstatic, de onde os arquivos são servidos por daycare.assets.serve_static
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        # Sem hash nos nomes; o perfil de produção troca pelo manifesto pré-comprimido
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+# Email (lembretes de agendamento)
+# https://docs.djangoproject.com/en/5.2/topics/email/
+
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
+DEFAULT_FROM_EMAIL = 'Pet Maniacos <contato@petmaniacos.com.br>'
+
+# Métricas (/metrics)
+# Com vários workers, METRICS_DIR é a pasta onde cada processo grava as suas métricas;
+# None exporta só o processo atual. Com METRICS_TOKEN o coletor se autentica por Bearer.
+
+METRICS_DIR = None
+
+METRICS_TOKEN = None
+
+# Cache das notas já renderizadas em PDF (daycare/note_pdfs.py)
+
+NOTE_PDF_CACHE_DIR = BASE_DIR / 'note_pdf_cache'
+
+# Cópias de segurança do banco (daycare/backup.py)
+# python manage.py backup_database grava uma cópia em BACKUP_DIR e mantém as BACKUP_KEEP mais recentes.
+
+BACKUP_DIR = BASE_DIR / 'backups'
+
+BACKUP_KEEP = 7
+
+# Consultas lentas (daycare/slowlog.py)
+# Consultas acima de SLOW_QUERY_MS vão, com o plano, para um log rotativo por processo em
+# SLOW_QUERY_LOG.<pid>. Relatório: python manage.py slow_queries. None desliga o registro.
+
+SLOW_QUERY_MS = 100
+
+SLOW_QUERY_LOG = BASE_DIR / 'slow_queries.log'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'slow_queries': {
+            'class': 'daycare.slowlog.ProcessFileHandler',
+            'filename': SLOW_QUERY_LOG,
+            'maxBytes': 5 * 1024 * 1024,
+            'backupCount': 5,
+            'encoding': 'utf-8',
+            'delay': True,
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'daycare.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
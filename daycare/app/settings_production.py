@@ -0,0 +1,92 @@
+"""
+Perfil de produção. Uso: DJANGO_SETTINGS_MODULE=app.settings_production
+
+Parte de app/settings.py e troca o que só faz sentido em desenvolvimento. Variáveis de
+ambiente: DJANGO_SECRET_KEY (obrigatória), DJANGO_ALLOWED_HOSTS (separadas por vírgula),
+DJANGO_EMAIL_HOST (obrigatória), DJANGO_EMAIL_PORT, DJANGO_EMAIL_HOST_USER,
+DJANGO_EMAIL_HOST_PASSWORD, DJANGO_METRICS_DIR e DJANGO_METRICS_TOKEN.
+Para medir a inicialização e o custo por requisição: `python manage.py bench_startup`.
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES, STORAGES, TEMPLATES
+
+
+def required_env(name):
+    value = os.environ.get(name)
+    if not value:
+        raise ImproperlyConfigured(f'Defina a variável de ambiente {name} para usar o perfil de produção.')
+    return value
+
+
+DEBUG = False
+
+SECRET_KEY = required_env('DJANGO_SECRET_KEY')
+
+ALLOWED_HOSTS = os.environ.get('DJANGO_ALLOWED_HOSTS', 'localhost').split(',')
+
+# Conexões persistentes: evita abrir o SQLite (e rodar o init_command) a cada requisição
+DATABASES = {
+    'default': {
+        **DATABASES['default'],
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+    },
+}
+
+# Templates compilados uma vez por processo
+TEMPLATES = [
+    {
+        **TEMPLATES[0],
+        'APP_DIRS': False,
+        'OPTIONS': {
+            **TEMPLATES[0]['OPTIONS'],
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
+        },
+    },
+]
+
+# Cache local do processo; as sessões são lidas do cache e gravadas também no banco
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'petmaniacos',
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Nomes com hash + versões .gz/.br geradas no collectstatic (ver daycare/assets.py)
+STORAGES = {
+    **STORAGES,
+    'staticfiles': {
+        'BACKEND': 'daycare.assets.PrecompressedManifestStaticFilesStorage',
+    },
+}
+
+SESSION_COOKIE_SECURE = True
+CSRF_COOKIE_SECURE = True
+
+# Lembretes por SMTP; em desenvolvimento os emails só aparecem no console
+EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+EMAIL_HOST = required_env('DJANGO_EMAIL_HOST')
+EMAIL_PORT = int(os.environ.get('DJANGO_EMAIL_PORT', 587))
+EMAIL_HOST_USER = os.environ.get('DJANGO_EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.environ.get('DJANGO_EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = True
+EMAIL_TIMEOUT = 30
+
+# Métricas somadas entre os workers; a pasta deve ser limpa a cada deploy
+METRICS_DIR = os.environ.get('DJANGO_METRICS_DIR', str(BASE_DIR / 'metrics'))
+
+METRICS_TOKEN = os.environ.get('DJANGO_METRICS_TOKEN')
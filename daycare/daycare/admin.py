@@ -1,18 +1,69 @@
-from django.contrib import admin
-from .models import Tutor, Pet, Service, State, City, Scheduling, Note
+from django.contrib import admin, messages
+from .models import (
+    ArchivedNote, ArchivedScheduling, Branch, BranchMembership, Tutor, Pet, Service, State, City, Scheduling,
+    SchedulingSeries, Note, Job, Reminder, DemandForecast, TutorDuplicate, PetDuplicate,
+)
+from .duplicates import merge_pets, merge_tutors
+from .refdata import cache as reference_cache, cached
+from .search import contact_condition
+
+
+class ReferenceFieldListFilter(admin.RelatedFieldListFilter):
+    """Filtro lateral por estado, cidade ou serviço com as opções tiradas do cache (refdata.py)."""
+
+    def field_choices(self, field, request, model_admin):
+        return [(obj.pk, str(obj)) for obj in cached(field.related_model._default_manager.all())]
+
+
+def reference_column(field_name, description):
+    """Coluna da listagem com o nome do estado ou da cidade lido do cache, sem JOIN."""
+    def column(self, obj):
+        pk = getattr(obj, f'{field_name}_id')
+        related = reference_cache.get(obj._meta.get_field(field_name).related_model, pk) if pk else None
+        return self.get_empty_value_display() if related is None else str(related)
+    column.short_description = description
+    column.admin_order_field = field_name
+    return column
+
+
+@admin.register(Branch)
+class BranchAdmin(admin.ModelAdmin):
+    list_display = ('name', 'address')
+    search_fields = ('name',)
+
+
+@admin.register(BranchMembership)
+class BranchMembershipAdmin(admin.ModelAdmin):
+    list_display = ('user', 'branch')
+    list_select_related = ('user', 'branch')
+    list_filter = ('branch',)
 
 
 @admin.register(Tutor)
 class TutorAdmin(admin.ModelAdmin):
-    list_display = ('name', 'cpf', 'state', 'city', 'email')
-    search_fields = ('name', 'cpf', 'email')
-    list_filter = ('state',)
+    list_display = ('name', 'cpf', 'state_name', 'city_name', 'email', 'branch')
+    list_select_related = ('branch',)
+    search_fields = ('^name', '^email')
+    list_filter = ('branch', ('state', ReferenceFieldListFilter))
+
+    state_name = reference_column('state', 'Estado')
+    city_name = reference_column('city', 'Cidade')
+
+    def get_search_results(self, request, queryset, search_term):
+        # CPF e telefone pelas colunas só com dígitos, com o índice; outros textos pelo nome e email
+        contact = contact_condition(search_term.strip())
+        if contact is not None:
+            return queryset.filter(contact), False
+        return super().get_search_results(request, queryset, search_term)
 
 
 @admin.register(Pet)
 class PetAdmin(admin.ModelAdmin):
-    list_display = ('name', 'species', 'race', 'get_sex', 'tutor')
-    list_filter = ('sex',)
+    list_display = ('name', 'species', 'race', 'get_sex', 'tutor', 'branch')
+    list_select_related = ('tutor', 'branch')
+    search_fields = ('^name', '^tutor__name')
+    list_filter = ('branch', 'sex')
+    autocomplete_fields = ('tutor',)
 
     def get_sex(self, obj):
         return obj.get_sex_display()
@@ -21,7 +72,9 @@ class PetAdmin(admin.ModelAdmin):
 
 @admin.register(Service)
 class ServiceAdmin(admin.ModelAdmin):
-    list_display = ('name', 'description', 'price')
+    list_display = ('name', 'description', 'price', 'branch')
+    list_select_related = ('branch',)
+    list_filter = ('branch',)
 
 
 @admin.register(State)
@@ -31,27 +84,171 @@ class StateAdmin(admin.ModelAdmin):
 
 @admin.register(City)
 class CityAdmin(admin.ModelAdmin):
-    list_display = ('name', 'state')
+    list_display = ('name', 'state_name')
+
+    state_name = reference_column('state', 'Estado')
 
 
 @admin.register(Scheduling)
 class SchedulingAdmin(admin.ModelAdmin):
-    list_display = ('id', 'pet', 'tutor', 'date_scheduling', 'gross_total_value', 'percentage_discount', 'total_value')
+    list_display = ('id', 'pet', 'tutor', 'date_scheduling', 'status', 'gross_total_value', 'percentage_discount', 'total_value')
+    list_select_related = ('pet', 'tutor')
+    list_filter = ('branch', 'status')
+    autocomplete_fields = ('tutor', 'pet')
     filter_horizontal = ('services',)
     readonly_fields = ('gross_total_value', 'total_value')
+    actions = ('mark_as_paid', 'issue_notes', 'reprice')
+
+    def save_related(self, request, form, formsets, change):
+        # Os serviços só estão gravados depois do save_related; o save() do modelo não recalcula,
+        # então o preço é recalculado uma única vez aqui.
+        super().save_related(request, form, formsets, change)
+        Scheduling.objects.filter(pk=form.instance.pk).reprice()
+
+    @admin.action(description='Marcar como pago', permissions=['change'])
+    def mark_as_paid(self, request, queryset):
+        updated = queryset.mark_as_paid()
+        self.message_user(request, f"{updated} agendamento(s) marcado(s) como pago(s).", messages.SUCCESS)
+
+    @admin.action(description='Emitir notas de serviço', permissions=['add_note'])
+    def issue_notes(self, request, queryset):
+        notes = queryset.issue_notes()
+        self.message_user(request, f"{len(notes)} nota(s) emitida(s).", messages.SUCCESS)
+
+    @admin.action(description='Recalcular valores', permissions=['change'])
+    def reprice(self, request, queryset):
+        updated = queryset.reprice()
+        self.message_user(request, f"{updated} agendamento(s) recalculado(s).", messages.SUCCESS)
+
+    def has_add_note_permission(self, request):
+        return request.user.has_perm('daycare.add_note')
 
-    def save_model(self, request, obj, form, change):
-        super().save_model(request, obj, form, change)
-        obj.calculate_values()
-        obj.save()
+
+@admin.register(SchedulingSeries)
+class SchedulingSeriesAdmin(admin.ModelAdmin):
+    list_display = ('id', 'pet', 'tutor', 'get_weekdays_display', 'start_date', 'end_date', 'expanded_until')
+    list_select_related = ('pet', 'tutor')
+    autocomplete_fields = ('tutor', 'pet')
+    filter_horizontal = ('services',)
+    readonly_fields = ('expanded_until',)
 
     def save_related(self, request, form, formsets, change):
+        # A expansão precisa dos serviços já gravados
         super().save_related(request, form, formsets, change)
-        obj = form.instance
-        obj.calculate_values()
-        obj.save()
+        form.instance.expand()
+
+    @admin.display(description='Dias da Semana')
+    def get_weekdays_display(self, obj):
+        return obj.get_weekdays_display()
 
 
 @admin.register(Note)
-class NoteAdmin(admin.ModelAdmin):  
-    list_display = ('note_number', 'scheduling', 'issue_date')
+class NoteAdmin(admin.ModelAdmin):
+    list_display = ('note_number', 'branch', 'branch_number', 'scheduling', 'issue_date')
+    list_select_related = ('scheduling__pet', 'branch')
+    list_filter = ('branch',)
+
+    # Notas só são emitidas pelo NoteManager, que reserva o número na sequência
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedScheduling)
+class ArchivedSchedulingAdmin(admin.ModelAdmin):
+    list_display = ('id', 'pet', 'tutor', 'date_scheduling', 'total_value', 'branch', 'archived_at')
+    list_select_related = ('pet', 'tutor', 'branch')
+    list_filter = ('branch',)
+    search_fields = ('^pet__name', '^tutor__name')
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedNote)
+class ArchivedNoteAdmin(admin.ModelAdmin):
+    list_display = ('note_number', 'branch', 'branch_number', 'scheduling', 'issue_date')
+    list_select_related = ('scheduling__pet', 'branch')
+    list_filter = ('branch',)
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DemandForecast)
+class DemandForecastAdmin(admin.ModelAdmin):
+    list_display = ('date', 'service', 'branch', 'expected', 'booked', 'generated_at')
+    list_select_related = ('service', 'branch')
+    list_filter = ('branch',)
+    date_hierarchy = 'date'
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class DuplicateCandidateAdmin(admin.ModelAdmin):
+    """Revisão dos pares encontrados por duplicates.py: mesclar ou marcar como não duplicado."""
+    list_display = ('first', 'second', 'score_display', 'reasons', 'status', 'found_at')
+    list_select_related = ('first', 'second')
+    list_filter = ('status',)
+    ordering = ('-score',)
+    readonly_fields = ('first', 'second', 'score', 'reasons', 'found_at')
+    actions = ('merge', 'dismiss')
+    merge_function = None
+
+    def get_queryset(self, request):
+        # Pares com um cadastro excluído somem até a próxima verificação em lote
+        return super().get_queryset(request).filter(first__deleted_at__isnull=True, second__deleted_at__isnull=True)
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.display(description='Semelhança', ordering='score')
+    def score_display(self, obj):
+        return f'{obj.score:.0%}'
+
+    @admin.action(description='Mesclar (mantém o cadastro mais antigo)', permissions=['change'])
+    def merge(self, request, queryset):
+        merged = 0
+        for candidate in queryset.filter(status='pending').select_related('first', 'second'):
+            # Uma mesclagem anterior da mesma seleção pode ter apagado este par
+            if not self.model.objects.filter(pk=candidate.pk).exists():
+                continue
+            try:
+                self.merge_function(candidate.first, candidate.second)
+            except ValueError as error:
+                self.message_user(request, f'{candidate}: {error}', messages.ERROR)
+                continue
+            merged += 1
+        self.message_user(request, f"{merged} cadastro(s) mesclado(s).", messages.SUCCESS)
+
+    @admin.action(description='Marcar como não duplicado', permissions=['change'])
+    def dismiss(self, request, queryset):
+        updated = queryset.update(status='dismissed')
+        self.message_user(request, f"{updated} par(es) marcado(s) como não duplicado(s).", messages.SUCCESS)
+
+
+@admin.register(TutorDuplicate)
+class TutorDuplicateAdmin(DuplicateCandidateAdmin):
+    merge_function = staticmethod(merge_tutors)
+
+
+@admin.register(PetDuplicate)
+class PetDuplicateAdmin(DuplicateCandidateAdmin):
+    merge_function = staticmethod(merge_pets)
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'progress', 'attempts', 'run_at', 'finished_at')
+    list_filter = ('status', 'name')
+    readonly_fields = ('progress', 'result', 'error', 'attempts', 'worker', 'started_at', 'heartbeat_at', 'finished_at')
+
+
+@admin.register(Reminder)
+class ReminderAdmin(admin.ModelAdmin):
+    list_display = ('scheduling', 'email', 'status', 'sent_at')
+    list_select_related = ('scheduling__pet',)
+    list_filter = ('status',)
@@ -1,6 +1,23 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate, post_save, pre_migrate
 
 
 class DaycareConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'daycare'
+
+    def ready(self):
+        from . import changelog, counters, duplicates, refdata, versions
+        from .models import Pet, Tutor
+        # Os triggers saem durante as migrações e voltam ao final
+        pre_migrate.connect(changelog.drop_triggers, sender=self)
+        pre_migrate.connect(versions.drop_triggers, sender=self)
+        pre_migrate.connect(counters.drop_triggers, sender=self)
+        pre_migrate.connect(refdata.drop_triggers, sender=self)
+        post_migrate.connect(changelog.install_triggers, sender=self)
+        post_migrate.connect(versions.install_triggers, sender=self)
+        post_migrate.connect(counters.install_triggers, sender=self)
+        post_migrate.connect(refdata.install_triggers, sender=self)
+        # Possíveis duplicados são procurados a cada cadastro ou alteração
+        post_save.connect(duplicates.tutor_saved, sender=Tutor)
+        post_save.connect(duplicates.pet_saved, sender=Pet)
@@ -0,0 +1,68 @@
+"""
+Arquivamento de agendamentos antigos.
+
+Agendamentos pagos, com nota e anteriores à data de corte saem das tabelas principais
+(Scheduling, serviços e Note) e vão para ArchivedScheduling/ArchivedNote no mesmo banco.
+Cada lote é movido numa transação própria: cópia e exclusão acontecem juntas, então um
+agendamento nunca fica nas duas tabelas nem em nenhuma. O histórico do pet e a consulta
+de notas procuram nas duas tabelas, e as listas e o dashboard passam a ler só a tabela principal.
+"""
+from django.db import transaction
+from django.db.models import Max
+
+from .models import ArchivedNote, ArchivedScheduling, ChangeLog, Note, Scheduling
+
+CHUNK_SIZE = 500
+
+SCHEDULING_FIELDS = (
+    'id', 'branch_id', 'tutor_id', 'pet_id', 'date_scheduling', 'status', 'observations',
+    'percentage_discount', 'gross_total_value', 'total_value', 'series_id',
+)
+NOTE_FIELDS = (
+    'note_number', 'scheduling_id', 'issue_date', 'branch_id', 'branch_number', 'gross_total_value', 'total_value',
+)
+
+
+def archivable(before):
+    """Agendamentos que podem ser arquivados: pagos, com nota e anteriores a `before`."""
+    return Scheduling.objects.filter(status='Sim', note__isnull=False, date_scheduling__lt=before)
+
+
+def archive_chunk(ids):
+    """Move um lote de agendamentos (com serviços e nota) para o arquivo. Retorna a quantidade movida."""
+    with transaction.atomic():
+        rows = list(Scheduling.objects.filter(pk__in=ids).values(*SCHEDULING_FIELDS))
+        if not rows:
+            return 0
+        ids = [row['id'] for row in rows]
+        ArchivedScheduling.objects.bulk_create(ArchivedScheduling(**row) for row in rows)
+
+        Through = Scheduling.services.through
+        ArchivedThrough = ArchivedScheduling.services.through
+        ArchivedThrough.objects.bulk_create(
+            ArchivedThrough(archivedscheduling_id=scheduling_id, service_id=service_id)
+            for scheduling_id, service_id in Through.objects.filter(scheduling_id__in=ids)
+            .values_list('scheduling_id', 'service_id')
+        )
+        notes = list(Note.objects.filter(scheduling_id__in=ids).values(*NOTE_FIELDS))
+        ArchivedNote.objects.bulk_create(ArchivedNote(**note) for note in notes)
+
+        last_change = ChangeLog.objects.aggregate(last=Max('sequence'))['last'] or 0
+        Scheduling.objects.filter(pk__in=ids).delete()
+
+        # Para quem sincroniza pelo feed, arquivar não é excluir
+        archived_changes = ChangeLog.objects.filter(sequence__gt=last_change, action='D')
+        archived_changes.filter(model='scheduling', object_pk__in=ids).update(action='A')
+        archived_changes.filter(model='note', object_pk__in=[note['note_number'] for note in notes]).update(action='A')
+    return len(rows)
+
+
+def archive_before(before, chunk_size=CHUNK_SIZE, progress=None):
+    """Arquiva, em lotes, tudo o que for anterior a `before`. Retorna a quantidade arquivada."""
+    ids = list(archivable(before).order_by('pk').values_list('pk', flat=True))
+    archived = 0
+    for start in range(0, len(ids), chunk_size):
+        archived += archive_chunk(ids[start:start + chunk_size])
+        if progress:
+            progress(min(start + chunk_size, len(ids)), len(ids))
+    return archived
@@ -0,0 +1,93 @@
+"""
+Arquivos estáticos servidos pela própria aplicação.
+
+No collectstatic do perfil de produção os arquivos recebem um hash no nome
+(ManifestStaticFilesStorage) e ganham versões pré-comprimidas em gzip e brotli. O manifesto
+é estrito: um {% static %} para um arquivo que não passou pelo collectstatic é erro. A view `serve_static` entrega a versão
+comprimida aceita pelo navegador e marca os arquivos com hash como imutáveis, então
+visitas seguintes não baixam nenhum asset de novo.
+"""
+import gzip
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.map', '.svg', '.json', '.txt', '.ttf', '.eot', '.xml'}
+MIN_COMPRESS_SIZE = 256
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+MUTABLE_MAX_AGE = 5 * 60
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def compress(data):
+    """Versões comprimidas de `data`, apenas quando ficam realmente menores."""
+    # Importado só aqui (collectstatic), fora da inicialização do servidor
+    try:
+        import brotli
+    except ImportError:  # brotli é opcional; sem ele só o .gz é gerado
+        brotli = None
+    versions = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        versions['.br'] = brotli.compress(data, quality=11)
+    return {suffix: content for suffix, content in versions.items() if len(content) < len(data) * 0.95}
+
+
+class PrecompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if os.path.splitext(name)[1].lower() not in COMPRESSIBLE_EXTENSIONS or not self.exists(name):
+                continue
+            path = self.path(name)
+            with open(path, 'rb') as source:
+                data = source.read()
+            if len(data) < MIN_COMPRESS_SIZE:
+                continue
+            for suffix, content in compress(data).items():
+                with open(path + suffix, 'wb') as target:
+                    target.write(content)
+
+
+def serve_static(request, path):
+    try:
+        fullpath = safe_join(settings.STATIC_ROOT, path)
+    except (SuspiciousFileOperation, TypeError):
+        raise Http404
+    if not os.path.isfile(fullpath):
+        raise Http404
+
+    stat = os.stat(fullpath)
+    if not was_modified_since(request.headers.get('If-Modified-Since'), stat.st_mtime):
+        return HttpResponseNotModified()
+
+    content_type, _ = mimetypes.guess_type(fullpath)
+    accepted = request.headers.get('Accept-Encoding', '')
+    served, encoding = fullpath, None
+    for name, suffix in ENCODINGS:
+        if re.search(rf'\b{name}\b', accepted) and os.path.isfile(fullpath + suffix):
+            served, encoding = fullpath + suffix, name
+            break
+
+    response = FileResponse(open(served, 'rb'), content_type=content_type or 'application/octet-stream')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Last-Modified'] = http_date(stat.st_mtime)
+    response.headers['Vary'] = 'Accept-Encoding'
+    if HASHED_NAME.search(path):
+        response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    else:
+        response.headers['Cache-Control'] = f'public, max-age={MUTABLE_MAX_AGE}'
+    return response
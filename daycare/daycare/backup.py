@@ -0,0 +1,275 @@
+"""
+Cópia de segurança e restauração do banco SQLite com o sistema no ar.
+
+Copiar o arquivo db.sqlite3 enquanto o sistema grava pode gerar uma cópia corrompida, e travar
+o banco para copiar para o caixa. backup_database usa a API de backup online do SQLite, em passos
+de poucas páginas com uma pausa entre eles. No modo WAL (o das configurações) a conexão da cópia
+abre uma transação de leitura antes do primeiro passo: todos os passos leem o mesmo snapshot, a
+cópia não é reiniciada quando o caixa grava e as gravações continuam normalmente (só o checkpoint
+espera). Fora do WAL cada passo segura o banco só por um instante, mas qualquer gravação reinicia
+a cópia; depois de MAX_RESTARTS reinícios ela é feita num passo só. A cópia vai para um arquivo
+temporário, passa pelo PRAGMA integrity_check e só então recebe o nome final; as mais antigas
+que BACKUP_KEEP são apagadas.
+
+Durante a cópia uma thread faz gravações mínimas no Statistic (o mesmo tipo de escrita do caixa)
+e mede quanto elas demoram, antes e durante o backup, para mostrar o impacto em quem grava. A
+linha de medição é apagada do banco em uso e também da cópia, que pode tê-la capturado.
+
+restore_database faz o caminho inverso, também pela API de backup: o banco em uso recebe a
+cópia num passo só, depois de uma cópia de segurança do estado atual. As cópias de segurança
+são rotacionadas à parte, com o mesmo BACKUP_KEEP.
+"""
+import os
+import sqlite3
+import statistics
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from .models import Statistic
+
+PAGES_PER_STEP = 256
+STEP_PAUSE = 0.005
+MAX_RESTARTS = 5
+PROBE_INTERVAL = 0.02
+PROBE_BASELINE_SAMPLES = 10
+BUSY_TIMEOUT = 20
+PREFIX = 'db-'
+SAFETY_PREFIX = 'pre-restore-'
+SUFFIX = '.sqlite3'
+PROBE_NAME = 'backup-latency-probe'
+
+
+class BackupError(Exception):
+    pass
+
+
+class Restarted(Exception):
+    """A cópia em passos foi reiniciada vezes demais pelas gravações concorrentes."""
+
+
+def database_path(using='default'):
+    return str(connections[using].settings_dict['NAME'])
+
+
+def connect(path):
+    return sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+
+
+def integrity_error(path):
+    """None se o arquivo é um banco íntegro, senão a mensagem do integrity_check."""
+    if not os.path.exists(path):
+        return 'arquivo não encontrado'
+    db = connect(path)
+    try:
+        rows = db.execute('PRAGMA integrity_check').fetchall()
+    except sqlite3.DatabaseError as error:
+        return str(error)
+    finally:
+        db.close()
+    return None if rows == [('ok',)] else '; '.join(row[0] for row in rows[:5])
+
+
+# ==================================================================================== #
+# Medição da latência de gravação
+# ==================================================================================== #
+class WriteProbe(threading.Thread):
+    """Grava o contador PROBE_NAME a cada `interval` segundos e guarda o tempo de cada transação."""
+
+    def __init__(self, path, interval=PROBE_INTERVAL):
+        super().__init__(daemon=True)
+        self.path = path
+        self.interval = interval
+        self.samples = []
+        self.stopped = threading.Event()
+
+    def write(self, db):
+        started = time.perf_counter()
+        db.execute('BEGIN IMMEDIATE')
+        db.execute(
+            f'INSERT INTO "{Statistic._meta.db_table}" ("name", "value") VALUES (?, 1) '
+            f'ON CONFLICT ("name") DO UPDATE SET "value" = "value" + 1',
+            [PROBE_NAME],
+        )
+        db.execute('COMMIT')
+        self.samples.append(time.perf_counter() - started)
+
+    def run(self):
+        db = connect(self.path)
+        try:
+            while not self.stopped.wait(self.interval):
+                self.write(db)
+        finally:
+            db.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        return self.samples
+
+
+def latency_summary(samples):
+    if not samples:
+        return None
+    ordered = sorted(sample * 1000 for sample in samples)
+    return {
+        'samples': len(ordered),
+        'median_ms': round(statistics.median(ordered), 2),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+        'max_ms': round(ordered[-1], 2),
+    }
+
+
+def measure_baseline(path):
+    probe = WriteProbe(path)
+    db = connect(path)
+    try:
+        for _ in range(PROBE_BASELINE_SAMPLES):
+            probe.write(db)
+            time.sleep(PROBE_INTERVAL)
+    finally:
+        db.close()
+    return probe.samples
+
+
+def remove_probe(path):
+    db = connect(path)
+    try:
+        db.execute(f'DELETE FROM "{Statistic._meta.db_table}" WHERE "name" = ?', [PROBE_NAME])
+    finally:
+        db.close()
+
+
+# ==================================================================================== #
+# Backup
+# ==================================================================================== #
+def copy_database(source_path, target_path, pages=PAGES_PER_STEP, pause=STEP_PAUSE):
+    """
+    Copia o banco em passos de `pages` páginas (ver o início do módulo). Retorna (páginas
+    copiadas, reinícios).
+    """
+    source = connect(source_path)
+    target = connect(target_path)
+    state = {'restarts': 0, 'remaining': None, 'total': 0}
+
+    def progress(status, remaining, total):
+        if state['remaining'] is not None and remaining > state['remaining']:
+            state['restarts'] += 1
+            if state['restarts'] > MAX_RESTARTS:
+                raise Restarted
+        state['remaining'], state['total'] = remaining, total
+        if remaining and pause:
+            time.sleep(pause)
+
+    try:
+        snapshot = source.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        if snapshot:
+            source.execute('BEGIN')
+            source.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+        try:
+            source.backup(target, pages=pages, progress=progress)
+        except Restarted:
+            source.backup(target)
+            state['total'] = source.execute('PRAGMA page_count').fetchone()[0]
+        if snapshot:
+            source.execute('COMMIT')
+    finally:
+        target.close()
+        source.close()
+    return state['total'], state['restarts']
+
+
+def snapshots(directory=None, prefix=PREFIX):
+    """Cópias da pasta, da mais antiga para a mais recente."""
+    directory = str(directory or settings.BACKUP_DIR)
+    if not os.path.isdir(directory):
+        return []
+    names = sorted(name for name in os.listdir(directory) if name.startswith(prefix) and name.endswith(SUFFIX))
+    return [os.path.join(directory, name) for name in names]
+
+
+def rotate(directory, keep, prefix=PREFIX):
+    """Apaga as cópias com o prefixo mais antigas, deixando as `keep` mais recentes."""
+    removed = snapshots(directory, prefix)[:-keep] if keep > 0 else []
+    for path in removed:
+        os.remove(path)
+    return removed
+
+
+def backup_database(directory=None, keep=None, pages=PAGES_PER_STEP, pause=STEP_PAUSE, measure=True, prefix=PREFIX):
+    """Grava, confere e rotaciona uma cópia do banco em uso. Retorna estatísticas."""
+    directory = str(directory or settings.BACKUP_DIR)
+    keep = settings.BACKUP_KEEP if keep is None else keep
+    source_path = database_path()
+    os.makedirs(directory, exist_ok=True)
+    name = f"{prefix}{timezone.localtime():%Y%m%d-%H%M%S-%f}{SUFFIX}"
+    path = os.path.join(directory, name)
+    temporary = path + '.tmp'
+
+    baseline = measure_baseline(source_path) if measure else []
+    probe = WriteProbe(source_path) if measure else None
+    if probe:
+        probe.start()
+    started = time.perf_counter()
+    try:
+        pages, restarts = copy_database(source_path, temporary, pages, pause)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        during = probe.stop() if probe else []
+        if probe:
+            remove_probe(source_path)
+
+    error = integrity_error(temporary)
+    if error:
+        os.remove(temporary)
+        raise BackupError(f'A cópia não passou na verificação de integridade: {error}')
+    if measure:
+        # O snapshot foi tirado com a linha de medição gravada
+        remove_probe(temporary)
+    os.replace(temporary, path)
+    removed = rotate(directory, keep, prefix)
+
+    return {
+        'path': path,
+        'pages': pages,
+        'bytes': os.path.getsize(path),
+        'restarts': restarts,
+        'seconds': round(elapsed, 3),
+        'removed': removed,
+        'baseline': latency_summary(baseline),
+        'during': latency_summary(during),
+    }
+
+
+# ==================================================================================== #
+# Restauração
+# ==================================================================================== #
+def restore_database(snapshot, directory=None, safety_copy=True, keep=None):
+    """
+    Substitui o conteúdo do banco em uso pelo da cópia `snapshot`, num passo só (as gravações
+    esperam o fim da cópia). Antes guarda o estado atual numa cópia 'pre-restore-', das quais
+    ficam as `keep` mais recentes (padrão: BACKUP_KEEP).
+    """
+    error = integrity_error(snapshot)
+    if error:
+        raise BackupError(f'A cópia {snapshot} não pode ser restaurada: {error}')
+    safety = None
+    if safety_copy:
+        safety = backup_database(directory, keep, pages=-1, measure=False, prefix=SAFETY_PREFIX)['path']
+
+    started = time.perf_counter()
+    source = connect(snapshot)
+    target = connect(database_path())
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+    return {'safety_copy': safety, 'seconds': round(time.perf_counter() - started, 3)}
@@ -0,0 +1,144 @@
+"""
+Captura de alterações (CDC) para sincronização incremental de sistemas externos.
+
+As alterações de Tutor, Agendamento (incluindo os serviços) e Nota são registradas em
+ChangeLog por triggers do SQLite. Assim o registro acontece na mesma transação da
+alteração e também cobre queryset.update() e bulk_create, que não disparam signals.
+
+Os triggers são gerados a partir dos campos dos modelos. Saem antes das migrações e são
+recriados ao final de cada migrate, porque o SQLite descarta os triggers quando o Django
+reconstrói uma tabela (e não consegue reconstruí-la se outro trigger a referencia).
+"""
+from django.db import connections, router
+
+from .models import ChangeLog, Note, Scheduling, Tutor
+
+TRACKED_MODELS = (Tutor, Scheduling, Note)
+ACTIONS = {'INSERT': 'I', 'UPDATE': 'U', 'DELETE': 'D'}
+FEED_LIMIT = 1000
+FEED_MAX_LIMIT = 10000
+
+TIMESTAMP_SQL = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+
+def trigger_name(model, event):
+    return f"changelog_{model._meta.model_name}_{event.lower()}"
+
+
+def row_json(model, alias):
+    """json_object() com as colunas do modelo; em agendamentos inclui a lista de serviços."""
+    pairs = [f"'{f.attname}', {alias}.\"{f.column}\"" for f in model._meta.concrete_fields]
+    if model is Scheduling:
+        through = Scheduling.services.through._meta.db_table
+        pairs.append(
+            f"'services', json((SELECT json_group_array(service_id) FROM \"{through}\" "
+            f"WHERE scheduling_id = {alias}.\"id\"))"
+        )
+    return f"json_object({', '.join(pairs)})"
+
+
+def insert_sql(model, pk_expr, action, payload):
+    return (
+        f"INSERT INTO \"{ChangeLog._meta.db_table}\" (model, object_pk, action, payload, changed_at) "
+        f"VALUES ('{model._meta.model_name}', {pk_expr}, '{action}', {payload}, {TIMESTAMP_SQL});"
+    )
+
+
+def model_triggers(model):
+    table = model._meta.db_table
+    pk = model._meta.pk.column
+    triggers = []
+    for event, action in ACTIONS.items():
+        alias = 'OLD' if event == 'DELETE' else 'NEW'
+        pk_expr = f'{alias}."{pk}"'
+        payload = 'NULL' if event == 'DELETE' else row_json(model, 'NEW')
+        when = ''
+        if event == 'UPDATE':
+            # Ignora UPDATEs que não mudam nenhuma coluna
+            changed = ' OR '.join(
+                f"OLD.\"{f.column}\" IS NOT NEW.\"{f.column}\"" for f in model._meta.concrete_fields
+            )
+            when = f" WHEN {changed}"
+        triggers.append((
+            trigger_name(model, event),
+            f"CREATE TRIGGER \"{trigger_name(model, event)}\" AFTER {event} ON \"{table}\"{when} "
+            f"BEGIN {insert_sql(model, pk_expr, action, payload)} END",
+        ))
+    return triggers
+
+
+def services_triggers():
+    """Incluir ou remover um serviço do agendamento conta como alteração do agendamento."""
+    through = Scheduling.services.through._meta.db_table
+    table = Scheduling._meta.db_table
+    triggers = []
+    for event, alias in (('INSERT', 'NEW'), ('DELETE', 'OLD')):
+        name = f"changelog_scheduling_services_{event.lower()}"
+        pk_expr = f'{alias}.scheduling_id'
+        payload = f"(SELECT {row_json(Scheduling, 's')} FROM \"{table}\" s WHERE s.\"id\" = {alias}.scheduling_id)"
+        triggers.append((
+            name,
+            f"CREATE TRIGGER \"{name}\" AFTER {event} ON \"{through}\" "
+            f"WHEN EXISTS (SELECT 1 FROM \"{table}\" WHERE \"id\" = {alias}.scheduling_id) "
+            f"BEGIN {insert_sql(Scheduling, pk_expr, 'U', payload)} END",
+        ))
+    return triggers
+
+
+def all_triggers():
+    triggers = []
+    for model in TRACKED_MODELS:
+        triggers.extend(model_triggers(model))
+    triggers.extend(services_triggers())
+    return triggers
+
+
+def drop_triggers(using='default', **kwargs):
+    """
+    Remove os triggers antes das migrações (pre_migrate): o SQLite não consegue reconstruir
+    uma tabela citada no corpo de um trigger de outra tabela.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite' or not router.allow_migrate_model(using, ChangeLog):
+        return
+    with connection.cursor() as cursor:
+        for name, _ in all_triggers():
+            cursor.execute(f'DROP TRIGGER IF EXISTS "{name}"')
+
+
+def install_triggers(using='default', **kwargs):
+    """Recria os triggers de captura. Conectado ao post_migrate em apps.py."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite' or not router.allow_migrate_model(using, ChangeLog):
+        return
+    tables = set(connection.introspection.table_names())
+    required = {ChangeLog._meta.db_table, Scheduling.services.through._meta.db_table}
+    required.update(model._meta.db_table for model in TRACKED_MODELS)
+    if not required <= tables:
+        return
+    with connection.cursor() as cursor:
+        for name, sql in all_triggers():
+            cursor.execute(f'DROP TRIGGER IF EXISTS "{name}"')
+            cursor.execute(sql)
+
+
+def read_changes(since=0, limit=FEED_LIMIT):
+    """
+    Lê o feed a partir do cursor `since` (exclusivo).
+    Retorna (alterações, próximo cursor, há mais).
+    """
+    limit = max(1, min(limit, FEED_MAX_LIMIT))
+    rows = list(
+        ChangeLog.objects
+        .filter(sequence__gt=since)
+        .order_by('sequence')
+        .values_list('sequence', 'model', 'object_pk', 'action', 'payload', 'changed_at')[:limit + 1]
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    changes = [
+        [sequence, model, object_pk, action, payload, changed_at.isoformat()]
+        for sequence, model, object_pk, action, payload, changed_at in rows
+    ]
+    next_cursor = rows[-1][0] if rows else since
+    return changes, next_cursor, has_more
@@ -0,0 +1,69 @@
+"""
+Contador de agendamentos pendentes de pagamento para o /metrics (Statistic).
+
+Triggers do SQLite somam ou subtraem 1 a cada INSERT, UPDATE ou DELETE que muda se um
+agendamento conta como pendente (status 'Não' e não excluído), então queryset.update(),
+bulk_create e mark_as_paid também mantêm o valor. Como os de changelog.py e versions.py,
+saem antes das migrações; ao final de cada migrate o contador é recalculado com um COUNT(*)
+e os triggers voltam.
+"""
+from django.db import connections, router
+
+from .models import Scheduling, Statistic
+
+
+def pending(alias):
+    return f"({alias}.\"status\" = 'Não' AND {alias}.\"deleted_at\" IS NULL)"
+
+
+def add_pending(delta):
+    table = Statistic._meta.db_table
+    return (
+        f'INSERT INTO "{table}" ("name", "value") VALUES (\'{Statistic.PENDING_SCHEDULINGS}\', {delta}) '
+        f'ON CONFLICT ("name") DO UPDATE SET "value" = "value" + excluded."value";'
+    )
+
+
+def all_triggers():
+    scheduling = Scheduling._meta.db_table
+    changed = f'{pending("NEW")} <> {pending("OLD")}'
+    return [
+        ('counter_scheduling_insert',
+         f'CREATE TRIGGER "counter_scheduling_insert" AFTER INSERT ON "{scheduling}" WHEN {pending("NEW")} '
+         f'BEGIN {add_pending(1)} END'),
+        ('counter_scheduling_update',
+         f'CREATE TRIGGER "counter_scheduling_update" AFTER UPDATE ON "{scheduling}" WHEN {changed} '
+         f'BEGIN {add_pending(pending("NEW") + " - " + pending("OLD"))} END'),
+        ('counter_scheduling_delete',
+         f'CREATE TRIGGER "counter_scheduling_delete" AFTER DELETE ON "{scheduling}" WHEN {pending("OLD")} '
+         f'BEGIN {add_pending(-1)} END'),
+    ]
+
+
+def drop_triggers(using='default', **kwargs):
+    """Remove os triggers antes das migrações (pre_migrate)."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite' or not router.allow_migrate_model(using, Statistic):
+        return
+    with connection.cursor() as cursor:
+        for name, _ in all_triggers():
+            cursor.execute(f'DROP TRIGGER IF EXISTS "{name}"')
+
+
+def install_triggers(using='default', **kwargs):
+    """Recalcula o contador e recria os triggers. Conectado ao post_migrate em apps.py."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite' or not router.allow_migrate_model(using, Statistic):
+        return
+    tables = set(connection.introspection.table_names())
+    if not {Scheduling._meta.db_table, Statistic._meta.db_table} <= tables:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT OR REPLACE INTO "{Statistic._meta.db_table}" ("name", "value") '
+            f'SELECT %s, COUNT(*) FROM "{Scheduling._meta.db_table}" s WHERE {pending("s")}',
+            [Statistic.PENDING_SCHEDULINGS],
+        )
+        for name, sql in all_triggers():
+            cursor.execute(f'DROP TRIGGER IF EXISTS "{name}"')
+            cursor.execute(sql)
@@ -0,0 +1,54 @@
+"""
+Remoção em segundo plano de tutores e pets excluídos.
+
+A exclusão pela tela só marca deleted_at (Tutor.soft_delete / Pet.soft_delete), o que
+esconde os registros na hora. Aqui eles são apagados de fato, das folhas para a raiz
+(agendamentos, arquivo, recorrências, pets e tutores), em lotes de tamanho fixo: cada
+lote é uma transação curta, então a memória fica limitada e o lock de escrita do SQLite
+é liberado entre um lote e outro para o caixa continuar trabalhando.
+"""
+from django.db import transaction
+from django.db.models import Q
+
+from .models import ArchivedScheduling, Pet, Scheduling, SchedulingSeries, Tutor
+
+CHUNK_SIZE = 200
+
+
+def purge_steps():
+    """(descrição, queryset) na ordem em que os registros são apagados."""
+    deleted_pets = Pet.all_objects.filter(deleted_at__isnull=False)
+    deleted_tutors = Tutor.all_objects.filter(deleted_at__isnull=False)
+    owned = Q(pet__in=deleted_pets.values('pk')) | Q(tutor__in=deleted_tutors.values('pk'))
+    return [
+        ('agendamentos', Scheduling.all_objects.filter(deleted_at__isnull=False)),
+        ('agendamentos arquivados', ArchivedScheduling.objects.filter(owned)),
+        ('recorrências', SchedulingSeries.objects.filter(owned)),
+        ('pets', deleted_pets),
+        ('tutores', deleted_tutors),
+    ]
+
+
+def purge_chunk(queryset, chunk_size):
+    """Apaga um lote do queryset numa transação própria. Retorna a quantidade de registros principais apagados."""
+    with transaction.atomic():
+        ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if ids:
+            queryset.model._base_manager.filter(pk__in=ids).delete()
+    return len(ids)
+
+
+def purge_deleted(chunk_size=CHUNK_SIZE, progress=None):
+    """Apaga tudo o que foi marcado como excluído. Retorna {descrição: quantidade}."""
+    steps = purge_steps()
+    purged = {}
+    for done, (label, queryset) in enumerate(steps, start=1):
+        purged[label] = 0
+        while True:
+            count = purge_chunk(queryset, chunk_size)
+            purged[label] += count
+            if count < chunk_size:
+                break
+        if progress:
+            progress(done, len(steps))
+    return purged
@@ -0,0 +1,321 @@
+"""
+Detecção de tutores e pets cadastrados em duplicidade, e a mesclagem dos cadastros.
+
+Comparar todos os tutores entre si é quadrático. Em vez disso, cada tutor entra em poucos
+blocos da sua filial (mesma chave fonética do nome, mesmo telefone, mesma parte local do email;
+ver search.py) e só os pares de um mesmo bloco são pontuados. Os pets são comparados só com os
+outros pets do mesmo tutor. Blocos grandes demais (um nome muito comum) são ignorados: os
+duplicados deles ainda aparecem pelo telefone ou pelo email.
+
+A verificação roda a cada save() de Tutor e Pet (signals conectados em apps.py), consultando só
+os blocos do registro salvo pelos índices, e em lote pela tarefa find_duplicates, que refaz a
+lista inteira. Os pares ficam em TutorDuplicate e PetDuplicate; os marcados como "não é
+duplicado" não voltam a aparecer. merge_tutors e merge_pets movem os pets, agendamentos e
+recorrências com um UPDATE por tabela.
+"""
+import time
+from collections import defaultdict
+from difflib import SequenceMatcher
+from itertools import combinations
+
+from django.db import transaction
+from django.db.models import Q
+
+from .models import ArchivedScheduling, Pet, PetDuplicate, Scheduling, SchedulingSeries, Tutor, TutorDuplicate
+from .search import name_words, phonetic
+
+TUTOR_THRESHOLD = 0.85
+PET_THRESHOLD = 0.85
+MAX_BLOCK_SIZE = 200
+CONTACT_WEIGHT = 0.15
+CPF_PENALTY = 0.3
+SPECIES_PENALTY = 0.3
+MIN_PHONE_DIGITS = 8
+MIN_EMAIL_KEY = 3
+# O CPF é único por filial, então dois cadastros da mesma pessoa sempre têm CPFs diferentes;
+# até essa quantidade de dígitos trocados conta como erro de digitação, e não contra o par
+CPF_TYPO_DIGITS = 2
+
+TUTOR_FIELDS = ('id', 'branch_id', 'name', 'cpf_digits', 'phone_digits', 'name_key', 'email_key')
+PET_FIELDS = ('id', 'tutor_id', 'name', 'species')
+# Só mudanças nesses campos podem criar ou desfazer um par
+TUTOR_WATCHED = {'name', 'cpf', 'phone_number', 'email', 'branch'}
+PET_WATCHED = {'name', 'species', 'tutor'}
+TUTOR_MERGE_FIELDS = ('phone_number', 'email', 'address', 'state', 'city', 'know')
+PET_MERGE_FIELDS = ('race', 'age', 'sex', 'weight', 'medical_observations', 'photo')
+
+
+def profile(row):
+    """Linha de values() com o nome já preparado para a comparação."""
+    words = name_words(row['name'])
+    return {**row, 'words': ' '.join(words), 'codes': frozenset(phonetic(word) for word in words)}
+
+
+def name_similarity(a, b, minimum=0.0):
+    """
+    Entre 0 e 1: a fração dos nomes do mais curto que aparecem (foneticamente) no outro, que
+    cobre sobrenomes omitidos ("Ana Souza" e "Ana Maria de Souza"), ou a semelhança dos textos.
+    Um nome de uma palavra só conta pela semelhança dos textos. Retorna None, sem calcular a
+    semelhança completa, quando os limites rápidos do difflib já mostram que ela fica abaixo de
+    `minimum`, que é o que acontece na maioria dos pares de um bloco.
+    """
+    shorter = min(len(a['codes']), len(b['codes']))
+    overlap = len(a['codes'] & b['codes']) / shorter if shorter >= 2 else 0.0
+    if overlap >= minimum:
+        return overlap
+    if minimum > 1:
+        return None
+    matcher = SequenceMatcher(None, a['words'], b['words'])
+    if matcher.real_quick_ratio() < minimum or matcher.quick_ratio() < minimum:
+        return None
+    ratio = matcher.ratio()
+    return ratio if ratio >= minimum else None
+
+
+# ==================================================================================== #
+# Blocos e pontuação
+# ==================================================================================== #
+def tutor_blocks(row):
+    keys = []
+    if row['name_key']:
+        keys.append(('name', row['name_key']))
+    if len(row['phone_digits']) >= MIN_PHONE_DIGITS:
+        keys.append(('phone', row['phone_digits']))
+    if len(row['email_key']) >= MIN_EMAIL_KEY:
+        keys.append(('email', row['email_key']))
+    return [(row['branch_id'], *key) for key in keys]
+
+
+def cpf_typo(a, b):
+    return len(a) == len(b) and sum(x != y for x, y in zip(a, b)) <= CPF_TYPO_DIGITS
+
+
+def score_tutors(a, b):
+    """(pontuação, motivos) do par, ou None se ele não atinge TUTOR_THRESHOLD."""
+    adjustment, reasons = 0.0, []
+    if len(a['phone_digits']) >= MIN_PHONE_DIGITS and a['phone_digits'] == b['phone_digits']:
+        adjustment += CONTACT_WEIGHT
+        reasons.append('mesmo telefone')
+    if len(a['email_key']) >= MIN_EMAIL_KEY and a['email_key'] == b['email_key']:
+        adjustment += CONTACT_WEIGHT
+        reasons.append('mesmo email')
+    if a['cpf_digits'] and b['cpf_digits']:
+        if cpf_typo(a['cpf_digits'], b['cpf_digits']):
+            reasons.append('CPF parecido')
+        else:
+            adjustment -= CPF_PENALTY
+            reasons.append('CPF diferente')
+    similarity = name_similarity(a, b, TUTOR_THRESHOLD - adjustment)
+    if similarity is None:
+        return None
+    return min(similarity + adjustment, 1.0), ', '.join([f'nome {similarity:.0%}', *reasons])
+
+
+def pet_blocks(row):
+    return [row['tutor_id']]
+
+
+def score_pets(a, b):
+    """(pontuação, motivos) do par, ou None se ele não atinge PET_THRESHOLD."""
+    adjustment, reasons = 0.0, []
+    if name_words(a['species']) != name_words(b['species']):
+        adjustment -= SPECIES_PENALTY
+        reasons.append('espécie diferente')
+    similarity = name_similarity(a, b, PET_THRESHOLD - adjustment)
+    if similarity is None:
+        return None
+    return similarity + adjustment, ', '.join([f'nome {similarity:.0%}', *reasons])
+
+
+def pair_key(a, b):
+    return (a['id'], b['id']) if a['id'] < b['id'] else (b['id'], a['id'])
+
+
+def candidate_pairs(profiles, blocks, score):
+    """
+    Pares de `profiles` que dividem algum bloco e que `score` aceita, como
+    {(menor id, maior id): (pontuação, motivos)}, e quantas comparações foram feitas.
+    """
+    members = defaultdict(list)
+    for row in profiles:
+        for key in blocks(row):
+            members[key].append(row)
+    compared = set()
+    found = {}
+    for block in members.values():
+        if len(block) > MAX_BLOCK_SIZE:
+            continue
+        for a, b in combinations(block, 2):
+            pair = pair_key(a, b)
+            if pair in compared:
+                continue
+            compared.add(pair)
+            result = score(a, b)
+            if result is not None:
+                found[pair] = result
+    return found, len(compared)
+
+
+def save_candidates(model, found, scope):
+    """
+    Grava os pares encontrados (atualizando os já conhecidos, sem mexer na situação) e apaga os
+    pendentes de `scope`, os candidatos que foram reavaliados, que não apareceram de novo.
+    """
+    model.objects.bulk_create(
+        [
+            model(first_id=first, second_id=second, score=round(value, 3), reasons=reasons)
+            for (first, second), (value, reasons) in found.items()
+        ],
+        update_conflicts=True, unique_fields=['first', 'second'], update_fields=['score', 'reasons', 'found_at'],
+        batch_size=500,
+    )
+    stale = [
+        pk for pk, first, second in scope.filter(status='pending').values_list('pk', 'first_id', 'second_id')
+        if (first, second) not in found
+    ]
+    for start in range(0, len(stale), 500):
+        model.objects.filter(pk__in=stale[start:start + 500]).delete()
+
+
+# ==================================================================================== #
+# Verificação incremental (signals)
+# ==================================================================================== #
+def check_tutor(tutor):
+    """Compara o tutor só com os tutores dos mesmos blocos e atualiza os pares dele."""
+    scope = TutorDuplicate.objects.filter(Q(first=tutor) | Q(second=tutor))
+    if tutor.deleted_at is not None:
+        save_candidates(TutorDuplicate, {}, scope)
+        return
+    row = profile({field: getattr(tutor, field) for field in TUTOR_FIELDS})
+    condition = Q()
+    for _, kind, value in tutor_blocks(row):
+        condition |= Q(**{f'{kind}_digits' if kind == 'phone' else f'{kind}_key': value})
+    found = {}
+    if condition:
+        others = (
+            Tutor.objects.filter(condition, branch_id=tutor.branch_id)
+            .exclude(pk=tutor.pk).values(*TUTOR_FIELDS)[:MAX_BLOCK_SIZE]
+        )
+        for other in others:
+            result = score_tutors(row, profile(other))
+            if result is not None:
+                found[pair_key(row, other)] = result
+    save_candidates(TutorDuplicate, found, scope)
+
+
+def check_pets(tutor_id):
+    """Compara os pets do tutor entre si e atualiza os pares deles."""
+    pets = [profile(row) for row in Pet.objects.filter(tutor_id=tutor_id).values(*PET_FIELDS)]
+    found, _ = candidate_pairs(pets, pet_blocks, score_pets)
+    scope = PetDuplicate.objects.filter(Q(first__tutor_id=tutor_id) | Q(second__tutor_id=tutor_id))
+    save_candidates(PetDuplicate, found, scope)
+
+
+def tutor_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not TUTOR_WATCHED & set(update_fields)):
+        return
+    check_tutor(instance)
+
+
+def pet_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not PET_WATCHED & set(update_fields)):
+        return
+    check_pets(instance.tutor_id)
+
+
+# ==================================================================================== #
+# Verificação em lote
+# ==================================================================================== #
+def find_duplicates(branch=None, progress=None):
+    """Refaz a lista de possíveis duplicados (de uma filial ou de todas). Retorna estatísticas."""
+    started = time.perf_counter()
+    tutors = Tutor.objects.for_branch(branch).order_by('pk').values(*TUTOR_FIELDS)
+    tutor_pairs, tutor_comparisons = candidate_pairs(
+        [profile(row) for row in tutors.iterator(chunk_size=2000)], tutor_blocks, score_tutors,
+    )
+    scope = TutorDuplicate.objects.filter(first__branch=branch) if branch else TutorDuplicate.objects.all()
+    save_candidates(TutorDuplicate, tutor_pairs, scope)
+    if progress:
+        progress(1, 2)
+
+    pets = Pet.objects.for_branch(branch).filter(tutor__deleted_at__isnull=True).order_by('pk').values(*PET_FIELDS)
+    pet_pairs, pet_comparisons = candidate_pairs(
+        [profile(row) for row in pets.iterator(chunk_size=2000)], pet_blocks, score_pets,
+    )
+    scope = PetDuplicate.objects.filter(first__branch=branch) if branch else PetDuplicate.objects.all()
+    save_candidates(PetDuplicate, pet_pairs, scope)
+    if progress:
+        progress(2, 2)
+
+    return {
+        'tutors': len(tutor_pairs),
+        'pets': len(pet_pairs),
+        'comparisons': tutor_comparisons + pet_comparisons,
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+
+
+# ==================================================================================== #
+# Mesclagem
+# ==================================================================================== #
+def fill_blanks(keep, other, fields):
+    """Completa os campos vazios de `keep` com os de `other`. Retorna os campos completados."""
+    filled = []
+    for field in fields:
+        attname = keep._meta.get_field(field).attname
+        if not getattr(keep, attname) and getattr(other, attname):
+            setattr(keep, attname, getattr(other, attname))
+            filled.append(field)
+    return filled
+
+
+def lock_pair(model, keep, other):
+    """
+    Relê `keep` e `other` dentro da transação: as instâncias recebidas podem ter sido carregadas
+    antes de uma mesclagem anterior (a ação do admin lê todos os pares selecionados de uma vez).
+    """
+    rows = model.all_objects.select_for_update().in_bulk([keep.pk, other.pk])
+    if keep.pk not in rows or other.pk not in rows:
+        raise ValueError('Um dos cadastros já foi mesclado ou removido.')
+    return rows[keep.pk], rows[other.pk]
+
+
+def merge_tutors(keep, other):
+    """
+    Junta `other` em `keep`: pets, agendamentos (ativos e arquivados) e recorrências passam para
+    `keep`, os campos vazios de `keep` são completados com os de `other` e `other` é apagado.
+    Retorna quantos registros foram movidos de cada tabela.
+    """
+    if keep.pk == other.pk or keep.branch_id != other.branch_id:
+        raise ValueError('Só é possível mesclar dois tutores diferentes da mesma filial.')
+    with transaction.atomic():
+        keep, other = lock_pair(Tutor, keep, other)
+        moved = {
+            'pets': Pet.all_objects.filter(tutor=other).update(tutor=keep),
+            'schedulings': Scheduling.all_objects.filter(tutor=other).update(tutor=keep),
+            'archived_schedulings': ArchivedScheduling.objects.filter(tutor=other).update(tutor=keep),
+            'series': SchedulingSeries.objects.filter(tutor=other).update(tutor=keep),
+        }
+        filled = fill_blanks(keep, other, TUTOR_MERGE_FIELDS)
+        Tutor.all_objects.filter(pk=other.pk).delete()
+        keep.save(update_fields=filled)
+        check_pets(keep.pk)
+    return moved
+
+
+def merge_pets(keep, other):
+    """Junta o pet `other` em `keep` (do mesmo tutor), como merge_tutors."""
+    if keep.pk == other.pk or keep.tutor_id != other.tutor_id:
+        raise ValueError('Só é possível mesclar dois pets diferentes do mesmo tutor.')
+    with transaction.atomic():
+        keep, other = lock_pair(Pet, keep, other)
+        moved = {
+            'schedulings': Scheduling.all_objects.filter(pet=other).update(pet=keep),
+            'archived_schedulings': ArchivedScheduling.objects.filter(pet=other).update(pet=keep),
+            'series': SchedulingSeries.objects.filter(pet=other).update(pet=keep),
+        }
+        filled = fill_blanks(keep, other, PET_MERGE_FIELDS)
+        Pet.all_objects.filter(pk=other.pk).delete()
+        if filled:
+            keep.save(update_fields=filled)
+    return moved
@@ -0,0 +1,203 @@
+"""
+Previsão de demanda por serviço, para planejar a equipe e a capacidade de cada dia.
+
+O histórico (agendamentos ativos e arquivados) chega do banco já somado por filial, serviço e
+dia, e vai do cursor direto para arrays do NumPy, sem instanciar modelos. Para cada par
+filial/serviço:
+
+    previsão(dia) = nível x fator do dia da semana x fator do mês
+
+O fator do dia da semana é a média de cada dia da semana dividida pela média geral do
+histórico; o do mês compara a demanda do mês com a esperada só pelos dias da semana. O nível é
+a demanda das últimas semanas sem essa sazonalidade. Todas as contagens
+saem de np.bincount e de produtos de matrizes (pares x dias), então um milhão de agendamentos
+é processado em poucos segundos. O resultado vai para a tabela DemandForecast, recalculada
+pela tarefa forecast_demand toda madrugada; o dashboard só lê essa tabela.
+"""
+import time
+from datetime import date, timedelta
+
+import numpy as np
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .models import ArchivedScheduling, DemandForecast, Scheduling
+
+HORIZON_DAYS = 60
+HISTORY_DAYS = 730
+RECENT_DAYS = 56
+RUN_HOUR = 3
+FETCH_SIZE = 100_000
+EPOCH = date(1970, 1, 1)
+
+
+def history_querysets(since, until):
+    """Quantos serviços foram agendados por (filial, serviço, data) entre `since` e `until`, nas duas tabelas."""
+    active = Scheduling.services.through.objects.filter(
+        scheduling__date_scheduling__range=(since, until), scheduling__deleted_at__isnull=True,
+    ).values_list('scheduling__branch_id', 'service_id', 'scheduling__date_scheduling')
+    archived = ArchivedScheduling.services.through.objects.filter(
+        archivedscheduling__date_scheduling__range=(since, until),
+    ).values_list('archivedscheduling__branch_id', 'service_id', 'archivedscheduling__date_scheduling')
+    return [queryset.annotate(total=Count('pk')).order_by() for queryset in (active, archived)]
+
+
+def load_history(since, until):
+    """
+    Arrays de filiais, serviços, dias (contados a partir de 01/01/1970) e quantidades, lidos em
+    blocos do cursor.
+    """
+    parts = []
+    with connection.cursor() as cursor:
+        for queryset in history_querysets(since, until):
+            sql, params = queryset.query.sql_with_params()
+            cursor.execute(sql, params)
+            while rows := cursor.fetchmany(FETCH_SIZE):
+                branches, services, days, totals = zip(*rows)
+                parts.append((
+                    np.array(branches, dtype=np.int64),
+                    np.array(services, dtype=np.int64),
+                    np.array(days, dtype='datetime64[D]').astype(np.int64),
+                    np.array(totals, dtype=np.int64),
+                ))
+    if not parts:
+        return tuple(np.empty(0, dtype=np.int64) for _ in range(4))
+    return tuple(np.concatenate(column) for column in zip(*parts))
+
+
+# ==================================================================================== #
+# Cálculo
+# ==================================================================================== #
+def weekdays(days):
+    return (days + 3) % 7  # 01/01/1970 foi uma quinta-feira; segunda-feira = 0
+
+
+def months(days):
+    return days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64) % 12
+
+
+def group_factors(counts, baseline, groups, size):
+    """
+    Quanto cada grupo de dias (dia da semana ou mês) fica acima ou abaixo do esperado: demanda
+    do grupo dividida pela soma de `baseline` (demanda esperada por dia) no grupo, por série.
+    Grupos sem nenhum dia esperado ficam com fator 1.
+    """
+    onehot = np.zeros((len(groups), size))
+    onehot[np.arange(len(groups)), groups] = 1
+    actual = counts @ onehot
+    expected = baseline @ onehot
+    return np.divide(actual, expected, out=np.ones_like(actual), where=expected > 0)
+
+
+def forecast(branches, services, days, totals, today, horizon=HORIZON_DAYS):
+    """
+    Previsão para os `horizon` dias a partir de `today`. Os dias anteriores são o histórico; os
+    demais viram a contagem do que já está agendado. Retorna (filiais, serviços, previsão,
+    agendados): as duas primeiras identificam cada série, as outras são matrizes séries x dias.
+    """
+    first = today.toordinal() - EPOCH.toordinal()
+    # Só agendamentos de hoje em diante (instalação nova): não há histórico
+    start = min(max(int(days.min()) if len(days) else first, first - HISTORY_DAYS), first)
+    length = first - start
+
+    width = int(services.max()) + 1 if len(services) else 1
+    keys, series = np.unique(branches * width + services, return_inverse=True)
+    size = len(keys)
+
+    past = (days >= start) & (days < first)
+    counts = np.bincount(
+        series[past] * length + (days[past] - start), weights=totals[past], minlength=size * length,
+    ).reshape(size, length)
+    future = (days >= first) & (days < first + horizon)
+    booked = np.bincount(
+        series[future] * horizon + (days[future] - first), weights=totals[future], minlength=size * horizon,
+    ).reshape(size, horizon).astype(np.int64)
+    if length == 0:
+        return keys // width, keys % width, np.zeros((size, horizon)), booked
+
+    # Uma série só conta a partir do primeiro agendamento, para um serviço novo não parecer fraco
+    opened = np.full(size, length)
+    has_history = counts.any(axis=1)
+    opened[has_history] = np.argmax(counts[has_history] > 0, axis=1)
+    active = (np.arange(length) >= opened[:, None]).astype(float)
+
+    # O fator do mês é medido contra a média já corrigida pelo dia da semana, para um mês com
+    # mais segundas-feiras (ou observado só em parte) não parecer mais forte ou mais fraco
+    history = np.arange(start, first)
+    overall = counts.sum(axis=1) / np.maximum(active.sum(axis=1), 1)
+    by_weekday = group_factors(counts, overall[:, None] * active, weekdays(history), 7)
+    weekly = overall[:, None] * by_weekday[:, weekdays(history)] * active
+    by_month = group_factors(counts, weekly, months(history), 12)
+    seasonal = by_weekday[:, weekdays(history)] * by_month[:, months(history)] * active
+
+    recent = slice(max(0, length - RECENT_DAYS), length)
+    expected_recent = seasonal[:, recent].sum(axis=1)
+    level = np.divide(
+        counts[:, recent].sum(axis=1), expected_recent,
+        out=np.zeros(size), where=expected_recent > 0,
+    )
+
+    upcoming = np.arange(first, first + horizon)
+    expected = level[:, None] * by_weekday[:, weekdays(upcoming)] * by_month[:, months(upcoming)]
+    return keys // width, keys % width, expected, booked
+
+
+def refresh_forecast(today=None, horizon=HORIZON_DAYS):
+    """Recalcula a tabela DemandForecast para os próximos `horizon` dias. Retorna estatísticas."""
+    started = time.perf_counter()
+    today = today or date.today()
+    branches, services, days, totals = load_history(
+        today - timedelta(days=HISTORY_DAYS), today + timedelta(days=horizon - 1),
+    )
+    loaded = time.perf_counter()
+    series_branches, series_services, expected, booked = forecast(branches, services, days, totals, today, horizon)
+    computed = time.perf_counter()
+
+    generated_at = timezone.now()
+    rows = [
+        DemandForecast(
+            branch_id=int(series_branches[i]), service_id=int(series_services[i]),
+            date=today + timedelta(days=int(offset)), expected=round(float(expected[i, offset]), 2),
+            booked=int(booked[i, offset]), generated_at=generated_at,
+        )
+        for i, offset in zip(*np.nonzero((expected >= 0.01) | (booked > 0)))
+    ]
+    with transaction.atomic():
+        DemandForecast.objects.all().delete()
+        DemandForecast.objects.bulk_create(rows, batch_size=1000)
+
+    return {
+        'booked_services': int(totals.sum()),
+        'series': len(series_branches),
+        'rows': len(rows),
+        'load_seconds': round(loaded - started, 3),
+        'compute_seconds': round(computed - loaded, 3),
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+
+
+# ==================================================================================== #
+# Leitura para o dashboard
+# ==================================================================================== #
+def daily_forecast(branch, days=14, top=3):
+    """
+    Previsão somada por dia a partir de hoje: [{'date', 'expected', 'booked', 'services'}], em que
+    `services` são os `top` serviços com maior previsão no dia. Vazio se a tabela não foi gerada.
+    """
+    today = date.today()
+    rows = (
+        DemandForecast.objects.for_branch(branch)
+        .filter(date__range=(today, today + timedelta(days=days - 1)))
+        .values('date', 'service__name')
+        .annotate(expected=Sum('expected'), booked=Sum('booked'))
+        .order_by('date', '-expected')
+    )
+    summary = {}
+    for row in rows:
+        day = summary.setdefault(row['date'], {'date': row['date'], 'expected': 0.0, 'booked': 0, 'services': []})
+        day['expected'] += row['expected']
+        day['booked'] += row['booked']
+        if len(day['services']) < top and row['expected'] >= 0.5:
+            day['services'].append((row['service__name'], row['expected']))
+    return list(summary.values())
@@ -1,5 +1,113 @@
 from django import forms
-from .models import Scheduling, Tutor
+from django.db.models import Model
+from django.forms.models import ModelChoiceIterator
+from django.urls import reverse_lazy
+from smart_selects.form_fields import ChainedModelChoiceField
+from .models import Scheduling, SchedulingSeries, Tutor, Pet
+from .search import only_digits
+from . import refdata
+
+
+class TypeaheadSelect(forms.Select):
+    """
+    Select que renderiza somente a opção selecionada.
+    As demais opções são buscadas sob demanda no endpoint informado em `lookup_url`,
+    então o tamanho da página não depende da quantidade de registros.
+    """
+
+    def __init__(self, lookup_url, attrs=None):
+        super().__init__(attrs)
+        self.lookup_url = lookup_url
+
+    class Media:
+        js = ('js/typeahead.js',)
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['attrs']['data-lookup-url'] = str(self.lookup_url)
+        return context
+
+    def optgroups(self, name, value, attrs=None):
+        options = [self.create_option(name, '', '---------', not any(value), 0)]
+        selected = [v for v in value if str(v).isdigit()]
+        if selected:
+            queryset = self.choices.queryset.filter(pk__in=selected)
+            for index, obj in enumerate(queryset, start=1):
+                label = self.choices.field.label_from_instance(obj)
+                options.append(self.create_option(name, str(obj.pk), label, True, index))
+        return [(None, options, 0)]
+
+
+class CachedChoiceIterator(ModelChoiceIterator):
+    """Opções tiradas do cache dos dados de referência (refdata.py) quando possível."""
+
+    def __iter__(self):
+        objects = refdata.cache.filter(self.queryset)
+        if objects is None:
+            yield from super().__iter__()
+            return
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for obj in objects:
+            yield self.choice(obj)
+
+    def __len__(self):
+        objects = refdata.cache.filter(self.queryset)
+        if objects is None:
+            return super().__len__()
+        return len(objects) + (self.field.empty_label is not None)
+
+
+class ReferenceChoiceMixin:
+    """
+    Campo de escolha de estado, cidade ou serviço: opções e validação pelo cache em memória, sem
+    consultas. Se o queryset do campo não puder ser atendido pelo cache, tudo vai ao banco como antes.
+    """
+    iterator = CachedChoiceIterator
+
+    def cached_conditions(self):
+        if self.to_field_name not in (None, self.queryset.model._meta.pk.name):
+            return None
+        return refdata.cache.conditions(self.queryset)
+
+    def invalid_choice(self, value):
+        return forms.ValidationError(self.error_messages['invalid_choice'], code='invalid_choice', params={'value': value})
+
+
+class ReferenceChoiceField(ReferenceChoiceMixin, forms.ModelChoiceField):
+
+    def to_python(self, value):
+        conditions = self.cached_conditions()
+        if conditions is None or value in self.empty_values:
+            return super().to_python(value)
+        obj = refdata.cache.find(self.queryset, value.pk if isinstance(value, Model) else value, conditions)
+        if obj is None:
+            raise self.invalid_choice(value)
+        return obj
+
+
+class ReferenceChainedChoiceField(ReferenceChoiceField, ChainedModelChoiceField):
+    """Cidade dependente do estado (smart_selects), validada pelo cache."""
+
+
+class ReferenceMultipleChoiceField(ReferenceChoiceMixin, forms.ModelMultipleChoiceField):
+
+    def _check_values(self, value):
+        conditions = self.cached_conditions()
+        if conditions is None:
+            return super()._check_values(value)
+        try:
+            value = frozenset(value)
+        except TypeError:
+            raise forms.ValidationError(self.error_messages['invalid_list'], code='invalid_list')
+        objects = []
+        for pk in value:
+            obj = refdata.cache.find(self.queryset, pk, conditions)
+            if obj is None:
+                raise self.invalid_choice(pk)
+            objects.append(obj)
+        return objects
+
 
 class SchedulingForm(forms.ModelForm):
     
@@ -9,6 +117,10 @@ class SchedulingForm(forms.ModelForm):
             'tutor', 'pet', 'date_scheduling', 'services', 
             'status', 'percentage_discount', 'observations'
         ]
+        widgets = {
+            'tutor': TypeaheadSelect(lookup_url=reverse_lazy('tutor_lookup')),
+        }
+        field_classes = {'services': ReferenceMultipleChoiceField}
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -24,3 +136,81 @@ class SchedulingForm(forms.ModelForm):
                 field.widget.attrs['class'] = 'form-select'
             else:
                 field.widget.attrs['class'] = 'form-control'
+
+
+class TutorForm(forms.ModelForm):
+
+    class Meta:
+        model = Tutor
+        fields = ['name', 'cpf', 'phone_number', 'email', 'address', 'state', 'city', 'know']
+        field_classes = {'state': ReferenceChoiceField, 'city': ReferenceChainedChoiceField}
+
+    def clean_cpf(self):
+        # O CPF é único por filial (comparado só pelos dígitos); a filial não está no formulário, então a checagem é feita aqui
+        cpf = self.cleaned_data['cpf']
+        same_cpf = {'cpf_digits': only_digits(cpf)} if only_digits(cpf) else {'cpf': cpf}
+        duplicates = Tutor.all_objects.filter(branch_id=self.instance.branch_id, **same_cpf).exclude(pk=self.instance.pk)
+        duplicate = duplicates.values('deleted_at').first()
+        if duplicate is not None and duplicate['deleted_at']:
+            raise forms.ValidationError('Um tutor com este CPF está sendo excluído. Tente novamente em alguns minutos.')
+        if duplicate is not None:
+            raise forms.ValidationError('Já existe um tutor com este CPF nesta filial.')
+        return cpf
+
+
+class PetForm(forms.ModelForm):
+
+    class Meta:
+        model = Pet
+        fields = ['name', 'species', 'race', 'age', 'sex', 'weight', 'medical_observations', 'photo', 'tutor']
+        widgets = {
+            'tutor': TypeaheadSelect(lookup_url=reverse_lazy('tutor_lookup')),
+        }
+
+
+class SchedulingSeriesForm(forms.ModelForm):
+    weekdays = forms.TypedMultipleChoiceField(
+        choices=SchedulingSeries.WEEKDAY_CHOICES,
+        coerce=int,
+        widget=forms.CheckboxSelectMultiple,
+        label='Dias da Semana',
+    )
+
+    class Meta:
+        model = SchedulingSeries
+        fields = [
+            'tutor', 'pet', 'services', 'weekdays', 'start_date', 'end_date',
+            'percentage_discount', 'observations'
+        ]
+        widgets = {
+            'tutor': TypeaheadSelect(lookup_url=reverse_lazy('tutor_lookup')),
+            'start_date': forms.DateInput(attrs={'type': 'date'}, format='%Y-%m-%d'),
+            'end_date': forms.DateInput(attrs={'type': 'date'}, format='%Y-%m-%d'),
+        }
+        field_classes = {'services': ReferenceMultipleChoiceField}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        for field_name in self.fields:
+            field = self.fields.get(field_name)
+
+            if isinstance(field.widget, (forms.SelectMultiple, forms.CheckboxSelectMultiple)):
+                continue
+
+            if isinstance(field.widget, forms.Select):
+                field.widget.attrs['class'] = 'form-select'
+            else:
+                field.widget.attrs['class'] = 'form-control'
+
+    def clean_weekdays(self):
+        # Guardado como string de dígitos (0 = segunda), ex.: "024"
+        return ''.join(str(day) for day in sorted(set(self.cleaned_data['weekdays'])))
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start_date = cleaned_data.get('start_date')
+        end_date = cleaned_data.get('end_date')
+        if start_date and end_date and end_date < start_date:
+            self.add_error('end_date', 'A data de término deve ser posterior à data de início.')
+        return cleaned_data
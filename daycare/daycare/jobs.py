@@ -0,0 +1,196 @@
+"""
+Fila de tarefas em segundo plano gravada no banco (compatível com SQLite).
+
+As tarefas são funções registradas com @task e enfileiradas com enqueue(). O comando
+`python manage.py run_jobs` busca as tarefas pendentes e as executa num pool de threads
+ou de processos, com novas tentativas e espera exponencial entre elas. Enquanto executa, o
+worker renova o heartbeat_at das suas tarefas; uma tarefa 'executando' sem sinal de vida há
+muito tempo é de um worker que morreu e volta para a fila.
+"""
+import traceback
+from datetime import date, datetime, time, timedelta
+
+from django.db import connection, connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .archive import archive_before
+from .deletion import purge_deleted
+from .duplicates import find_duplicates
+from .forecast import RUN_HOUR, refresh_forecast
+from .models import Job, Note, Scheduling, SchedulingSeries
+from .reminders import send_reminders
+from .totals import verify_totals
+
+BACKOFF_SECONDS = 5
+HEARTBEAT_SECONDS = 30
+
+registry = {}
+
+
+def task(name, permission=None):
+    """Registra a função como tarefa. `permission` é exigida para enfileirar pela web."""
+    def decorator(func):
+        func.task_name = name
+        func.permission = permission
+        registry[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name, max_attempts=3, run_at=None, **kwargs):
+    if name not in registry:
+        raise KeyError(f'Tarefa desconhecida: {name}')
+    return Job.objects.create(name=name, kwargs=kwargs, max_attempts=max_attempts, run_at=run_at or timezone.now())
+
+
+def claim(worker):
+    """Reserva a próxima tarefa pendente para o worker. Retorna None se não houver nenhuma."""
+    now = timezone.now()
+    with transaction.atomic():
+        queryset = Job.objects.filter(status='pending', run_at__lte=now).order_by('run_at', 'pk')
+        if connection.features.has_select_for_update_skip_locked:
+            queryset = queryset.select_for_update(skip_locked=True)
+        job = queryset.first()
+        if job is None:
+            return None
+        job.status = 'running'
+        job.attempts += 1
+        job.worker = worker
+        job.started_at = job.heartbeat_at = now
+        job.save(update_fields=['status', 'attempts', 'worker', 'started_at', 'heartbeat_at'])
+    return job
+
+
+def heartbeat(job_ids):
+    """Renova o sinal de vida das tarefas em execução no worker."""
+    if not job_ids:
+        return 0
+    return Job.objects.filter(pk__in=job_ids, status='running').update(heartbeat_at=timezone.now())
+
+
+def requeue_stale(older_than):
+    """
+    Devolve à fila as tarefas 'executando' sem sinal de vida há `older_than` segundos: o worker
+    que as reservou morreu sem finalizá-las. Tarefas longas de um worker ativo não voltam.
+    """
+    limit = timezone.now() - timedelta(seconds=older_than)
+    return Job.objects.filter(status='running', heartbeat_at__lt=limit).update(status='pending', worker=None)
+
+
+def execute(job_id):
+    """Executa uma tarefa já reservada. Roda dentro da thread ou do processo do pool."""
+    job = Job.objects.get(pk=job_id)
+    try:
+        handler = registry[job.name]
+        result = handler(job, **job.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            delay = BACKOFF_SECONDS * 2 ** (job.attempts - 1)
+            Job.objects.filter(pk=job.pk).update(
+                status='pending', error=error, worker=None,
+                run_at=timezone.now() + timedelta(seconds=delay),
+            )
+        else:
+            Job.objects.filter(pk=job.pk).update(status='failed', error=error, finished_at=timezone.now())
+        return False
+    else:
+        Job.objects.filter(pk=job.pk).update(
+            status='done', progress=100, result=result, error=None, finished_at=timezone.now(),
+        )
+        return True
+
+
+def execute_in_pool(job_id):
+    """Versão de execute() para o pool: cada thread tem a própria conexão, que é fechada ao final."""
+    try:
+        return execute(job_id)
+    finally:
+        connections.close_all()
+
+
+def setup_process():
+    """Inicializador dos processos do pool (necessário quando o start method é spawn)."""
+    import django
+    django.setup()
+
+
+# ==================================================================================== #
+# Tarefas
+# ==================================================================================== #
+@task('issue_notes', permission='daycare.add_note')
+def issue_notes_task(job, start=None, end=None):
+    start = parse_date(start) if start else date.today()
+    end = parse_date(end) if end else start
+    notes = Scheduling.objects.filter(date_scheduling__range=(start, end)).issue_notes()
+    return {'count': len(notes), 'notes': Note.branch_numbers(notes)}
+
+
+@task('reprice', permission='daycare.change_scheduling')
+def reprice_task(job, ids=None):
+    queryset = Scheduling.objects.all()
+    if ids:
+        queryset = queryset.filter(pk__in=ids)
+    return {'count': queryset.reprice()}
+
+
+@task('expand_series', permission='daycare.add_schedulingseries')
+def expand_series_task(job, days=SchedulingSeries.HORIZON_DAYS):
+    until = date.today() + timedelta(days=days)
+    series_ids = list(SchedulingSeries.objects.filter(pet__deleted_at__isnull=True).values_list('pk', flat=True))
+    created = 0
+    for done, series in enumerate(SchedulingSeries.objects.filter(pk__in=series_ids).iterator(), start=1):
+        created += series.expand(until)
+        job.set_progress(done, len(series_ids))
+    return {'count': created}
+
+
+@task('send_reminders', permission='daycare.add_reminder')
+def send_reminders_task(job, day=None):
+    sent, failed = send_reminders(parse_date(day) if day else None, progress=job.set_progress)
+    return {'sent': sent, 'failed': failed}
+
+
+@task('archive_bookings', permission='daycare.add_archivedscheduling')
+def archive_bookings_task(job, before):
+    return {'count': archive_before(parse_date(before), progress=job.set_progress)}
+
+
+@task('purge_deleted', permission='daycare.delete_tutor')
+def purge_deleted_task(job):
+    return purge_deleted(progress=job.set_progress)
+
+
+@task('find_duplicates', permission='daycare.change_tutor')
+def find_duplicates_task(job):
+    return find_duplicates(progress=job.set_progress)
+
+
+@task('verify_totals', permission='daycare.change_scheduling')
+def verify_totals_task(job, repair=False):
+    stats, mismatches, drifted = verify_totals(fix=repair, progress=job.set_progress)
+    # O resultado fica no banco: só os primeiros ids de cada lista
+    return {
+        **stats,
+        'mismatch_ids': [pk for pk, *_ in mismatches[:100]],
+        'drifted_branch_numbers': [{'branch': branch, 'number': number} for _, (branch, number), *_ in drifted[:100]],
+    }
+
+
+@task('forecast_demand', permission='daycare.add_demandforecast')
+def forecast_demand_task(job, reschedule=True):
+    try:
+        return refresh_forecast()
+    finally:
+        # Mesmo com falha: as novas tentativas desta execução não interrompem a da próxima madrugada
+        if reschedule:
+            schedule_forecast()
+
+
+def schedule_forecast():
+    """Agenda o recálculo da previsão para a próxima madrugada, se ainda não houver um na fila."""
+    if Job.objects.filter(name='forecast_demand', status='pending').exists():
+        return None
+    run_at = timezone.make_aware(datetime.combine(timezone.localdate() + timedelta(days=1), time(RUN_HOUR)))
+    return enqueue('forecast_demand', run_at=run_at)
@@ -0,0 +1,59 @@
+"""
+Carga dos estados e municípios brasileiros (tabela do IBGE) usados nos selects de Tutor.
+
+Os dados ficam em data/localities.json.gz: {"states": [[sigla, nome], ...], "cities":
+{sigla: [nome, ...]}}. A carga é idempotente: estados são identificados pela sigla e
+cidades por (estado, nome), sem diferenciar maiúsculas. Os registros existentes são lidos
+com uma consulta por tabela e só o que falta é inserido com bulk_create, tudo numa única
+transação.
+"""
+import gzip
+import json
+from pathlib import Path
+
+from django.db import transaction
+
+from .models import City, State
+
+DATA_FILE = Path(__file__).resolve().parent / 'data' / 'localities.json.gz'
+
+
+def read_dataset(path=DATA_FILE):
+    opener = gzip.open if str(path).endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as source:
+        return json.load(source)
+
+
+def load_localities(dataset=None):
+    """Insere ou atualiza estados e cidades. Retorna as quantidades de registros criados e atualizados."""
+    dataset = dataset or read_dataset()
+    with transaction.atomic():
+        states = {state.abbreviation.upper(): state for state in State.objects.all()}
+        renamed = []
+        new_states = []
+        for abbreviation, name in dataset['states']:
+            state = states.get(abbreviation)
+            if state is None:
+                new_states.append(State(abbreviation=abbreviation, name=name))
+            elif state.name != name:
+                state.name = name
+                renamed.append(state)
+        State.objects.bulk_update(renamed, ['name'])
+        # O SQLite devolve os ids no bulk_create, então as cidades podem apontar para os estados novos
+        for state in State.objects.bulk_create(new_states):
+            states[state.abbreviation] = state
+
+        existing = {
+            (state_id, name.casefold())
+            for state_id, name in City.objects.values_list('state_id', 'name')
+        }
+        new_cities = []
+        for abbreviation, names in dataset['cities'].items():
+            state_id = states[abbreviation].pk
+            for name in names:
+                key = (state_id, name.casefold())
+                if key not in existing:
+                    existing.add(key)
+                    new_cities.append(City(state_id=state_id, name=name))
+        City.objects.bulk_create(new_cities)
+    return {'states_created': len(new_states), 'states_updated': len(renamed), 'cities_created': len(new_cities)}
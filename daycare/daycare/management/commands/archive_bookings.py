@@ -0,0 +1,36 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from daycare.archive import CHUNK_SIZE, archive_before
+
+DEFAULT_MONTHS = 12
+
+
+class Command(BaseCommand):
+    help = 'Move agendamentos antigos, pagos e com nota (e suas notas) para as tabelas de arquivo.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', help='Data de corte (AAAA-MM-DD). Padrão: hoje menos --months.')
+        parser.add_argument('--months', type=int, default=DEFAULT_MONTHS, help='Meses mantidos na tabela principal.')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Agendamentos por transação.')
+
+    def handle(self, *args, **options):
+        if options['before']:
+            try:
+                before = parse_date(options['before'])
+            except ValueError:
+                before = None
+            if before is None:
+                raise CommandError(f'Data inválida: {options["before"]}. Use o formato AAAA-MM-DD.')
+        else:
+            before = date.today() - timedelta(days=30 * options['months'])
+
+        started = time.perf_counter()
+        archived = archive_before(before, chunk_size=options['chunk_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'{archived} agendamento(s) anterior(es) a {before:%d/%m/%Y} arquivado(s) em {elapsed:.2f}s.'
+        ))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from daycare.models import Tutor
+from daycare.search import backfill_contact_digits
+
+
+class Command(BaseCommand):
+    help = 'Recalcula, em lotes, as colunas só com dígitos do CPF e do telefone dos tutores.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Tutores por lote.')
+
+    def handle(self, *args, **options):
+        updated, conflicts = backfill_contact_digits(Tutor, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{updated} tutor(es) atualizado(s).'))
+        if conflicts:
+            self.stdout.write(self.style.WARNING(
+                f'CPF repetido na mesma filial (sem busca por CPF até a correção): tutores {", ".join(map(str, conflicts))}.'
+            ))
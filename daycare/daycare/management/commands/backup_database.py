@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from daycare.backup import PAGES_PER_STEP, STEP_PAUSE, BackupError, backup_database
+
+
+def latency(summary):
+    if summary is None:
+        return 'nenhuma medida (a cópia terminou antes da primeira)'
+    return f"mediana {summary['median_ms']:.1f} ms, p95 {summary['p95_ms']:.1f} ms, máx. {summary['max_ms']:.1f} ms"
+
+
+class Command(BaseCommand):
+    help = 'Grava uma cópia do banco com o sistema no ar (API de backup do SQLite), confere a cópia e apaga as mais antigas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', help='Pasta das cópias. Padrão: BACKUP_DIR.')
+        parser.add_argument('--keep', type=int, help='Quantas cópias manter. Padrão: BACKUP_KEEP.')
+        parser.add_argument('--pages', type=int, default=PAGES_PER_STEP, help='Páginas copiadas por passo (-1: tudo de uma vez).')
+        parser.add_argument('--pause', type=float, default=STEP_PAUSE, help='Pausa, em segundos, entre os passos.')
+        parser.add_argument('--no-measure', action='store_true', help='Não mede a latência das gravações durante a cópia.')
+
+    def handle(self, *args, **options):
+        try:
+            result = backup_database(
+                options['dir'], options['keep'], options['pages'], options['pause'], measure=not options['no_measure'],
+            )
+        except BackupError as error:
+            raise CommandError(str(error))
+        self.stdout.write(self.style.SUCCESS(
+            f"Cópia gravada em {result['path']}: {result['bytes'] / 1024 / 1024:.1f} MB ({result['pages']} páginas) "
+            f"em {result['seconds']:.2f}s, {result['restarts']} reinício(s)."
+        ))
+        if result['baseline'] is not None:
+            self.stdout.write(f"Gravações antes da cópia: {latency(result['baseline'])}.")
+            self.stdout.write(f"Gravações durante a cópia: {latency(result['during'])}.")
+        for path in result['removed']:
+            self.stdout.write(f'Cópia antiga apagada: {path}')
@@ -0,0 +1,70 @@
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from daycare.models import Note, Pet, Scheduling, Service, Tutor
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede a página do pet e a impressão da nota com e sem GET condicional. '
+        'Os dados de teste são criados numa transação desfeita ao final.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookings', type=int, default=200, help='Agendamentos do pet de teste.')
+        parser.add_argument('--repeat', type=int, default=50, help='Requisições por medição.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            pet, note = self.create_data(options['bookings'])
+            client = Client(HTTP_HOST='localhost')
+            client.force_login(User.objects.create_superuser('bench-http-cache', password=None))
+
+            for label, url in (
+                ('Detalhe do pet', reverse('pet_detail', args=[pet.pk])),
+                ('Impressão da nota', reverse('note_print', args=[note.pk])),
+            ):
+                etag = client.get(url)['ETag']
+                full = self.measure(client, url, options['repeat'])
+                cached = self.measure(client, url, options['repeat'], HTTP_IF_NONE_MATCH=etag)
+                self.stdout.write(
+                    f'{label}: completa {full[0]:.2f} ms ({full[1]} consultas, HTTP {full[2]}) | '
+                    f'revalidada {cached[0]:.2f} ms ({cached[1]} consultas, HTTP {cached[2]})'
+                )
+            transaction.set_rollback(True)
+
+    def create_data(self, bookings):
+        tutor = Tutor.objects.create(name='Benchmark', cpf='000.000.000-00')
+        pet = Pet.objects.create(name='Benchmark', species='Cão', tutor=tutor)
+        service = Service.objects.create(name='Benchmark', price=50)
+        start = date.today()
+        schedulings = Scheduling.objects.bulk_create(
+            Scheduling(
+                branch_id=tutor.branch_id, tutor=tutor, pet=pet,
+                date_scheduling=start + timedelta(days=i), status='Sim',
+            )
+            for i in range(bookings)
+        )
+        Scheduling.services.through.objects.bulk_create(
+            Scheduling.services.through(scheduling_id=s.pk, service_id=service.pk) for s in schedulings
+        )
+        Scheduling.objects.filter(pet=pet).reprice()
+        note, _ = Note.objects.issue(schedulings[0])
+        return pet, note
+
+    def measure(self, client, url, repeat, **headers):
+        """Retorna (tempo médio em ms, consultas por requisição, status)."""
+        started = time.perf_counter()
+        for _ in range(repeat):
+            client.get(url, **headers)
+        elapsed = time.perf_counter() - started
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, **headers)
+        return elapsed / repeat * 1000, len(queries), response.status_code
@@ -0,0 +1,84 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+# Executado num processo novo: mede a importação/configuração do Django e a primeira requisição
+COLD_START_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+setup = time.perf_counter() - started
+from wsgiref.util import setup_testing_defaults
+environ = {'PATH_INFO': sys.argv[1], 'HTTP_HOST': sys.argv[2]}
+setup_testing_defaults(environ)
+status = []
+body = application(environ, lambda s, h, e=None: status.append(s))
+b''.join(body)
+first = time.perf_counter() - started - setup
+print(json.dumps({'setup': setup, 'first_request': first, 'status': status[0]}))
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede a inicialização a frio (processo novo: setup do Django, primeira requisição e '
+        '`manage.py check`) e o custo de requisições com o processo já aquecido. '
+        'Use --settings para comparar perfis, ex.: --settings=app.settings_production.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/entrar/', help='URL requisitada (padrão: página de login).')
+        parser.add_argument('--runs', type=int, default=5, help='Processos novos para a medição a frio.')
+        parser.add_argument('--requests', type=int, default=200, help='Requisições para a medição a quente.')
+
+    def handle(self, *args, **options):
+        host = next((h for h in settings.ALLOWED_HOSTS if h != '*' and not h.startswith('.')), 'localhost')
+        env = dict(os.environ)  # inclui o DJANGO_SETTINGS_MODULE definido por --settings
+        self.stdout.write(f"Perfil: {env['DJANGO_SETTINGS_MODULE']} (DEBUG={settings.DEBUG})")
+
+        cold = [self.cold_start(options['path'], host, env) for _ in range(options['runs'])]
+        check = [self.timed_check(env) for _ in range(options['runs'])]
+        self.report('Setup do Django (a frio)', [run['setup'] for run in cold])
+        self.report(f"Primeira requisição {options['path']} (HTTP {cold[0]['status'][:3]})",
+                    [run['first_request'] for run in cold])
+        self.report('manage.py check', check)
+
+        client = Client(HTTP_HOST=host)
+        client.get(options['path'])
+        timings = []
+        for _ in range(options['requests']):
+            started = time.perf_counter()
+            client.get(options['path'])
+            timings.append(time.perf_counter() - started)
+        self.report(f"Requisição a quente {options['path']}", timings)
+
+    def cold_start(self, path, host, env):
+        output = subprocess.run(
+            [sys.executable, '-c', COLD_START_SCRIPT, path, host],
+            env=env, cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout
+        return json.loads(output.strip().splitlines()[-1])
+
+    def timed_check(self, env):
+        started = time.perf_counter()
+        subprocess.run(
+            [sys.executable, 'manage.py', 'check'],
+            env=env, cwd=settings.BASE_DIR, capture_output=True, check=True,
+        )
+        return time.perf_counter() - started
+
+    def report(self, label, samples):
+        samples = sorted(samples)
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        self.stdout.write(
+            f'{label}: média {statistics.mean(samples) * 1000:.1f} ms | '
+            f'mín {samples[0] * 1000:.1f} ms | p95 {p95 * 1000:.1f} ms'
+        )
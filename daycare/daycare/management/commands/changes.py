@@ -0,0 +1,24 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from daycare.changelog import read_changes, FEED_LIMIT
+
+
+class Command(BaseCommand):
+    help = 'Exporta o feed de alterações (Tutor, Agendamento e Nota) a partir de um cursor, em JSON Lines.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=int, default=0, help='Último número de sequência já sincronizado.')
+        parser.add_argument('--limit', type=int, default=FEED_LIMIT, help='Quantidade de alterações por lote.')
+        parser.add_argument('--all', action='store_true', help='Continua lendo lotes até o fim do feed.')
+
+    def handle(self, *args, **options):
+        since = options['since']
+        while True:
+            changes, since, has_more = read_changes(since, options['limit'])
+            for change in changes:
+                self.stdout.write(json.dumps(change, separators=(',', ':'), ensure_ascii=False))
+            if not (options['all'] and has_more):
+                break
+        self.stderr.write(f'next={since}')
@@ -0,0 +1,29 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+
+from daycare.models import SchedulingSeries
+
+
+class Command(BaseCommand):
+    help = 'Gera as próximas ocorrências dos agendamentos recorrentes (expansão incremental).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=SchedulingSeries.HORIZON_DAYS,
+            help='Horizonte, em dias a partir de hoje, até onde as ocorrências devem existir.',
+        )
+
+    def handle(self, *args, **options):
+        until = date.today() + timedelta(days=options['days'])
+        active = (
+            SchedulingSeries.objects
+            .filter(pet__deleted_at__isnull=True)
+            .filter(Q(end_date__isnull=True) | Q(expanded_until__isnull=True) | Q(end_date__gt=F('expanded_until')))
+            .filter(Q(expanded_until__isnull=True) | Q(expanded_until__lt=until))
+        )
+        total = 0
+        for series in active.iterator():
+            total += series.expand(until)
+        self.stdout.write(self.style.SUCCESS(f'{total} agendamento(s) gerado(s) até {until:%d/%m/%Y}.'))
@@ -0,0 +1,61 @@
+import sys
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from daycare.models import Branch
+from daycare.note_pdfs import notes_in_period, render_notes, write_merged, write_zip
+
+
+class Command(BaseCommand):
+    help = 'Exporta em PDF as notas emitidas num período (fechamento do mês): um PDF único ou um ZIP com um PDF por nota.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='Primeiro dia (AAAA-MM-DD). Padrão: início do mês atual.')
+        parser.add_argument('--end', help='Último dia (AAAA-MM-DD). Padrão: hoje.')
+        parser.add_argument('--format', choices=('pdf', 'zip'), default='pdf', help='PDF único ou ZIP.')
+        parser.add_argument('--output', help='Arquivo de saída. Padrão: notas-<início>-<fim>.<formato>; "-" escreve na saída padrão.')
+        parser.add_argument('--branch', type=int, help='Id da filial. Padrão: todas.')
+        parser.add_argument('--workers', type=int, help='Processos de renderização. Padrão: número de CPUs.')
+
+    def handle(self, *args, **options):
+        start = self.parse(options['start']) or date.today().replace(day=1)
+        end = self.parse(options['end']) or date.today()
+        if start > end:
+            raise CommandError('A data inicial deve ser anterior ou igual à data final.')
+        branch = None
+        if options['branch']:
+            branch = Branch.objects.filter(pk=options['branch']).first()
+            if branch is None:
+                raise CommandError(f"Filial {options['branch']} não encontrada.")
+
+        notes = notes_in_period(start, end, branch)
+        rendered, stats = render_notes(notes, workers=options['workers'])
+
+        output = options['output'] or f"notas-{start.isoformat()}-{end.isoformat()}.{options['format']}"
+        target = sys.stdout.buffer if output == '-' else open(output, 'wb')
+        try:
+            if options['format'] == 'zip':
+                write_zip(target, notes, rendered)
+            else:
+                write_merged(target, rendered)
+        finally:
+            if target is not sys.stdout.buffer:
+                target.close()
+
+        self.stderr.write(
+            f"{stats['notes']} nota(s) em {stats['seconds']:.2f}s ({stats['notes_per_second']:.0f} notas/s): "
+            f"{stats['rendered']} renderizada(s), {stats['cached']} do cache. Arquivo: {output}"
+        )
+
+    def parse(self, value):
+        if not value:
+            return None
+        try:
+            parsed = parse_date(value)
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise CommandError(f'Data inválida: {value}. Use o formato AAAA-MM-DD.')
+        return parsed
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from daycare.duplicates import find_duplicates
+from daycare.models import Branch
+
+
+class Command(BaseCommand):
+    help = 'Procura tutores e pets cadastrados em duplicidade e refaz a lista de revisão do admin.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--branch', type=int, help='Id da filial. Padrão: todas.')
+
+    def handle(self, *args, **options):
+        branch = Branch.objects.get(pk=options['branch']) if options['branch'] else None
+        result = find_duplicates(branch)
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['tutors']} par(es) de tutores e {result['pets']} par(es) de pets possivelmente duplicados "
+            f"({result['comparisons']} comparações em {result['seconds']:.2f}s)."
+        ))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from daycare import jobs
+from daycare.forecast import HORIZON_DAYS, refresh_forecast
+
+
+class Command(BaseCommand):
+    help = 'Recalcula a previsão de demanda por serviço dos próximos dias (exibida no dashboard).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=HORIZON_DAYS, help='Dias previstos a partir de hoje.')
+        parser.add_argument('--schedule', action='store_true',
+                            help='Também agenda o recálculo diário na fila de tarefas (run_jobs).')
+
+    def handle(self, *args, **options):
+        result = refresh_forecast(horizon=options['days'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['booked_services']} serviço(s) agendado(s) no histórico, {result['series']} série(s) "
+            f"filial/serviço, {result['rows']} linha(s) de previsão em {result['seconds']:.2f}s "
+            f"(leitura {result['load_seconds']:.2f}s, cálculo {result['compute_seconds']:.3f}s)."
+        ))
+        if options['schedule']:
+            job = jobs.schedule_forecast()
+            if job is not None:
+                self.stdout.write(f'Próximo recálculo agendado para {timezone.localtime(job.run_at):%d/%m/%Y %H:%M}.')
@@ -0,0 +1,36 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from daycare.models import Note, Scheduling
+
+
+class Command(BaseCommand):
+    help = 'Emite em lote as notas de todos os agendamentos pagos e sem nota de um período.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='Data inicial (AAAA-MM-DD). Padrão: hoje.')
+        parser.add_argument('--end', help='Data final (AAAA-MM-DD). Padrão: a data inicial.')
+
+    def handle(self, *args, **options):
+        start = self.parse(options['start']) or date.today()
+        end = self.parse(options['end']) or start
+        if start > end:
+            raise CommandError('A data inicial deve ser anterior ou igual à data final.')
+
+        notes = Scheduling.objects.filter(date_scheduling__range=(start, end)).issue_notes()
+        for note in Note.branch_numbers(notes):
+            self.stdout.write(f"{note['branch']} {note['number']}")
+        self.stdout.write(self.style.SUCCESS(f'{len(notes)} nota(s) emitida(s) entre {start:%d/%m/%Y} e {end:%d/%m/%Y}.'))
+
+    def parse(self, value):
+        if not value:
+            return None
+        try:
+            parsed = parse_date(value)
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise CommandError(f'Data inválida: {value}. Use o formato AAAA-MM-DD.')
+        return parsed
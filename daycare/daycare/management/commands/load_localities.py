@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from daycare.localities import DATA_FILE, load_localities, read_dataset
+
+
+class Command(BaseCommand):
+    help = 'Carrega (ou completa) os estados e municípios do IBGE a partir do arquivo incluído no projeto.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', default=DATA_FILE, help='Arquivo JSON (ou .json.gz) no mesmo formato do incluído.')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        result = load_localities(read_dataset(options['file']))
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['states_created']} estado(s) criado(s), {result['states_updated']} atualizado(s), "
+            f"{result['cities_created']} cidade(s) criada(s) em {elapsed:.2f}s."
+        ))
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from daycare.deletion import CHUNK_SIZE, purge_deleted
+
+
+class Command(BaseCommand):
+    help = 'Apaga em lotes os tutores e pets excluídos (e tudo o que pertence a eles).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Registros por transação.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        purged = purge_deleted(chunk_size=options['chunk_size'])
+        elapsed = time.perf_counter() - started
+        for label, count in purged.items():
+            self.stdout.write(f'{label}: {count}')
+        self.stdout.write(self.style.SUCCESS(f'Remoção concluída em {elapsed:.2f}s.'))
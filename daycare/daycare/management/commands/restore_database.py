@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from daycare.backup import BackupError, restore_database, snapshots
+
+
+class Command(BaseCommand):
+    help = 'Restaura o banco a partir de uma cópia de backup_database (padrão: a mais recente).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('snapshot', nargs='?', help='Arquivo da cópia. Padrão: a mais recente de --dir.')
+        parser.add_argument('--dir', help='Pasta das cópias. Padrão: BACKUP_DIR.')
+        parser.add_argument('--no-safety-copy', action='store_true', help='Não grava uma cópia do estado atual antes.')
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive',
+                            help='Não pede confirmação.')
+
+    def handle(self, *args, **options):
+        snapshot = options['snapshot']
+        if snapshot is None:
+            available = snapshots(options['dir'])
+            if not available:
+                raise CommandError('Nenhuma cópia encontrada.')
+            snapshot = available[-1]
+        if options['interactive']:
+            answer = input(f'O conteúdo atual do banco será substituído por {snapshot}. Digite "sim" para continuar: ')
+            if answer != 'sim':
+                raise CommandError('Restauração cancelada.')
+        try:
+            result = restore_database(snapshot, options['dir'], safety_copy=not options['no_safety_copy'])
+        except BackupError as error:
+            raise CommandError(str(error))
+        self.stdout.write(self.style.SUCCESS(f"Banco restaurado de {snapshot} em {result['seconds']:.2f}s."))
+        if result['safety_copy']:
+            self.stdout.write(f"Estado anterior guardado em {result['safety_copy']}.")
+        self.stdout.write('Se a cópia for de uma versão anterior do sistema, rode python manage.py migrate.')
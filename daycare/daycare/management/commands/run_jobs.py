@@ -0,0 +1,77 @@
+import os
+import signal
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from daycare import jobs
+
+
+class Command(BaseCommand):
+    help = 'Executa a fila de tarefas em segundo plano com um pool local de threads ou processos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Tamanho do pool.')
+        parser.add_argument('--mode', choices=['thread', 'process'], default='thread', help='Tipo de pool.')
+        parser.add_argument('--poll', type=float, default=1.0, help='Intervalo, em segundos, entre consultas à fila vazia.')
+        parser.add_argument('--stale-after', type=int, default=600,
+                            help='Segundos sem sinal de vida após os quais uma tarefa "executando" volta para a fila.')
+        parser.add_argument('--once', action='store_true', help='Processa o que estiver pendente e encerra.')
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        workers = options['workers']
+        requeued = jobs.requeue_stale(options['stale_after'])
+        if requeued:
+            self.stdout.write(f'{requeued} tarefa(s) abandonada(s) devolvida(s) à fila.')
+
+        if options['mode'] == 'process':
+            # Os processos filhos não podem herdar a conexão aberta do processo principal
+            connections.close_all()
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=jobs.setup_process)
+        else:
+            pool = ThreadPoolExecutor(max_workers=workers)
+
+        kind = 'processos' if options['mode'] == 'process' else 'threads'
+        self.stdout.write(f'Worker {worker} iniciado ({workers} {kind}).')
+        running = {}  # future -> id da tarefa
+        self.last_beat = time.monotonic()
+        try:
+            while not self.stopping:
+                running = {future: job_id for future, job_id in running.items() if not future.done()}
+                self.beat(running)
+                job = jobs.claim(worker) if len(running) < workers else None
+                if job is not None:
+                    self.stdout.write(f'-> {job}')
+                    running[pool.submit(jobs.execute_in_pool, job.pk)] = job.pk
+                    continue
+                if options['once'] and not running:
+                    break
+                time.sleep(options['poll'])
+        finally:
+            # Encerramento gracioso: para de reservar tarefas e espera as que estão em execução,
+            # mantendo o sinal de vida delas
+            running = {future: job_id for future, job_id in running.items() if not future.done()}
+            if running:
+                self.stdout.write(f'Aguardando {len(running)} tarefa(s) em execução...')
+            while running:
+                wait(running, timeout=jobs.HEARTBEAT_SECONDS)
+                running = {future: job_id for future, job_id in running.items() if not future.done()}
+                self.beat(running)
+            pool.shutdown(wait=True)
+        self.stdout.write(self.style.SUCCESS('Worker encerrado.'))
+
+    def beat(self, running):
+        if time.monotonic() - self.last_beat >= jobs.HEARTBEAT_SECONDS:
+            jobs.heartbeat(list(running.values()))
+            self.last_beat = time.monotonic()
+
+    def stop(self, signum, frame):
+        self.stopping = True
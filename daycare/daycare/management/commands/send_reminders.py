@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from daycare.reminders import BATCH_SIZE, send_reminders
+
+
+class Command(BaseCommand):
+    help = 'Envia por email os lembretes dos agendamentos de amanhã (ou da data informada).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Data dos agendamentos (AAAA-MM-DD). Padrão: amanhã.')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Mensagens por conexão de email.')
+
+    def handle(self, *args, **options):
+        day = None
+        if options['date']:
+            try:
+                day = parse_date(options['date'])
+            except ValueError:
+                day = None
+            if day is None:
+                raise CommandError(f'Data inválida: {options["date"]}. Use o formato AAAA-MM-DD.')
+
+        started = time.perf_counter()
+        sent, failed = send_reminders(day, batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'{sent} lembrete(s) enviado(s) em {elapsed:.2f}s.'))
+        if failed:
+            self.stdout.write(self.style.WARNING(f'{failed} lembrete(s) com falha; rode novamente para reenviar.'))
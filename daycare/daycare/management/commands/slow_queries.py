@@ -0,0 +1,39 @@
+import glob
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from daycare.slowlog import rank, read_log
+
+
+class Command(BaseCommand):
+    help = 'Relatório do log de consultas lentas: formatos de consulta ordenados pelo tempo total.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', help='Arquivo do log (padrão: SLOW_QUERY_LOG). Os arquivos de cada processo e os rotacionados também são lidos.')
+        parser.add_argument('--limit', type=int, default=10, help='Quantidade de formatos exibidos.')
+        parser.add_argument('--no-plan', action='store_true', help='Não exibe os planos de execução.')
+
+    def handle(self, *args, **options):
+        path = options['file'] or getattr(settings, 'SLOW_QUERY_LOG', None)
+        if not path:
+            raise CommandError('Informe --file ou configure SLOW_QUERY_LOG.')
+        path = str(path)
+        paths = [path, *sorted(glob.glob(glob.escape(path) + '.[0-9]*'))]
+        shapes = rank(read_log(paths))
+        if not shapes:
+            self.stdout.write('Nenhuma consulta lenta registrada.')
+            return
+
+        for position, shape in enumerate(shapes[:options['limit']], start=1):
+            mean = shape['total_ms'] / shape['count']
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{position}. [{shape['fingerprint']}] total {shape['total_ms']:.1f} ms | "
+                f"{shape['count']} execução(ões) | média {mean:.1f} ms | máx. {shape['max_ms']:.1f} ms"
+            ))
+            self.stdout.write(f"   rotas: {', '.join(sorted(shape['views']))}")
+            self.stdout.write(f"   {shape['shape']}")
+            if shape['plan'] and not options['no_plan']:
+                for line in shape['plan']:
+                    self.stdout.write(f'     {line}')
+        self.stdout.write(f'{len(shapes)} formato(s) de consulta em {sum(s["count"] for s in shapes)} registro(s).')
@@ -0,0 +1,41 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from daycare.totals import CHUNK_SIZE, verify_totals
+
+
+def money(value):
+    return f'{value / 100:.2f}'
+
+
+class Command(BaseCommand):
+    help = 'Confere os valores bruto e total gravados nos agendamentos contra os serviços e, com --repair, corrige as divergências.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repair', action='store_true',
+                            help='Corrige os agendamentos divergentes (os que têm nota só são listados).')
+        parser.add_argument('--workers', type=int, help='Processos de verificação. Padrão: número de CPUs.')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Agendamentos por faixa de id.')
+        parser.add_argument('--limit', type=int, default=20, help='Quantas divergências de cada tipo mostrar.')
+
+    def handle(self, *args, **options):
+        stats, mismatches, drifted = verify_totals(
+            fix=options['repair'], workers=options['workers'] or os.cpu_count() or 1, chunk_size=options['chunk_size'],
+        )
+        for pk, note, stored, expected in mismatches[:options['limit']]:
+            note = f' (nota {note[1]} da filial {note[0]})' if note is not None else ''
+            self.stdout.write(
+                f'Agendamento {pk}{note}: gravado {money(stored[0])}/{money(stored[1])}, '
+                f'esperado {money(expected[0])}/{money(expected[1])}'
+            )
+        for pk, (branch, number), issued, current in drifted[:options['limit']]:
+            self.stdout.write(
+                f'Nota {number} da filial {branch} (agendamento {pk}): emitida com {money(issued[0])}/{money(issued[1])}, '
+                f'agendamento hoje com {money(current[0])}/{money(current[1])}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['schedulings']} agendamento(s) em {stats['seconds']:.2f}s "
+            f"({stats['schedulings_per_second']} por segundo): {stats['mismatches']} divergência(s), "
+            f"{stats['repaired']} corrigida(s), {stats['drifted_notes']} nota(s) com valores alterados depois da emissão."
+        ))
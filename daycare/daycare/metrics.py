@@ -0,0 +1,250 @@
+"""
+Métricas no formato texto do Prometheus, servidas em /metrics.
+
+O MetricsMiddleware acumula em memória, por nome de rota, histogramas da duração das
+requisições, do número de consultas e do tempo gasto no banco, além da contagem de
+respostas de erro. Com vários workers WSGI cada processo grava o seu estado, no máximo a
+cada FLUSH_INTERVAL segundos, num arquivo próprio em settings.METRICS_DIR, e o /metrics
+soma os arquivos de todos os processos. Sem METRICS_DIR (desenvolvimento, runserver) só o
+processo atual é exportado. Os números de negócio vêm da tabela Statistic, sem COUNT(*).
+"""
+import hmac
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils import timezone
+
+from .models import Statistic
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+FLUSH_INTERVAL = 5
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+UNMATCHED = 'unmatched'
+
+
+class Registry:
+    """Contadores e histogramas do processo, com rótulos. Seguro entre threads."""
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        # Também chamado depois de um fork: o processo filho começa do zero, com arquivo próprio
+        self.pid = os.getpid()
+        self.filename = f'{self.pid}-{uuid.uuid4().hex[:8]}.json'
+        self.values = {name: {} for name in self.metrics}
+        self.flushed_at = 0
+
+    def counter(self, name, help_text, labels):
+        self.metrics[name] = {'type': 'counter', 'help': help_text, 'labels': labels}
+        self.values[name] = {}
+        return name
+
+    def histogram(self, name, help_text, labels, buckets):
+        self.metrics[name] = {'type': 'histogram', 'help': help_text, 'labels': labels, 'buckets': buckets}
+        self.values[name] = {}
+        return name
+
+    def inc(self, name, labels, amount=1):
+        with self.lock:
+            self.check_fork()
+            values = self.values[name]
+            values[labels] = values.get(labels, 0) + amount
+
+    def observe(self, name, labels, value):
+        buckets = self.metrics[name]['buckets']
+        index = next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+        with self.lock:
+            self.check_fork()
+            values = self.values[name]
+            if labels not in values:
+                # Contagem de cada faixa (a última é o +Inf) e a soma dos valores
+                values[labels] = [[0] * (len(buckets) + 1), 0.0]
+            values[labels][0][index] += 1
+            values[labels][1] += value
+
+    def check_fork(self):
+        if os.getpid() != self.pid:
+            self.reset()
+
+    def snapshot(self):
+        with self.lock:
+            self.check_fork()
+            return {
+                name: [[list(labels), value] for labels, value in values.items()]
+                for name, values in self.values.items()
+            }
+
+    def flush(self, force=False):
+        """Grava o estado do processo em METRICS_DIR (troca atômica do arquivo)."""
+        directory = getattr(settings, 'METRICS_DIR', None)
+        if not directory or (not force and time.monotonic() - self.flushed_at < FLUSH_INTERVAL):
+            return
+        self.flushed_at = time.monotonic()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, self.filename)
+        with open(path + '.tmp', 'w') as target:
+            json.dump(self.snapshot(), target)
+        os.replace(path + '.tmp', path)
+
+    def collect(self):
+        """Estado somado de todos os processos: {métrica: {rótulos: valor}}."""
+        directory = getattr(settings, 'METRICS_DIR', None)
+        if not directory:
+            return merge(self.metrics, [self.snapshot()])
+        self.flush(force=True)
+        snapshots = []
+        for filename in sorted(os.listdir(directory)):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(directory, filename)) as source:
+                    snapshots.append(json.load(source))
+            except (OSError, ValueError):
+                continue
+        return merge(self.metrics, snapshots)
+
+
+def merge(metrics, snapshots):
+    merged = {name: {} for name in metrics}
+    for snapshot in snapshots:
+        for name, samples in snapshot.items():
+            if name not in merged:
+                continue
+            target = merged[name]
+            for labels, value in samples:
+                labels = tuple(labels)
+                if metrics[name]['type'] == 'counter':
+                    target[labels] = target.get(labels, 0) + value
+                else:
+                    counts, total = target.get(labels, [[0] * len(value[0]), 0.0])
+                    target[labels] = [[a + b for a, b in zip(counts, value[0])], total + value[1]]
+    return merged
+
+
+registry = Registry()
+
+REQUEST_DURATION = registry.histogram(
+    'daycare_http_request_duration_seconds', 'Duração das requisições por rota.', ('view',), LATENCY_BUCKETS,
+)
+DB_QUERIES = registry.histogram(
+    'daycare_db_queries_per_request', 'Consultas ao banco por requisição.', ('view',), QUERY_BUCKETS,
+)
+DB_DURATION = registry.histogram(
+    'daycare_db_duration_seconds_per_request', 'Tempo gasto no banco por requisição.', ('view',), LATENCY_BUCKETS,
+)
+ERRORS = registry.counter(
+    'daycare_http_errors_total', 'Respostas com status 4xx e 5xx.', ('view', 'status'),
+)
+
+
+# ==================================================================================== #
+# Coleta
+# ==================================================================================== #
+class QueryTimer:
+    """execute_wrapper que conta as consultas e soma o tempo gasto nelas."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+
+class MetricsMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = QueryTimer()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name if match else None) or UNMATCHED
+        registry.observe(REQUEST_DURATION, (view,), duration)
+        registry.observe(DB_QUERIES, (view,), timer.count)
+        registry.observe(DB_DURATION, (view,), timer.duration)
+        if response.status_code >= 400:
+            registry.inc(ERRORS, (view, str(response.status_code)))
+        registry.flush()
+        return response
+
+
+# ==================================================================================== #
+# Exportação
+# ==================================================================================== #
+def format_labels(names, values):
+    escaped = (str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for value in values)
+    pairs = ','.join(f'{name}="{value}"' for name, value in zip(names, escaped))
+    return '{' + pairs + '}' if pairs else ''
+
+
+def render(collected, gauges):
+    lines = []
+    for name, metric in registry.metrics.items():
+        lines.append(f'# HELP {name} {metric["help"]}')
+        lines.append(f'# TYPE {name} {metric["type"]}')
+        names = metric['labels']
+        for labels, value in sorted(collected[name].items()):
+            if metric['type'] == 'counter':
+                lines.append(f'{name}{format_labels(names, labels)} {value}')
+                continue
+            counts, total = value
+            cumulative = 0
+            for bound, count in zip([*metric['buckets'], '+Inf'], counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{format_labels((*names, "le"), (*labels, bound))} {cumulative}')
+            lines.append(f'{name}_sum{format_labels(names, labels)} {total}')
+            lines.append(f'{name}_count{format_labels(names, labels)} {cumulative}')
+    for name, help_text, value in gauges:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} gauge')
+        lines.append(f'{name} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def business_gauges():
+    pending, notes_today = Statistic.read(
+        Statistic.PENDING_SCHEDULINGS, Statistic.notes_issued_name(timezone.localdate()),
+    )
+    return [
+        ('daycare_pending_schedulings', 'Agendamentos com pagamento pendente.', pending),
+        ('daycare_notes_issued_today', 'Notas emitidas hoje.', notes_today),
+    ]
+
+
+def is_authorized(request):
+    """Com METRICS_TOKEN configurado o coletor usa 'Authorization: Bearer <token>'; sem ele, só a equipe."""
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token:
+        header = request.headers.get('Authorization', '')
+        return hmac.compare_digest(header, f'Bearer {token}')
+    return request.user.is_authenticated and request.user.is_staff
+
+
+def metrics_view(request):
+    if not is_authorized(request):
+        return HttpResponseForbidden()
+    return HttpResponse(render(registry.collect(), business_gauges()), content_type=CONTENT_TYPE)
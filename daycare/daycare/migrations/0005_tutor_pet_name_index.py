@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('daycare', '0004_alter_note_options_alter_note_issue_date_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pet',
+            name='name',
+            field=models.CharField(db_index=True, max_length=100, verbose_name='Nome'),
+        ),
+        migrations.AlterField(
+            model_name='tutor',
+            name='name',
+            field=models.CharField(db_index=True, max_length=255, verbose_name='Nome'),
+        ),
+    ]
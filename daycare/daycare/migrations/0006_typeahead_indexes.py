@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:23
+
+import daycare.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('daycare', '0005_tutor_pet_name_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pet',
+            name='name',
+            field=daycare.models.NameField(db_index=True, max_length=100, verbose_name='Nome'),
+        ),
+        migrations.AlterField(
+            model_name='tutor',
+            name='name',
+            field=daycare.models.NameField(db_index=True, max_length=255, verbose_name='Nome'),
+        ),
+        migrations.AlterField(
+            model_name='tutor',
+            name='phone_number',
+            field=models.CharField(blank=True, db_index=True, max_length=20, null=True, verbose_name='Telefone'),
+        ),
+    ]
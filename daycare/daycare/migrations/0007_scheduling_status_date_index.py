@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('daycare', '0006_typeahead_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='scheduling',
+            index=models.Index(fields=['status', 'date_scheduling'], name='scheduling_status_date_idx'),
+        ),
+    ]
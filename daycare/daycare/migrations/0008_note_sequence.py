@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:25
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def seed_note_sequence(apps, schema_editor):
+    Note = apps.get_model('daycare', 'Note')
+    NoteSequence = apps.get_model('daycare', 'NoteSequence')
+    last_value = Note.objects.aggregate(last=Max('note_number'))['last'] or 0
+    NoteSequence.objects.update_or_create(name='note', defaults={'last_value': last_value})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('daycare', '0007_scheduling_status_date_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NoteSequence',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False, verbose_name='Nome')),
+                ('last_value', models.PositiveBigIntegerField(default=0, verbose_name='Último Número')),
+            ],
+            options={
+                'verbose_name': 'Sequência de Notas',
+                'verbose_name_plural': 'Sequências de Notas',
+            },
+        ),
+        migrations.RunPython(seed_note_sequence, migrations.RunPython.noop),
+    ]
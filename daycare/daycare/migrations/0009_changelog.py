@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('daycare', '0008_note_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('sequence', models.BigAutoField(primary_key=True, serialize=False, verbose_name='Sequência')),
+                ('model', models.CharField(max_length=50, verbose_name='Modelo')),
+                ('object_pk', models.BigIntegerField(verbose_name='Registro')),
+                ('action', models.CharField(choices=[('I', 'Inclusão'), ('U', 'Alteração'), ('D', 'Exclusão')], max_length=1, verbose_name='Ação')),
+                ('payload', models.JSONField(blank=True, null=True, verbose_name='Dados')),
+                ('changed_at', models.DateTimeField(verbose_name='Data da Alteração')),
+            ],
+            options={
+                'verbose_name': 'Alteração',
+                'verbose_name_plural': 'Alterações',
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:27
+
+import django.db.models.deletion
+import smart_selects.db_fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('daycare', '0009_changelog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SchedulingSeries',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekdays', models.CharField(max_length=7, verbose_name='Dias da Semana')),
+                ('start_date', models.DateField(verbose_name='Data de Início')),
+                ('end_date', models.DateField(blank=True, null=True, verbose_name='Data de Término')),
+                ('percentage_discount', models.DecimalField(decimal_places=2, default=0, max_digits=5, verbose_name='Desconto Percentual')),
+                ('observations', models.TextField(blank=True, null=True, verbose_name='Observações')),
+                ('expanded_until', models.DateField(blank=True, null=True, verbose_name='Gerado Até')),
+                ('pet', smart_selects.db_fields.ChainedForeignKey(auto_choose=True, chained_field='tutor', chained_model_field='tutor', on_delete=django.db.models.deletion.CASCADE, to='daycare.pet', verbose_name='Nome do Pet')),
+                ('services', models.ManyToManyField(to='daycare.service', verbose_name='Serviços')),
+                ('tutor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='daycare.tutor', verbose_name='Nome do Tutor')),
+            ],
+            options={
+                'verbose_name': 'Agendamento Recorrente',
+                'verbose_name_plural': 'Agendamentos Recorrentes',
+            },
+        ),
+        migrations.AddField(
+            model_name='scheduling',
+            name='series',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='schedulings', to='daycare.schedulingseries', verbose_name='Recorrência'),
+        ),
+        migrations.AddConstraint(
+            model_name='scheduling',
+            constraint=models.UniqueConstraint(fields=('series', 'date_scheduling'), name='unique_series_date'),
+        ),
+    ]
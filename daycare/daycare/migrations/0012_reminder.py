@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('daycare', '0011_job_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Reminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.EmailField(max_length=254, verbose_name='Email')),
+                ('status', models.CharField(choices=[('sent', 'Enviado'), ('failed', 'Falhou')], max_length=10, verbose_name='Situação')),
+                ('sent_at', models.DateTimeField(verbose_name='Data de Envio')),
+                ('error', models.TextField(blank=True, null=True, verbose_name='Erro')),
+                ('scheduling', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='reminder', to='daycare.scheduling', verbose_name='Agendamento')),
+            ],
+            options={
+                'verbose_name': 'Lembrete',
+                'verbose_name_plural': 'Lembretes',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('daycare', '0012_reminder'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pet',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False, verbose_name='Versão'),
+        ),
+    ]
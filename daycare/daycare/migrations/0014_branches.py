@@ -0,0 +1,114 @@
+import daycare.models
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def assign_default_branch(apps, schema_editor):
+    """Os registros existentes ficam na Matriz; a numeração das notas continua de onde parou."""
+    Branch = apps.get_model('daycare', 'Branch')
+    Note = apps.get_model('daycare', 'Note')
+    NoteSequence = apps.get_model('daycare', 'NoteSequence')
+    branch, _ = Branch.objects.get_or_create(name='Matriz')
+    for model_name in ('Tutor', 'Pet', 'Service', 'Scheduling', 'Note'):
+        apps.get_model('daycare', model_name).objects.update(branch=branch)
+    Note.objects.update(branch_number=models.F('note_number'))
+    last_value = Note.objects.aggregate(last=models.Max('note_number'))['last'] or 0
+    NoteSequence.objects.update_or_create(name=f'note-branch-{branch.pk}', defaults={'last_value': last_value})
+
+
+def branch_field(**kwargs):
+    return models.ForeignKey(
+        on_delete=django.db.models.deletion.PROTECT, to='daycare.branch', verbose_name='Filial', **kwargs
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('daycare', '0013_pet_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Branch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Nome')),
+                ('address', models.TextField(blank=True, null=True, verbose_name='Endereço')),
+            ],
+            options={
+                'verbose_name': 'Filial',
+                'verbose_name_plural': 'Filiais',
+            },
+        ),
+        migrations.CreateModel(
+            name='BranchMembership',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='members', to='daycare.branch', verbose_name='Filial')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='branch_membership', to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Vínculo com Filial',
+                'verbose_name_plural': 'Vínculos com Filiais',
+            },
+        ),
+        # Colunas criadas vazias, preenchidas com a Matriz e só então tornadas obrigatórias
+        migrations.AddField(model_name='tutor', name='branch', field=branch_field(null=True)),
+        migrations.AddField(model_name='pet', name='branch', field=branch_field(null=True, editable=False)),
+        migrations.AddField(model_name='service', name='branch', field=branch_field(null=True)),
+        migrations.AddField(model_name='scheduling', name='branch', field=branch_field(null=True, editable=False)),
+        migrations.AddField(model_name='note', name='branch', field=branch_field(null=True)),
+        migrations.AddField(
+            model_name='note',
+            name='branch_number',
+            field=models.PositiveBigIntegerField(null=True, verbose_name='Número na Filial'),
+        ),
+        migrations.RunPython(assign_default_branch, migrations.RunPython.noop),
+        migrations.AlterField(model_name='tutor', name='branch', field=branch_field(default=daycare.models.default_branch)),
+        migrations.AlterField(model_name='pet', name='branch', field=branch_field(editable=False)),
+        migrations.AlterField(model_name='service', name='branch', field=branch_field(default=daycare.models.default_branch)),
+        migrations.AlterField(model_name='scheduling', name='branch', field=branch_field(editable=False)),
+        migrations.AlterField(model_name='note', name='branch', field=branch_field()),
+        migrations.AlterField(
+            model_name='note',
+            name='branch_number',
+            field=models.PositiveBigIntegerField(verbose_name='Número na Filial'),
+        ),
+        # O CPF passa a ser único dentro da filial
+        migrations.AlterField(
+            model_name='tutor',
+            name='cpf',
+            field=models.CharField(max_length=14, verbose_name='CPF'),
+        ),
+        migrations.AddConstraint(
+            model_name='tutor',
+            constraint=models.UniqueConstraint(fields=('branch', 'cpf'), name='unique_branch_cpf'),
+        ),
+        migrations.AddConstraint(
+            model_name='note',
+            constraint=models.UniqueConstraint(fields=('branch', 'branch_number'), name='unique_branch_note_number'),
+        ),
+        migrations.AddIndex(
+            model_name='tutor',
+            index=models.Index(fields=['branch', 'name'], name='tutor_branch_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pet',
+            index=models.Index(fields=['branch', 'name'], name='pet_branch_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(fields=['branch', 'name'], name='service_branch_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scheduling',
+            index=models.Index(fields=['branch', 'status', 'date_scheduling'], name='scheduling_branch_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scheduling',
+            index=models.Index(fields=['branch', 'date_scheduling'], name='scheduling_branch_date_idx'),
+        ),
+    ]
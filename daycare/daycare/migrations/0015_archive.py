@@ -0,0 +1,63 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('daycare', '0014_branches'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='changelog',
+            name='action',
+            field=models.CharField(choices=[('I', 'Inclusão'), ('U', 'Alteração'), ('D', 'Exclusão'), ('A', 'Arquivamento')], max_length=1, verbose_name='Ação'),
+        ),
+        migrations.CreateModel(
+            name='ArchivedScheduling',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_scheduling', models.DateField(verbose_name='Data do Agendamento')),
+                ('status', models.CharField(max_length=20, verbose_name='Status de Pagamento')),
+                ('observations', models.TextField(blank=True, null=True, verbose_name='Observações')),
+                ('percentage_discount', models.DecimalField(decimal_places=2, max_digits=5, verbose_name='Desconto Percentual')),
+                ('gross_total_value', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Valor Bruto Total')),
+                ('total_value', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Valor Total')),
+                ('series_id', models.BigIntegerField(blank=True, null=True, verbose_name='Recorrência')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='Arquivado Em')),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='daycare.branch', verbose_name='Filial')),
+                ('pet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='daycare.pet', verbose_name='Nome do Pet')),
+                ('services', models.ManyToManyField(related_name='archived_schedulings', to='daycare.service', verbose_name='Serviços')),
+                ('tutor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='daycare.tutor', verbose_name='Nome do Tutor')),
+            ],
+            options={
+                'verbose_name': 'Agendamento Arquivado',
+                'verbose_name_plural': 'Agendamentos Arquivados',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedNote',
+            fields=[
+                ('note_number', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='Numero da Nota')),
+                ('issue_date', models.DateTimeField(verbose_name='Data de Emissão')),
+                ('branch_number', models.PositiveBigIntegerField(verbose_name='Número na Filial')),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='daycare.branch', verbose_name='Filial')),
+                ('scheduling', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='note', to='daycare.archivedscheduling', verbose_name='Agendamento')),
+            ],
+            options={
+                'verbose_name': 'Nota Arquivada',
+                'verbose_name_plural': 'Notas Arquivadas',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedscheduling',
+            index=models.Index(fields=['pet', 'date_scheduling'], name='archived_pet_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedscheduling',
+            index=models.Index(fields=['branch', 'date_scheduling'], name='archived_branch_date_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('daycare', '0015_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pet',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True, verbose_name='Excluído Em'),
+        ),
+        migrations.AddField(
+            model_name='scheduling',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True, verbose_name='Excluído Em'),
+        ),
+        migrations.AddField(
+            model_name='tutor',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True, verbose_name='Excluído Em'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('daycare', '0017_statistics'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='city',
+            index=models.Index(fields=['state', 'name'], name='city_state_name_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations, models
+
+from daycare.search import backfill_contact_digits
+
+
+def backfill(apps, schema_editor):
+    backfill_contact_digits(apps.get_model('daycare', 'Tutor'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('daycare', '0018_city_state_name_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tutor',
+            name='cpf_digits',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=14, null=True, verbose_name='CPF (dígitos)'),
+        ),
+        migrations.AddField(
+            model_name='tutor',
+            name='phone_digits',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=20, verbose_name='Telefone (dígitos)'),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='tutor',
+            constraint=models.UniqueConstraint(fields=('branch', 'cpf_digits'), name='unique_branch_cpf_digits'),
+        ),
+    ]
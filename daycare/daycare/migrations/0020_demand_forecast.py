@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('daycare', '0019_contact_digits'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DemandForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Data')),
+                ('expected', models.FloatField(verbose_name='Previsão')),
+                ('booked', models.PositiveIntegerField(default=0, verbose_name='Já Agendados')),
+                ('generated_at', models.DateTimeField(verbose_name='Gerada Em')),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='daycare.branch', verbose_name='Filial')),
+                ('service', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='forecasts', to='daycare.service', verbose_name='Serviço')),
+            ],
+            options={
+                'verbose_name': 'Previsão de Demanda',
+                'verbose_name_plural': 'Previsões de Demanda',
+                'constraints': [models.UniqueConstraint(fields=('branch', 'date', 'service'), name='unique_forecast_branch_date_service')],
+            },
+        ),
+    ]
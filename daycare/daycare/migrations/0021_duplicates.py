@@ -0,0 +1,95 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from daycare.search import backfill_duplicate_keys
+
+
+def backfill(apps, schema_editor):
+    backfill_duplicate_keys(apps.get_model('daycare', 'Tutor'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('daycare', '0020_demand_forecast'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PetDuplicate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='Semelhança')),
+                ('reasons', models.CharField(blank=True, max_length=200, verbose_name='Motivos')),
+                ('status', models.CharField(choices=[('pending', 'Pendente'), ('dismissed', 'Não é duplicado')], default='pending', max_length=10, verbose_name='Situação')),
+                ('found_at', models.DateTimeField(auto_now=True, verbose_name='Encontrado Em')),
+            ],
+            options={
+                'verbose_name': 'Pet Duplicado',
+                'verbose_name_plural': 'Pets Duplicados',
+            },
+        ),
+        migrations.CreateModel(
+            name='TutorDuplicate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='Semelhança')),
+                ('reasons', models.CharField(blank=True, max_length=200, verbose_name='Motivos')),
+                ('status', models.CharField(choices=[('pending', 'Pendente'), ('dismissed', 'Não é duplicado')], default='pending', max_length=10, verbose_name='Situação')),
+                ('found_at', models.DateTimeField(auto_now=True, verbose_name='Encontrado Em')),
+            ],
+            options={
+                'verbose_name': 'Tutor Duplicado',
+                'verbose_name_plural': 'Tutores Duplicados',
+            },
+        ),
+        migrations.AddField(
+            model_name='tutor',
+            name='email_key',
+            field=models.CharField(blank=True, default='', editable=False, max_length=254, verbose_name='Chave do Email'),
+        ),
+        migrations.AddField(
+            model_name='tutor',
+            name='name_key',
+            field=models.CharField(blank=True, default='', editable=False, max_length=100, verbose_name='Chave do Nome'),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='tutor',
+            index=models.Index(fields=['branch', 'name_key'], name='tutor_branch_name_key_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tutor',
+            index=models.Index(fields=['branch', 'email_key'], name='tutor_branch_email_key_idx'),
+        ),
+        migrations.AddField(
+            model_name='petduplicate',
+            name='first',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='daycare.pet', verbose_name='Pet'),
+        ),
+        migrations.AddField(
+            model_name='petduplicate',
+            name='second',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='daycare.pet', verbose_name='Possível Duplicado'),
+        ),
+        migrations.AddField(
+            model_name='tutorduplicate',
+            name='first',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='daycare.tutor', verbose_name='Tutor'),
+        ),
+        migrations.AddField(
+            model_name='tutorduplicate',
+            name='second',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='daycare.tutor', verbose_name='Possível Duplicado'),
+        ),
+        migrations.AddConstraint(
+            model_name='petduplicate',
+            constraint=models.UniqueConstraint(fields=('first', 'second'), name='unique_pet_duplicate'),
+        ),
+        migrations.AddConstraint(
+            model_name='tutorduplicate',
+            constraint=models.UniqueConstraint(fields=('first', 'second'), name='unique_tutor_duplicate'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:26
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_note_totals(apps, schema_editor):
+    # As notas já emitidas recebem os valores atuais do agendamento, o melhor registro disponível
+    for note_name, scheduling_name in (('Note', 'Scheduling'), ('ArchivedNote', 'ArchivedScheduling')):
+        note_model = apps.get_model('daycare', note_name)
+        scheduling = apps.get_model('daycare', scheduling_name)._base_manager.filter(pk=OuterRef('scheduling_id'))
+        note_model._base_manager.update(
+            gross_total_value=Subquery(scheduling.values('gross_total_value')[:1]),
+            total_value=Subquery(scheduling.values('total_value')[:1]),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('daycare', '0021_duplicates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivednote',
+            name='gross_total_value',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=10, null=True, verbose_name='Valor Bruto na Emissão'),
+        ),
+        migrations.AddField(
+            model_name='archivednote',
+            name='total_value',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=10, null=True, verbose_name='Valor Total na Emissão'),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='gross_total_value',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=10, null=True, verbose_name='Valor Bruto na Emissão'),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='total_value',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=10, null=True, verbose_name='Valor Total na Emissão'),
+        ),
+        migrations.RunPython(backfill_note_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:48
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_heartbeat(apps, schema_editor):
+    # Tarefas já em execução contam a partir do início, como antes
+    Job = apps.get_model('daycare', 'Job')
+    Job.objects.filter(status='running').update(heartbeat_at=F('started_at'))
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('daycare', '0022_note_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Último Sinal'),
+        ),
+        migrations.RunPython(backfill_heartbeat, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.8 on 2026-10-19 14:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('daycare', '0023_job_heartbeat'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pet',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Excluído Em'),
+        ),
+        migrations.AlterField(
+            model_name='scheduling',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Excluído Em'),
+        ),
+        migrations.AlterField(
+            model_name='tutor',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Excluído Em'),
+        ),
+        migrations.AddIndex(
+            model_name='pet',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', False)), fields=['deleted_at'], name='pet_deleted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scheduling',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', False)), fields=['deleted_at'], name='scheduling_deleted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tutor',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', False)), fields=['deleted_at'], name='tutor_deleted_idx'),
+        ),
+    ]
@@ -1,7 +1,84 @@
-from django.db import models
-from django.db.models import Sum
+from django.db import models, transaction, IntegrityError
+from django.db.models import Count, Max, Q, Sum, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Round
+from django.utils import timezone
+from collections import Counter
+from datetime import date, timedelta
 from decimal import Decimal
 from smart_selects.db_fields import ChainedForeignKey
+from django.conf import settings
+
+from .search import email_key, name_key, normalize_phone, only_digits
+
+
+class NameField(models.CharField):
+    """
+    Nome buscado por prefixo (istartswith). No SQLite a coluna usa a collation NOCASE, para que
+    o LIKE, que já ignora maiúsculas, use o índice; os outros bancos não têm NOCASE e ficam
+    com a collation padrão.
+    """
+
+    def db_parameters(self, connection):
+        db_params = super().db_parameters(connection)
+        if connection.vendor == 'sqlite':
+            db_params['collation'] = 'NOCASE'
+        return db_params
+
+
+class Branch(models.Model):
+    """Unidade da creche. Tutores, pets, serviços, agendamentos e notas pertencem a uma filial."""
+    DEFAULT_NAME = 'Matriz'
+
+    name = models.CharField(max_length=100, unique=True, verbose_name='Nome')
+    address = models.TextField(blank=True, null=True, verbose_name='Endereço')
+
+    class Meta:
+        verbose_name = 'Filial'
+        verbose_name_plural = 'Filiais'
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def default(cls):
+        branch, _ = cls.objects.get_or_create(name=cls.DEFAULT_NAME)
+        return branch
+
+
+def default_branch():
+    return Branch.default().pk
+
+
+class BranchMembership(models.Model):
+    """Filial em que o usuário trabalha. Usuários sem vínculo ficam na Matriz; superusuários sem vínculo veem todas."""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='branch_membership', verbose_name='Usuário',
+    )
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE, related_name='members', verbose_name='Filial')
+
+    class Meta:
+        verbose_name = 'Vínculo com Filial'
+        verbose_name_plural = 'Vínculos com Filiais'
+
+    def __str__(self):
+        return f"{self.user} - {self.branch}"
+
+
+class BranchQuerySet(models.QuerySet):
+
+    def for_branch(self, branch):
+        """Restringe à filial; `None` (superusuário sem filial) mantém todas."""
+        if branch is None:
+            return self
+        return self.filter(branch=branch)
+
+
+class ActiveManager(models.Manager):
+    """Manager padrão dos modelos com exclusão lógica: esconde os registros marcados como excluídos."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
 
 class State(models.Model):
     name = models.CharField(max_length=100, verbose_name='Estado')
@@ -22,6 +99,10 @@ class City(models.Model):
     class Meta:
         verbose_name = "Cidade"
         verbose_name_plural = "Cidades"
+        indexes = [
+            # Busca da cidade pelo nome dentro do estado (carga do IBGE, formulários e importações)
+            models.Index(fields=['state', 'name'], name='city_state_name_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -39,9 +120,10 @@ class Tutor(models.Model):
         ('outro', 'Outro'),
     ]
 
-    name = models.CharField(max_length=255, verbose_name='Nome')
-    cpf = models.CharField(max_length=14, unique=True, verbose_name='CPF')
-    phone_number = models.CharField(max_length=20, blank=True, null=True, verbose_name='Telefone')
+    branch = models.ForeignKey(Branch, on_delete=models.PROTECT, default=default_branch, verbose_name='Filial')
+    name = NameField(max_length=255, db_index=True, verbose_name='Nome')
+    cpf = models.CharField(max_length=14, verbose_name='CPF')
+    phone_number = models.CharField(max_length=20, blank=True, null=True, db_index=True, verbose_name='Telefone')
     email = models.EmailField(blank=True, null=True, verbose_name='Email')
     address = models.TextField(blank=True, null=True, verbose_name='Endereço')
     state = models.ForeignKey(State, on_delete=models.SET_NULL, null=True, blank=True, verbose_name='Estado')
@@ -58,14 +140,59 @@ class Tutor(models.Model):
         on_delete=models.SET_NULL,
     )
     know = models.CharField(max_length=50, choices=ORIGEM_CHOICES, blank=True, null=True, verbose_name='Como Conheceu')
+    # Só os dígitos do CPF e do telefone, preenchidos no save(); é por eles que as buscas são feitas (search.py)
+    cpf_digits = models.CharField(max_length=14, blank=True, null=True, db_index=True, editable=False, verbose_name='CPF (dígitos)')
+    phone_digits = models.CharField(max_length=20, blank=True, default='', db_index=True, editable=False, verbose_name='Telefone (dígitos)')
+    # Chaves de bloco da detecção de duplicados (duplicates.py), também preenchidas no save()
+    name_key = models.CharField(max_length=100, blank=True, default='', editable=False, verbose_name='Chave do Nome')
+    email_key = models.CharField(max_length=254, blank=True, default='', editable=False, verbose_name='Chave do Email')
+    deleted_at = models.DateTimeField(blank=True, null=True, editable=False, verbose_name='Excluído Em')
+
+    objects = ActiveManager.from_queryset(BranchQuerySet)()
+    all_objects = BranchQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Tutor"
         verbose_name_plural = "Tutores"
+        indexes = [
+            models.Index(fields=['branch', 'name'], name='tutor_branch_name_idx'),
+            models.Index(fields=['branch', 'name_key'], name='tutor_branch_name_key_idx'),
+            models.Index(fields=['branch', 'email_key'], name='tutor_branch_email_key_idx'),
+            # Só as linhas excluídas (as que o purge_deleted procura): um índice de deleted_at inteiro
+            # seria escolhido pelo SQLite para o `deleted_at IS NULL` de toda consulta do manager padrão
+            models.Index(fields=['deleted_at'], condition=Q(deleted_at__isnull=False), name='tutor_deleted_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['branch', 'cpf'], name='unique_branch_cpf'),
+            # Também serve de índice para a busca por CPF dentro da filial
+            models.UniqueConstraint(fields=['branch', 'cpf_digits'], name='unique_branch_cpf_digits'),
+        ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.cpf_digits = only_digits(self.cpf) or None
+        self.phone_digits = normalize_phone(self.phone_number)
+        self.name_key = name_key(self.name)
+        self.email_key = email_key(self.email)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'cpf_digits', 'phone_digits', 'name_key', 'email_key'}
+        super().save(*args, **kwargs)
+
+    def soft_delete(self):
+        """
+        Esconde o tutor, os pets e os agendamentos na hora, com três UPDATEs curtos.
+        A remoção de fato é feita em lotes por deletion.purge_deleted.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            Scheduling.all_objects.filter(tutor=self, deleted_at__isnull=True).update(deleted_at=now)
+            Pet.all_objects.filter(tutor=self, deleted_at__isnull=True).update(deleted_at=now)
+            Tutor.all_objects.filter(pk=self.pk).update(deleted_at=now)
+        self.deleted_at = now
+
 
 class Pet(models.Model):
     ORIGEM_SEX = [
@@ -73,7 +200,7 @@ class Pet(models.Model):
         ('femea', 'Fêmea'),
     ]
 
-    name = models.CharField(max_length=100, verbose_name='Nome')
+    name = NameField(max_length=100, db_index=True, verbose_name='Nome')
     species = models.CharField(max_length=100, verbose_name='Espécie')
     race = models.CharField(max_length=100, blank=True, null=True, verbose_name='Raça')
     age = models.CharField(max_length=50, blank=True, null=True, verbose_name='Idade')
@@ -82,29 +209,126 @@ class Pet(models.Model):
     medical_observations = models.TextField(blank=True, null=True, verbose_name='Observações Médicas')
     photo = models.ImageField(upload_to='pets/', blank=True, null=True, verbose_name='Foto')
     tutor = models.ForeignKey(Tutor, on_delete=models.CASCADE, verbose_name='Nome do Tutor')
+    branch = models.ForeignKey(Branch, on_delete=models.PROTECT, editable=False, verbose_name='Filial')
+    # Incrementada por triggers (ver versions.py) sempre que o pet, o tutor ou os agendamentos mudam
+    version = models.PositiveIntegerField(default=1, editable=False, verbose_name='Versão')
+    deleted_at = models.DateTimeField(blank=True, null=True, editable=False, verbose_name='Excluído Em')
+
+    objects = ActiveManager.from_queryset(BranchQuerySet)()
+    all_objects = BranchQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Pet"
         verbose_name_plural = "Pets"
+        indexes = [
+            models.Index(fields=['branch', 'name'], name='pet_branch_name_idx'),
+            models.Index(fields=['deleted_at'], condition=Q(deleted_at__isnull=False), name='pet_deleted_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # O pet fica sempre na filial do tutor
+        if self.branch_id is None:
+            self.branch_id = self.tutor.branch_id
+        super().save(*args, **kwargs)
+
+    def soft_delete(self):
+        """Esconde o pet e os agendamentos na hora; a remoção de fato é feita por deletion.purge_deleted."""
+        now = timezone.now()
+        with transaction.atomic():
+            Scheduling.all_objects.filter(pet=self, deleted_at__isnull=True).update(deleted_at=now)
+            Pet.all_objects.filter(pk=self.pk).update(deleted_at=now)
+        self.deleted_at = now
+
+    def visit_summary(self, top_services=3):
+        """
+        Resumo do histórico para a página do pet, sem carregar os agendamentos:
+        uma agregação nos agendamentos e outra nos serviços mais usados, em cada uma
+        das tabelas (principal e arquivo).
+        """
+        def aggregate(queryset):
+            return queryset.aggregate(
+                visits=Count('id'),
+                total_spent=Coalesce(Sum('total_value', filter=Q(status='Sim')), Value(Decimal('0.00'))),
+                last_visit=Max('date_scheduling', filter=Q(date_scheduling__lte=date.today())),
+            )
+
+        hot = aggregate(self.scheduling_set.all())
+        archived = aggregate(self.archivedscheduling_set.all())
+        summary = {
+            'visits': hot['visits'] + archived['visits'],
+            'total_spent': hot['total_spent'] + archived['total_spent'],
+            'last_visit': max(filter(None, (hot['last_visit'], archived['last_visit'])), default=None),
+        }
+
+        uses = Counter()
+        services = {}
+        for lookup in ('scheduling__pet', 'archived_schedulings__pet'):
+            relation = lookup.split('__')[0]
+            for service in Service.objects.filter(**{lookup: self}).annotate(uses=Count(relation)):
+                uses[service.pk] += service.uses
+                services.setdefault(service.pk, service)
+        ranking = sorted(uses, key=lambda pk: (-uses[pk], services[pk].name))[:top_services]
+        summary['top_services'] = []
+        for pk in ranking:
+            services[pk].uses = uses[pk]
+            summary['top_services'].append(services[pk])
+        return summary
+
 
 class Service(models.Model):
     name = models.CharField(max_length=255, verbose_name='Nome')
     description = models.TextField(blank=True, null=True, verbose_name='Descrição')
     price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Preço')
+    branch = models.ForeignKey(Branch, on_delete=models.PROTECT, default=default_branch, verbose_name='Filial')
+
+    objects = BranchQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Serviço'
         verbose_name_plural = 'Serviços'
+        indexes = [
+            models.Index(fields=['branch', 'name'], name='service_branch_name_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} - R$ {self.price:.2f}"
 
 
+class SchedulingQuerySet(BranchQuerySet):
+
+    def reprice(self):
+        """Recalcula os valores de todos os agendamentos do queryset em um único UPDATE."""
+        services_total = (
+            Scheduling.services.through.objects
+            .filter(scheduling_id=OuterRef('pk'))
+            .values('scheduling_id')
+            .annotate(total=Sum('service__price'))
+            .values('total')
+        )
+        gross = Coalesce(Subquery(services_total), Value(Decimal('0.00')), output_field=models.DecimalField())
+        discount = gross * F('percentage_discount') * Value(Decimal('0.01'))
+        return self.update(
+            gross_total_value=Round(gross, 2),
+            total_value=Round(gross - discount, 2),
+        )
+
+    def mark_as_paid(self):
+        return self.exclude(status='Sim').update(status='Sim')
+
+    def pending_notes(self):
+        """Agendamentos pagos sem nota (anti-join com a tabela de notas)."""
+        return self.filter(status='Sim', note__isnull=True)
+
+    def issue_notes(self):
+        """Emite, em um único INSERT, as notas dos agendamentos pagos que ainda não possuem nota."""
+        return Note.objects.issue_many(self)
+
+
 class Scheduling(models.Model):
+    branch = models.ForeignKey(Branch, on_delete=models.PROTECT, editable=False, verbose_name='Filial')
     tutor = models.ForeignKey(Tutor, on_delete=models.CASCADE, verbose_name='Nome do Tutor')
     pet = ChainedForeignKey(
         'Pet', 
@@ -123,37 +347,538 @@ class Scheduling(models.Model):
     percentage_discount = models.DecimalField(max_digits=5, decimal_places=2, default=0, verbose_name='Desconto Percentual')
     gross_total_value = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name='Valor Bruto Total')
     total_value = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name='Valor Total')
+    series = models.ForeignKey(
+        'SchedulingSeries',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='schedulings',
+        verbose_name='Recorrência',
+    )
+    deleted_at = models.DateTimeField(blank=True, null=True, editable=False, verbose_name='Excluído Em')
+
+    objects = ActiveManager.from_queryset(SchedulingQuerySet)()
+    all_objects = SchedulingQuerySet.as_manager()
 
-    def calculate_values(self):
-        total = self.services.aggregate(total=Sum('price'))['total'] or Decimal('0.00')
-        self.gross_total_value = total
-        discount = total * (Decimal(self.percentage_discount) / Decimal('100'))
-        self.total_value = total - discount
+    is_archived = False
 
     def save(self, *args, **kwargs):
+        # Os valores dependem dos serviços, gravados só depois do save(): quem grava o
+        # agendamento com os serviços (formulários e admin) chama reprice() em seguida
+        if self.branch_id is None:
+            self.branch_id = self.tutor.branch_id
         super().save(*args, **kwargs)
 
-    # garante que services já foi salvo antes de calcular valores
-        if self.pk:
-            self.calculate_values()
-            super().save(update_fields=["gross_total_value", "total_value"])
-
-
     def __str__(self):
         return f"Agendamento {self.id} - {self.pet.name}"
 
     class Meta:
         verbose_name = 'Agendamento'
         verbose_name_plural = 'Agendamentos'
+        indexes = [
+            models.Index(fields=['status', 'date_scheduling'], name='scheduling_status_date_idx'),
+            models.Index(fields=['branch', 'status', 'date_scheduling'], name='scheduling_branch_status_idx'),
+            models.Index(fields=['branch', 'date_scheduling'], name='scheduling_branch_date_idx'),
+            models.Index(fields=['deleted_at'], condition=Q(deleted_at__isnull=False), name='scheduling_deleted_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['series', 'date_scheduling'], name='unique_series_date'),
+        ]
+
+class SchedulingSeries(models.Model):
+    """
+    Agendamento recorrente (ex.: toda segunda, quarta e sexta).
+    As ocorrências são criadas em lote e de forma incremental: cada expansão cobre
+    apenas a janela até `until`, e `expanded_until` guarda até onde já foi gerado.
+    """
+    WEEKDAY_CHOICES = [
+        (0, 'Segunda'),
+        (1, 'Terça'),
+        (2, 'Quarta'),
+        (3, 'Quinta'),
+        (4, 'Sexta'),
+        (5, 'Sábado'),
+        (6, 'Domingo'),
+    ]
+    HORIZON_DAYS = 56
+
+    tutor = models.ForeignKey(Tutor, on_delete=models.CASCADE, verbose_name='Nome do Tutor')
+    pet = ChainedForeignKey(
+        'Pet',
+        chained_field="tutor",
+        chained_model_field="tutor",
+        verbose_name='Nome do Pet',
+        show_all=False,
+        auto_choose=True,
+        sort=True,
+        on_delete=models.CASCADE
+    )
+    services = models.ManyToManyField(Service, verbose_name='Serviços')
+    weekdays = models.CharField(max_length=7, verbose_name='Dias da Semana')
+    start_date = models.DateField(verbose_name='Data de Início')
+    end_date = models.DateField(blank=True, null=True, verbose_name='Data de Término')
+    percentage_discount = models.DecimalField(max_digits=5, decimal_places=2, default=0, verbose_name='Desconto Percentual')
+    observations = models.TextField(blank=True, null=True, verbose_name='Observações')
+    expanded_until = models.DateField(blank=True, null=True, verbose_name='Gerado Até')
+
+    class Meta:
+        verbose_name = 'Agendamento Recorrente'
+        verbose_name_plural = 'Agendamentos Recorrentes'
+
+    def __str__(self):
+        return f"Recorrência {self.id} - {self.pet.name} ({self.get_weekdays_display()})"
+
+    @property
+    def weekday_list(self):
+        return sorted({int(day) for day in self.weekdays})
+
+    def get_weekdays_display(self):
+        names = dict(self.WEEKDAY_CHOICES)
+        return ', '.join(names[day] for day in self.weekday_list)
+
+    def occurrence_dates(self, until):
+        """Datas ainda não geradas entre o início (ou o último ponto gerado) e `until`."""
+        first = self.start_date
+        if self.expanded_until:
+            first = max(first, self.expanded_until + timedelta(days=1))
+        last = min(until, self.end_date) if self.end_date else until
+        weekdays = set(self.weekday_list)
+        day = first
+        while day <= last:
+            if day.weekday() in weekdays:
+                yield day
+            day += timedelta(days=1)
+
+    def expand(self, until=None):
+        """
+        Gera as ocorrências até `until` (padrão: hoje + HORIZON_DAYS) com um bulk_create
+        para os agendamentos e outro para os serviços, precificando a partir de um mapa em memória.
+        Retorna a quantidade de agendamentos criados.
+        """
+        until = until or date.today() + timedelta(days=self.HORIZON_DAYS)
+        if self.end_date:
+            until = min(until, self.end_date)
+        if self.expanded_until and self.expanded_until >= until:
+            return 0
+
+        with transaction.atomic():
+            branch_id = Tutor.objects.filter(pk=self.tutor_id).values_list('branch_id', flat=True).get()
+            # Datas já geradas (expanded_until desatualizado, expansões concorrentes) não se repetem;
+            # a restrição unique_series_date é a última garantia
+            existing = set(
+                Scheduling.all_objects.filter(series=self, date_scheduling__lte=until)
+                .values_list('date_scheduling', flat=True)
+            )
+            dates = [day for day in self.occurrence_dates(until) if day not in existing]
+            prices = dict(self.services.values_list('pk', 'price'))
+            gross = sum(prices.values(), Decimal('0.00'))
+            total = gross - gross * (Decimal(self.percentage_discount) / Decimal('100'))
+
+            schedulings = Scheduling.objects.bulk_create([
+                Scheduling(
+                    branch_id=branch_id,
+                    tutor_id=self.tutor_id,
+                    pet_id=self.pet_id,
+                    series=self,
+                    date_scheduling=day,
+                    status='Não',
+                    observations=self.observations,
+                    percentage_discount=self.percentage_discount,
+                    gross_total_value=gross,
+                    total_value=total,
+                )
+                for day in dates
+            ])
+            Through = Scheduling.services.through
+            Through.objects.bulk_create([
+                Through(scheduling_id=scheduling.pk, service_id=service_id)
+                for scheduling in schedulings
+                for service_id in prices
+            ])
+
+            self.expanded_until = until
+            self.save(update_fields=['expanded_until'])
+        return len(schedulings)
+
+
+class Reminder(models.Model):
+    """Lembrete enviado ao tutor na véspera do agendamento. Um por agendamento, para que reenvios sejam idempotentes."""
+    STATUS_CHOICES = [
+        ('sent', 'Enviado'),
+        ('failed', 'Falhou'),
+    ]
+
+    scheduling = models.OneToOneField(Scheduling, on_delete=models.CASCADE, related_name='reminder', verbose_name='Agendamento')
+    email = models.EmailField(verbose_name='Email')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, verbose_name='Situação')
+    sent_at = models.DateTimeField(verbose_name='Data de Envio')
+    error = models.TextField(blank=True, null=True, verbose_name='Erro')
+
+    class Meta:
+        verbose_name = 'Lembrete'
+        verbose_name_plural = 'Lembretes'
+
+    def __str__(self):
+        return f"Lembrete do Agendamento {self.scheduling_id} ({self.get_status_display()})"
+
+
+class NoteSequence(models.Model):
+    """
+    Contador da numeração das notas.
+    Os números são reservados na mesma transação que grava as notas, então um rollback
+    devolve o número e a sequência não fica com lacunas.
+    """
+    name = models.CharField(max_length=50, primary_key=True, verbose_name='Nome')
+    last_value = models.PositiveBigIntegerField(default=0, verbose_name='Último Número')
+
+    class Meta:
+        verbose_name = 'Sequência de Notas'
+        verbose_name_plural = 'Sequências de Notas'
+
+    def __str__(self):
+        return f"{self.name}: {self.last_value}"
+
+    @classmethod
+    def lock(cls, name='note'):
+        """Trava a linha da sequência até o fim da transação atual (SELECT ... FOR UPDATE)."""
+        sequence, _ = cls.objects.select_for_update().get_or_create(name=name)
+        return sequence
+
+    @staticmethod
+    def branch_name(branch_id):
+        """Nome da sequência da numeração própria de cada filial."""
+        return f'note-branch-{branch_id}'
+
+    def reserve(self, count=1):
+        """Reserva `count` números consecutivos e devolve o intervalo reservado."""
+        first = self.last_value + 1
+        self.last_value += count
+        self.save(update_fields=['last_value'])
+        return range(first, self.last_value + 1)
+
+
+class Statistic(models.Model):
+    """
+    Contadores lidos pelo /metrics sem COUNT(*). Os agendamentos pendentes de pagamento são
+    mantidos por triggers (counters.py); as notas emitidas no dia, pelo NoteManager. Também
+    guarda a versão dos dados de referência (refdata.py).
+    """
+    PENDING_SCHEDULINGS = 'pending-schedulings'
+    REFERENCE_DATA_VERSION = 'reference-data-version'
+
+    name = models.CharField(max_length=50, primary_key=True, verbose_name='Nome')
+    value = models.BigIntegerField(default=0, verbose_name='Valor')
+
+    class Meta:
+        verbose_name = 'Contador'
+        verbose_name_plural = 'Contadores'
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+    @staticmethod
+    def notes_issued_name(day):
+        return f'notes-issued-{day.isoformat()}'
+
+    @classmethod
+    def add(cls, name, amount=1):
+        """Soma `amount` ao contador, criando-o se preciso. Deve rodar na transação que gravou os dados."""
+        if not cls.objects.filter(name=name).update(value=F('value') + amount):
+            cls.objects.create(name=name, value=amount)
+
+    @classmethod
+    def read(cls, *names):
+        """Valores dos contadores numa única consulta; os que não existem valem 0."""
+        values = dict(cls.objects.filter(name__in=names).values_list('name', 'value'))
+        return [values.get(name, 0) for name in names]
+
+
+class NoteManager(models.Manager.from_queryset(BranchQuerySet)):
+
+    def issue(self, scheduling):
+        """
+        Emite a nota do agendamento de forma idempotente.
+        Retorna (nota, criada); se a nota já existir, ela é devolvida sem erro.
+        """
+        try:
+            with transaction.atomic():
+                sequence = NoteSequence.lock()
+                existing = self.filter(scheduling_id=scheduling.pk).first()
+                if existing is not None:
+                    return existing, False
+                number = sequence.reserve()[0]
+                branch_number = NoteSequence.lock(NoteSequence.branch_name(scheduling.branch_id)).reserve()[0]
+                note = self.create(
+                    scheduling_id=scheduling.pk, note_number=number,
+                    branch_id=scheduling.branch_id, branch_number=branch_number,
+                    gross_total_value=scheduling.gross_total_value, total_value=scheduling.total_value,
+                )
+                Statistic.add(Statistic.notes_issued_name(timezone.localdate()))
+                return note, True
+        except IntegrityError:
+            # Outro caixa emitiu a mesma nota entre a consulta e o INSERT. Qualquer outra violação
+            # (um número de nota já usado, por exemplo) não é idempotente e sobe
+            existing = self.filter(scheduling_id=scheduling.pk).first()
+            if existing is None:
+                raise
+            return existing, False
+
+    def issue_many(self, schedulings):
+        """Emite as notas pendentes do queryset de agendamentos com um único bulk_create."""
+        with transaction.atomic():
+            sequence = NoteSequence.lock()
+            pending = list(
+                schedulings.pending_notes().order_by('date_scheduling', 'pk')
+                .values_list('pk', 'branch_id', 'gross_total_value', 'total_value')
+            )
+            if not pending:
+                return []
+            numbers = sequence.reserve(len(pending))
+            # Cada filial reserva o seu bloco; as sequências são travadas sempre na mesma ordem
+            counts = Counter(branch_id for _, branch_id, _, _ in pending)
+            branch_numbers = {
+                branch_id: iter(NoteSequence.lock(NoteSequence.branch_name(branch_id)).reserve(counts[branch_id]))
+                for branch_id in sorted(counts)
+            }
+            Statistic.add(Statistic.notes_issued_name(timezone.localdate()), len(pending))
+            return self.bulk_create([
+                Note(
+                    scheduling_id=pk, note_number=number,
+                    branch_id=branch_id, branch_number=next(branch_numbers[branch_id]),
+                    gross_total_value=gross, total_value=total,
+                )
+                for (pk, branch_id, gross, total), number in zip(pending, numbers)
+            ])
+
 
 class Note(models.Model):
     scheduling = models.OneToOneField(Scheduling, on_delete=models.CASCADE, verbose_name='Agendamento')
     note_number = models.AutoField(primary_key=True, verbose_name='Numero da Nota')
     issue_date = models.DateTimeField(auto_now_add=True, verbose_name='Data de Emissão')
+    branch = models.ForeignKey(Branch, on_delete=models.PROTECT, verbose_name='Filial')
+    branch_number = models.PositiveBigIntegerField(verbose_name='Número na Filial')
+    # Valores do agendamento na emissão; totals.py aponta os agendamentos que mudaram depois da nota
+    gross_total_value = models.DecimalField(
+        max_digits=10, decimal_places=2, blank=True, null=True, editable=False, verbose_name='Valor Bruto na Emissão',
+    )
+    total_value = models.DecimalField(
+        max_digits=10, decimal_places=2, blank=True, null=True, editable=False, verbose_name='Valor Total na Emissão',
+    )
+
+    objects = NoteManager()
 
     class Meta:
         verbose_name = 'Nota de Atendimento'
         verbose_name_plural = 'Notas'
+        constraints = [
+            models.UniqueConstraint(fields=['branch', 'branch_number'], name='unique_branch_note_number'),
+        ]
+
+    def __str__(self):
+        return f"Nota {self.branch_number}"
+
+    @staticmethod
+    def branch_numbers(notes):
+        """Número de cada nota na sua filial, como [{'branch': nome da filial, 'number': número}]."""
+        names = dict(Branch.objects.filter(pk__in={note.branch_id for note in notes}).values_list('pk', 'name'))
+        return [{'branch': names[note.branch_id], 'number': note.branch_number} for note in notes]
+
+
+class ArchivedScheduling(models.Model):
+    """
+    Agendamento antigo, pago e com nota, movido para fora da tabela principal (ver archive.py).
+    Mantém o mesmo id e os mesmos campos, então histórico e nota funcionam com qualquer um dos dois.
+    """
+    id = models.BigIntegerField(primary_key=True, verbose_name='ID')
+    branch = models.ForeignKey(Branch, on_delete=models.PROTECT, verbose_name='Filial')
+    tutor = models.ForeignKey(Tutor, on_delete=models.CASCADE, verbose_name='Nome do Tutor')
+    pet = models.ForeignKey(Pet, on_delete=models.CASCADE, verbose_name='Nome do Pet')
+    services = models.ManyToManyField(Service, related_name='archived_schedulings', verbose_name='Serviços')
+    date_scheduling = models.DateField(verbose_name='Data do Agendamento')
+    status = models.CharField(max_length=20, verbose_name='Status de Pagamento')
+    observations = models.TextField(blank=True, null=True, verbose_name='Observações')
+    percentage_discount = models.DecimalField(max_digits=5, decimal_places=2, verbose_name='Desconto Percentual')
+    gross_total_value = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Valor Bruto Total')
+    total_value = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Valor Total')
+    series_id = models.BigIntegerField(blank=True, null=True, verbose_name='Recorrência')
+    archived_at = models.DateTimeField(auto_now_add=True, verbose_name='Arquivado Em')
+
+    objects = BranchQuerySet.as_manager()
+
+    is_archived = True
+
+    class Meta:
+        verbose_name = 'Agendamento Arquivado'
+        verbose_name_plural = 'Agendamentos Arquivados'
+        indexes = [
+            models.Index(fields=['pet', 'date_scheduling'], name='archived_pet_date_idx'),
+            models.Index(fields=['branch', 'date_scheduling'], name='archived_branch_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"Agendamento {self.id} - {self.pet.name} (arquivado)"
+
+
+class ArchivedNote(models.Model):
+    """Nota de um agendamento arquivado, com o mesmo número da nota original."""
+    scheduling = models.OneToOneField(
+        ArchivedScheduling, on_delete=models.CASCADE, related_name='note', verbose_name='Agendamento',
+    )
+    note_number = models.BigIntegerField(primary_key=True, verbose_name='Numero da Nota')
+    issue_date = models.DateTimeField(verbose_name='Data de Emissão')
+    branch = models.ForeignKey(Branch, on_delete=models.PROTECT, verbose_name='Filial')
+    branch_number = models.PositiveBigIntegerField(verbose_name='Número na Filial')
+    # Valores do agendamento na emissão
+    gross_total_value = models.DecimalField(
+        max_digits=10, decimal_places=2, blank=True, null=True, editable=False, verbose_name='Valor Bruto na Emissão',
+    )
+    total_value = models.DecimalField(
+        max_digits=10, decimal_places=2, blank=True, null=True, editable=False, verbose_name='Valor Total na Emissão',
+    )
+
+    objects = BranchQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Nota Arquivada'
+        verbose_name_plural = 'Notas Arquivadas'
+
+    def __str__(self):
+        return f"Nota {self.branch_number} (arquivada)"
+
+
+class ChangeLog(models.Model):
+    """
+    Registro append-only das alterações em Tutor, Agendamento e Nota.
+    É gravado por triggers do banco (ver changelog.py), na mesma transação da alteração.
+    """
+    ACTION_CHOICES = [
+        ('I', 'Inclusão'),
+        ('U', 'Alteração'),
+        ('D', 'Exclusão'),
+        ('A', 'Arquivamento'),
+    ]
+
+    sequence = models.BigAutoField(primary_key=True, verbose_name='Sequência')
+    model = models.CharField(max_length=50, verbose_name='Modelo')
+    object_pk = models.BigIntegerField(verbose_name='Registro')
+    action = models.CharField(max_length=1, choices=ACTION_CHOICES, verbose_name='Ação')
+    payload = models.JSONField(blank=True, null=True, verbose_name='Dados')
+    changed_at = models.DateTimeField(verbose_name='Data da Alteração')
+
+    class Meta:
+        verbose_name = 'Alteração'
+        verbose_name_plural = 'Alterações'
 
     def __str__(self):
-        return f"Nota {self.note_number}"
+        return f"{self.sequence} {self.get_action_display()} {self.model} {self.object_pk}"
+
+
+class Job(models.Model):
+    """Tarefa da fila de processamento em segundo plano (ver jobs.py e o comando run_jobs)."""
+    STATUS_CHOICES = [
+        ('pending', 'Pendente'),
+        ('running', 'Executando'),
+        ('done', 'Concluída'),
+        ('failed', 'Falhou'),
+    ]
+
+    name = models.CharField(max_length=50, verbose_name='Tarefa')
+    kwargs = models.JSONField(default=dict, blank=True, verbose_name='Parâmetros')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', verbose_name='Situação')
+    progress = models.PositiveSmallIntegerField(default=0, verbose_name='Progresso (%)')
+    result = models.JSONField(blank=True, null=True, verbose_name='Resultado')
+    error = models.TextField(blank=True, null=True, verbose_name='Erro')
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='Tentativas')
+    max_attempts = models.PositiveSmallIntegerField(default=3, verbose_name='Máximo de Tentativas')
+    run_at = models.DateTimeField(default=timezone.now, verbose_name='Executar Em')
+    worker = models.CharField(max_length=100, blank=True, null=True, verbose_name='Worker')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Criada Em')
+    started_at = models.DateTimeField(blank=True, null=True, verbose_name='Iniciada Em')
+    # Sinal de vida do worker, renovado pelo run_jobs e a cada set_progress (ver jobs.requeue_stale)
+    heartbeat_at = models.DateTimeField(blank=True, null=True, verbose_name='Último Sinal')
+    finished_at = models.DateTimeField(blank=True, null=True, verbose_name='Finalizada Em')
+
+    class Meta:
+        verbose_name = 'Tarefa'
+        verbose_name_plural = 'Tarefas'
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"Tarefa {self.id} - {self.name} ({self.get_status_display()})"
+
+    def set_progress(self, done, total):
+        """Atualiza o progresso (e o sinal de vida) com um UPDATE direto, sem regravar o restante da tarefa."""
+        self.progress = min(100, int(done * 100 / total)) if total else 100
+        self.heartbeat_at = timezone.now()
+        Job.objects.filter(pk=self.pk).update(progress=self.progress, heartbeat_at=self.heartbeat_at)
+
+
+class DemandForecast(models.Model):
+    """
+    Demanda prevista de um serviço num dia, por filial (ver forecast.py). A tabela inteira é
+    recalculada pela tarefa forecast_demand; o dashboard só lê.
+    """
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE, verbose_name='Filial')
+    service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name='forecasts', verbose_name='Serviço')
+    date = models.DateField(verbose_name='Data')
+    expected = models.FloatField(verbose_name='Previsão')
+    booked = models.PositiveIntegerField(default=0, verbose_name='Já Agendados')
+    generated_at = models.DateTimeField(verbose_name='Gerada Em')
+
+    objects = BranchQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Previsão de Demanda'
+        verbose_name_plural = 'Previsões de Demanda'
+        constraints = [
+            models.UniqueConstraint(fields=['branch', 'date', 'service'], name='unique_forecast_branch_date_service'),
+        ]
+
+    def __str__(self):
+        return f"{self.service.name} em {self.date:%d/%m/%Y}: {self.expected:.1f}"
+
+
+class DuplicateCandidate(models.Model):
+    """Par de cadastros que parecem ser o mesmo tutor ou pet (ver duplicates.py)."""
+    STATUS_CHOICES = [
+        ('pending', 'Pendente'),
+        ('dismissed', 'Não é duplicado'),
+    ]
+
+    score = models.FloatField(verbose_name='Semelhança')
+    reasons = models.CharField(max_length=200, blank=True, verbose_name='Motivos')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', verbose_name='Situação')
+    found_at = models.DateTimeField(auto_now=True, verbose_name='Encontrado Em')
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return f"{self.first} / {self.second} ({self.score:.0%})"
+
+
+class TutorDuplicate(DuplicateCandidate):
+    # `first` é sempre o cadastro mais antigo (menor id), que é o mantido na mesclagem
+    first = models.ForeignKey(Tutor, on_delete=models.CASCADE, related_name='+', verbose_name='Tutor')
+    second = models.ForeignKey(Tutor, on_delete=models.CASCADE, related_name='+', verbose_name='Possível Duplicado')
+
+    class Meta:
+        verbose_name = 'Tutor Duplicado'
+        verbose_name_plural = 'Tutores Duplicados'
+        constraints = [
+            models.UniqueConstraint(fields=['first', 'second'], name='unique_tutor_duplicate'),
+        ]
+
+
+class PetDuplicate(DuplicateCandidate):
+    first = models.ForeignKey(Pet, on_delete=models.CASCADE, related_name='+', verbose_name='Pet')
+    second = models.ForeignKey(Pet, on_delete=models.CASCADE, related_name='+', verbose_name='Possível Duplicado')
+
+    class Meta:
+        verbose_name = 'Pet Duplicado'
+        verbose_name_plural = 'Pets Duplicados'
+        constraints = [
+            models.UniqueConstraint(fields=['first', 'second'], name='unique_pet_duplicate'),
+        ]
@@ -0,0 +1,129 @@
+"""
+Exportação em lote das notas de um período em PDF (fechamento do mês).
+
+As notas (inclusive as arquivadas) são lidas com os agendamentos, tutores, pets e serviços
+em poucas consultas e viram dicionários só com texto, que são renderizados por pdf.render_note
+num pool de processos (no comando export_notes; a view renderiza em série, sem criar processos
+dentro do servidor). Os valores são os gravados na nota na emissão. Cada nota renderizada fica num cache em disco identificado pelo hash
+do seu conteúdo, então rodar o mesmo fechamento de novo só renderiza o que mudou. A saída é
+um PDF único com todas as notas ou um ZIP com um PDF por nota.
+"""
+import hashlib
+import json
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, time as day_time, timedelta
+
+from django.conf import settings
+from django.db.models import Prefetch
+from django.utils import timezone
+from django.utils.formats import get_format
+
+from .models import ArchivedNote, Note, Service
+from .pdf import LAYOUT_VERSION, build_pdf, render_cached
+
+MIN_POOL_BATCH = 50
+POOL_CHUNK_SIZE = 20
+
+
+def notes_in_period(start, end, branch=None):
+    """Notas emitidas entre `start` e `end` (datas, inclusive), das tabelas principal e de arquivo."""
+    tz = timezone.get_current_timezone()
+    since = timezone.make_aware(datetime.combine(start, day_time.min), tz)
+    until = timezone.make_aware(datetime.combine(end + timedelta(days=1), day_time.min), tz)
+    services = Prefetch('scheduling__services', queryset=Service.objects.only('name', 'price').order_by('name'))
+    notes = []
+    for model in (Note, ArchivedNote):
+        queryset = (
+            model.objects.for_branch(branch)
+            .filter(issue_date__gte=since, issue_date__lt=until)
+            .select_related('branch', 'scheduling__tutor', 'scheduling__pet')
+            .prefetch_related(services)
+        )
+        notes.extend(queryset)
+    notes.sort(key=lambda note: (note.branch_id, note.branch_number))
+    return notes
+
+
+def money(value, decimal_separator):
+    # Mesmo resultado do floatformat:2 da nota em HTML, sem consultar o idioma ativo a cada valor
+    return f'{value:.2f}'.replace('.', decimal_separator)
+
+
+def note_payload(note, decimal_separator=','):
+    """Dicionário só com texto, que pode ir para outro processo e ter hash estável."""
+    scheduling = note.scheduling
+    tutor, pet = scheduling.tutor, scheduling.pet
+    # A nota guarda os valores da emissão; o agendamento pode ter sido repreçado depois
+    gross_total, total = note.gross_total_value, note.total_value
+    return {
+        'branch': note.branch.name,
+        'branch_number': note.branch_number,
+        'issue_date': timezone.localtime(note.issue_date).strftime('%d/%m/%Y %H:%M'),
+        'date_scheduling': scheduling.date_scheduling.strftime('%d/%m/%Y'),
+        'tutor': [('Nome', tutor.name), ('CPF', tutor.cpf), ('Telefone', tutor.phone_number), ('Email', tutor.email)],
+        'pet': [('Nome', pet.name), ('Espécie', pet.species), ('Raça', pet.race)],
+        'services': [(service.name, money(service.price, decimal_separator)) for service in scheduling.services.all()],
+        'gross_total': money(gross_total, decimal_separator),
+        'discount': money(gross_total - total, decimal_separator),
+        'total': money(total, decimal_separator),
+    }
+
+
+def content_hash(payload):
+    data = json.dumps([LAYOUT_VERSION, payload], ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+# ==================================================================================== #
+# Renderização
+# ==================================================================================== #
+def render_notes(notes, workers=None):
+    """
+    Páginas de cada nota, na ordem recebida, e estatísticas da execução. A consulta ao cache e a
+    renderização das notas que não estão nele rodam no pool de processos quando são muitas notas.
+    """
+    start = time.perf_counter()
+    cache_dir = str(settings.NOTE_PDF_CACHE_DIR)
+    tasks = []
+    decimal_separator = get_format('DECIMAL_SEPARATOR')
+    for note in notes:
+        payload = note_payload(note, decimal_separator)
+        tasks.append((cache_dir, content_hash(payload), payload))
+
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(tasks) >= MIN_POOL_BATCH:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(render_cached, tasks, chunksize=POOL_CHUNK_SIZE))
+    else:
+        results = [render_cached(task) for task in tasks]
+    rendered = [pages for pages, _ in results]
+    cached = sum(1 for _, hit in results if hit)
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        'notes': len(notes),
+        'rendered': len(notes) - cached,
+        'cached': cached,
+        'seconds': elapsed,
+        'notes_per_second': len(notes) / elapsed if elapsed else 0.0,
+    }
+    return rendered, stats
+
+
+def note_filename(note):
+    return f'nota-{note.branch_id}-{note.branch_number}.pdf'
+
+
+def write_merged(target, rendered):
+    """Um único PDF com todas as páginas de todas as notas."""
+    target.write(build_pdf([page for pages in rendered for page in pages]))
+
+
+def write_zip(target, notes, rendered):
+    """ZIP com um PDF por nota (os PDFs já são comprimidos, então vão sem nova compressão)."""
+    with zipfile.ZipFile(target, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for note, pages in zip(notes, rendered):
+            archive.writestr(note_filename(note), build_pdf(pages))
@@ -0,0 +1,178 @@
+"""
+Gerador de PDF mínimo para as notas de serviço, sem dependências externas.
+
+Usa só as fontes padrão do PDF (Helvetica e Helvetica-Bold, codificação WinAnsi, que cobre
+os acentos do português), texto e linhas. Uma página é um content stream; `build_pdf` junta
+quantos streams forem preciso num único documento, então as páginas podem ser geradas em
+processos separados e montadas depois. Este módulo não importa o Django: as funções de
+renderização recebem só dicionários com textos e rodam em qualquer processo do pool, junto
+com a leitura e a gravação do cache das páginas.
+"""
+import os
+import struct
+import zlib
+
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+MARGIN = 50
+FONTS = {False: 'F1', True: 'F2'}
+LAYOUT_VERSION = 1
+
+
+def escape(text):
+    encoded = str(text).encode('cp1252', errors='replace')
+    return encoded.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+class Page:
+    """Uma página: acumula os comandos de desenho e devolve o content stream."""
+
+    def __init__(self):
+        self.commands = []
+
+    def text(self, x, y, text, size=10, bold=False):
+        self.commands.append(
+            b'BT /%s %d Tf %.2f %.2f Td (%s) Tj ET' % (FONTS[bold].encode(), size, x, y, escape(text))
+        )
+
+    def line(self, x1, y1, x2, y2, width=0.5):
+        self.commands.append(b'%.2f w %.2f %.2f m %.2f %.2f l S' % (width, x1, y1, x2, y2))
+
+    def content(self):
+        return b'\n'.join(self.commands)
+
+
+def build_pdf(contents):
+    """Documento PDF com uma página por content stream."""
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        None,  # árvore de páginas, preenchida quando os ids das páginas forem conhecidos
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>',
+    ]
+    page_ids = []
+    for content in contents:
+        stream = zlib.compress(content)
+        objects.append(b'<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream' % (len(stream), stream))
+        objects.append(
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R '
+            b'/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> >>' % (PAGE_WIDTH, PAGE_HEIGHT, len(objects))
+        )
+        page_ids.append(len(objects))
+    kids = b' '.join(b'%d 0 R' % page_id for page_id in page_ids)
+    objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(page_ids))
+
+    output = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+    xref = len(output)
+    output += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    output += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    output += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(output)
+
+
+# ==================================================================================== #
+# Nota de serviço
+# ==================================================================================== #
+def render_note(note):
+    """
+    Content streams (uma ou mais páginas) da nota. `note` é o dicionário montado em
+    note_pdfs.note_payload, com todos os valores já formatados como texto.
+    """
+    pages = [Page()]
+    page = pages[0]
+    right = PAGE_WIDTH - MARGIN
+    value_x = right - 110
+    y = PAGE_HEIGHT - MARGIN
+
+    page.text(MARGIN, y, 'Nota de Serviço', size=20, bold=True)
+    y -= 18
+    page.text(MARGIN, y, f"{note['branch']} - Nº {note['branch_number']}", size=11)
+    page.text(value_x, y, note['issue_date'], size=9)
+    y -= 10
+    page.line(MARGIN, y, right, y, width=2)
+    y -= 28
+
+    for title, rows in (('Dados do Tutor', note['tutor']), ('Dados do Pet', note['pet'])):
+        page.text(MARGIN, y, title, size=13, bold=True)
+        y -= 6
+        page.line(MARGIN, y, right, y)
+        for label, value in rows:
+            y -= 16
+            page.text(MARGIN, y, f'{label}:', bold=True)
+            page.text(MARGIN + 70, y, value or '-')
+        y -= 28
+
+    page.text(MARGIN, y, f"Serviços Realizados - agendamento de {note['date_scheduling']}", size=13, bold=True)
+    y -= 6
+    page.line(MARGIN, y, right, y)
+    for name, price in note['services']:
+        if y < MARGIN + 150:
+            page = Page()
+            pages.append(page)
+            y = PAGE_HEIGHT - MARGIN
+            page.text(MARGIN, y, f"Nota {note['branch_number']} (continuação)", size=11, bold=True)
+            y -= 12
+        y -= 16
+        page.text(MARGIN, y, name)
+        page.text(value_x, y, f'R$ {price}')
+    y -= 8
+    page.line(MARGIN, y, right, y)
+
+    for label, value, bold in (
+        ('Valor Bruto:', f"R$ {note['gross_total']}", False),
+        ('Desconto:', f"- R$ {note['discount']}", False),
+        ('Valor Final:', f"R$ {note['total']}", True),
+    ):
+        y -= 18
+        page.text(value_x - 90, y, label, bold=True)
+        page.text(value_x, y, value, bold=bold)
+
+    y -= 70
+    page.line(PAGE_WIDTH / 2 - 150, y, PAGE_WIDTH / 2 + 150, y)
+    page.text(PAGE_WIDTH / 2 - 60, y - 14, 'Assinatura do Responsável', size=9)
+    return [page.content() for page in pages]
+
+
+# ==================================================================================== #
+# Cache em disco das páginas renderizadas
+# ==================================================================================== #
+def cache_path(cache_dir, key):
+    return os.path.join(cache_dir, key[:2], f'{key}.pages')
+
+
+def read_pages(path):
+    try:
+        with open(path, 'rb') as source:
+            data = source.read()
+    except FileNotFoundError:
+        return None
+    pages, offset = [], 0
+    while offset < len(data):
+        (length,) = struct.unpack_from('>I', data, offset)
+        pages.append(data[offset + 4:offset + 4 + length])
+        offset += 4 + length
+    return pages
+
+
+def write_pages(path, pages):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'wb') as target:
+        for page in pages:
+            target.write(struct.pack('>I', len(page)) + page)
+    os.replace(path + '.tmp', path)
+
+
+def render_cached(task):
+    """(cache_dir, chave, nota) -> (páginas, veio do cache). É a unidade de trabalho do pool."""
+    cache_dir, key, note = task
+    path = cache_path(cache_dir, key)
+    pages = read_pages(path)
+    if pages is not None:
+        return pages, True
+    pages = render_note(note)
+    write_pages(path, pages)
+    return pages, False
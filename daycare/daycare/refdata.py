@@ -0,0 +1,203 @@
+"""
+Cache em memória, por processo, dos dados de referência: estados, cidades e serviços.
+
+Essas tabelas quase não mudam e são lidas em todo formulário, no admin e no services_json.
+Cada processo guarda as tabelas inteiras (id -> objeto e a lista na ordem padrão) e as relê
+só quando a versão muda. A versão fica no Statistic 'reference-data-version' e é trocada por
+triggers do SQLite em qualquer INSERT, UPDATE ou DELETE nas três tabelas, então bulk_create,
+queryset.update() e a carga do IBGE também invalidam o cache de todos os workers. O valor é
+aleatório (não um contador) para um rollback nunca fazer uma versão antiga voltar a valer.
+
+Com o ReferenceCacheMiddleware, a versão é conferida uma vez por requisição (uma consulta pela
+chave primária), na primeira leitura do cache. Fora de requisições (comandos, tarefas) não há
+essa conferência e as leituras vão direto ao banco. Os objetos do cache são compartilhados: não devem ser alterados.
+"""
+import threading
+
+from django.db import connection, connections, router
+from django.db.models import Model
+from django.db.models.expressions import Col
+from django.db.models.lookups import Exact, In
+
+from .models import City, Service, State, Statistic
+
+MODELS = (State, City, Service)
+
+
+class ReferenceCache:
+
+    def __init__(self):
+        self.version = None
+        self.tables = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def check(self):
+        """Descarta as tabelas em memória se a versão no banco mudou desde a carga."""
+        if connection.vendor != 'sqlite':
+            return
+        (version,) = Statistic.read(Statistic.REFERENCE_DATA_VERSION)
+        if version != self.version:
+            with self.lock:
+                self.tables = {}
+                self.version = version
+
+    def clear(self):
+        with self.lock:
+            self.tables = {}
+            self.version = None
+
+    @property
+    def active(self):
+        """
+        Só vale dentro de uma requisição. A versão é conferida na primeira leitura do cache em cada
+        requisição, então as que não usam dados de referência não fazem a consulta.
+        """
+        state = getattr(self.local, 'state', None)
+        if state is None:
+            return False
+        if state == 'pending':
+            self.check()
+            self.local.state = 'checked'
+        return self.version is not None
+
+    def table(self, model):
+        """(lista na ordem padrão, dicionário por id) da tabela, carregada na primeira leitura."""
+        tables = self.tables
+        table = tables.get(model)
+        if table is None:
+            objects = list(model._base_manager.all())
+            table = tables[model] = (objects, {obj.pk: obj for obj in objects})
+        return table
+
+    def get(self, model, pk):
+        """Objeto pelo id, ou None se não existir."""
+        if not self.active:
+            return model._base_manager.filter(pk=pk).first()
+        try:
+            return self.table(model)[1].get(int(pk))
+        except (TypeError, ValueError):
+            return None
+
+    def conditions(self, queryset):
+        """
+        Filtros de `queryset` como [(campo, valores aceitos)], se ele puder ser atendido pela memória:
+        a tabela inteira ou só filtros de igualdade (ou `__in`) em campos da própria tabela, como
+        for_branch() e pk__in. Qualquer outra consulta (fatias, anotações, values(), only(), OR...)
+        retorna None e deve ir ao banco.
+        """
+        query = queryset.query
+        if (
+            not self.active or queryset.model not in MODELS or queryset._prefetch_related_lookups
+            or query.is_sliced or query.distinct or query.annotations or query.extra or query.values_select
+            or query.combinator or query.deferred_loading[0] or query.where.connector != 'AND' or query.where.negated
+        ):
+            return None
+        conditions = []
+        for lookup in query.where.children:
+            if not isinstance(lookup, (Exact, In)) or not isinstance(lookup.lhs, Col):
+                return None
+            if lookup.lhs.target.model is not queryset.model or hasattr(lookup.rhs, 'resolve_expression'):
+                return None
+            if isinstance(lookup, In):
+                values = {value.pk if isinstance(value, Model) else value for value in lookup.rhs}
+            else:
+                values = {lookup.rhs.pk if isinstance(lookup.rhs, Model) else lookup.rhs}
+            conditions.append((lookup.lhs.target.attname, values))
+        return conditions
+
+    def filter(self, queryset):
+        """Objetos de `queryset` tirados da memória, ou None se ele não puder ser atendido por ela."""
+        conditions = self.conditions(queryset)
+        if conditions is None:
+            return None
+        objects = [
+            obj for obj in self.table(queryset.model)[0]
+            if all(getattr(obj, attname) in values for attname, values in conditions)
+        ]
+        for name in reversed(queryset.query.order_by):
+            field = name.lstrip('-')
+            if field != 'pk' and field not in {f.name for f in queryset.model._meta.concrete_fields}:
+                return None
+            objects.sort(key=lambda obj: getattr(obj, field), reverse=name.startswith('-'))
+        return objects
+
+    def find(self, queryset, pk, conditions):
+        """Objeto de `queryset` com o id `pk`, ou None; `conditions` vem de conditions(queryset)."""
+        try:
+            obj = self.table(queryset.model)[1].get(int(pk))
+        except (TypeError, ValueError):
+            return None
+        if obj is None or not all(getattr(obj, attname) in values for attname, values in conditions):
+            return None
+        return obj
+
+
+cache = ReferenceCache()
+
+
+def cached(queryset):
+    """Lista de `queryset`, da memória quando possível (ver ReferenceCache.filter)."""
+    objects = cache.filter(queryset)
+    return list(queryset) if objects is None else objects
+
+
+class ReferenceCacheMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        cache.local.state = 'pending'
+        try:
+            return self.get_response(request)
+        finally:
+            cache.local.state = None
+
+
+# ==================================================================================== #
+# Triggers de versão
+# ==================================================================================== #
+def new_version():
+    table = Statistic._meta.db_table
+    return (
+        f'INSERT INTO "{table}" ("name", "value") VALUES (\'{Statistic.REFERENCE_DATA_VERSION}\', random()) '
+        f'ON CONFLICT ("name") DO UPDATE SET "value" = excluded."value";'
+    )
+
+
+def all_triggers():
+    triggers = []
+    for model in MODELS:
+        table = model._meta.db_table
+        for event in ('insert', 'update', 'delete'):
+            name = f'refdata_{model._meta.model_name}_{event}'
+            triggers.append((
+                name, f'CREATE TRIGGER "{name}" AFTER {event.upper()} ON "{table}" BEGIN {new_version()} END',
+            ))
+    return triggers
+
+
+def drop_triggers(using='default', **kwargs):
+    """Remove os triggers antes das migrações (pre_migrate)."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite' or not router.allow_migrate_model(using, Statistic):
+        return
+    with connection.cursor() as cursor:
+        for name, _ in all_triggers():
+            cursor.execute(f'DROP TRIGGER IF EXISTS "{name}"')
+
+
+def install_triggers(using='default', **kwargs):
+    """Troca a versão (a migração pode ter mudado os dados) e recria os triggers. Conectado ao post_migrate."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite' or not router.allow_migrate_model(using, Statistic):
+        return
+    tables = set(connection.introspection.table_names())
+    if not {model._meta.db_table for model in (*MODELS, Statistic)} <= tables:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(new_version())
+        for name, sql in all_triggers():
+            cursor.execute(f'DROP TRIGGER IF EXISTS "{name}"')
+            cursor.execute(sql)
@@ -0,0 +1,93 @@
+"""
+Lembretes por email dos agendamentos do dia seguinte.
+
+Os agendamentos são lidos com uma única consulta (com tutor e pet), as mensagens são
+montadas em lotes a partir de um template já compilado e cada lote é enviado por uma
+única conexão do backend de email, uma mensagem por vez: uma falha no meio do lote não
+marca como falhos os emails já entregues. O resultado fica em Reminder, um por agendamento,
+então rodar de novo só reenvia o que ainda não foi enviado ou falhou.
+"""
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Q
+from django.template.loader import get_template
+from django.utils import timezone
+
+from .models import Reminder, Scheduling
+
+BATCH_SIZE = 200
+SUBJECT = 'Lembrete: agendamento de {pet} amanhã no Pet Maniacos'
+
+
+def pending_reminders(day):
+    """Agendamentos do dia com tutor com email e sem lembrete enviado."""
+    return (
+        Scheduling.objects
+        .filter(date_scheduling=day, tutor__email__isnull=False)
+        .exclude(tutor__email='')
+        .filter(Q(reminder__isnull=True) | Q(reminder__status='failed'))
+        .select_related('tutor', 'pet')
+        .order_by('pk')
+    )
+
+
+def build_message(template, scheduling, connection):
+    body = template.render({'scheduling': scheduling, 'tutor': scheduling.tutor, 'pet': scheduling.pet})
+    return EmailMessage(
+        subject=SUBJECT.format(pet=scheduling.pet.name),
+        body=body,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[scheduling.tutor.email],
+        connection=connection,
+    )
+
+
+def send_batch(batch, template):
+    """Envia o lote pela mesma conexão e grava o resultado de cada mensagem. Retorna (enviados, com falha)."""
+    connection = get_connection()
+    reminders = []
+    try:
+        for scheduling in batch:
+            status, error = 'sent', None
+            try:
+                connection.open()  # mantém a conexão aberta entre as mensagens do lote
+                connection.send_messages([build_message(template, scheduling, connection)])
+            except Exception as exc:
+                status, error = 'failed', str(exc)
+                # A conexão pode ter ficado num estado inválido: a próxima mensagem abre outra
+                connection.close()
+            reminders.append(Reminder(
+                scheduling=scheduling, email=scheduling.tutor.email, status=status, sent_at=timezone.now(), error=error,
+            ))
+    finally:
+        connection.close()
+        Reminder.objects.bulk_create(
+            reminders,
+            update_conflicts=True,
+            unique_fields=['scheduling'],
+            update_fields=['email', 'status', 'sent_at', 'error'],
+        )
+    sent = sum(1 for reminder in reminders if reminder.status == 'sent')
+    return sent, len(reminders) - sent
+
+
+def send_reminders(day=None, batch_size=BATCH_SIZE, progress=None):
+    """
+    Envia os lembretes dos agendamentos de `day` (padrão: amanhã).
+    Retorna (enviados, com falha).
+    """
+    day = day or date.today() + timedelta(days=1)
+    template = get_template('reminder_email.txt')
+    schedulings = list(pending_reminders(day))
+
+    sent = failed = 0
+    for start in range(0, len(schedulings), batch_size):
+        batch = schedulings[start:start + batch_size]
+        batch_sent, batch_failed = send_batch(batch, template)
+        sent += batch_sent
+        failed += batch_failed
+        if progress:
+            progress(start + len(batch), len(schedulings))
+    return sent, failed
@@ -0,0 +1,151 @@
+"""
+Normalização e filtros de busca por CPF e telefone, e as chaves de nome e email usadas na
+detecção de cadastros duplicados (duplicates.py).
+
+Tutor.cpf e Tutor.phone_number são texto livre ("123.456.789-00", "(11) 98765-4321"); as
+colunas cpf_digits e phone_digits guardam só os dígitos e têm índice. As buscas usam
+igualdade ou prefixo nessas colunas, então qualquer formatação digitada no balcão encontra
+o tutor e a consulta é resolvida pelo índice.
+"""
+import re
+import unicodedata
+
+from django.db.models import Q
+
+NON_DIGITS = re.compile(r'\D')
+# CPF ou telefone digitado com qualquer formatação: só dígitos, espaços e . - / ( ) +
+CONTACT_QUERY = re.compile(r'[\d\s.\-/()+]*\d[\d\s.\-/()+]*')
+COUNTRY_CODE = '55'
+NAME_STOPWORDS = {'da', 'das', 'de', 'do', 'dos', 'e'}
+# Regras fonéticas simplificadas do português, aplicadas em ordem sobre o nome sem acentos
+PHONETIC_RULES = [
+    (re.compile(pattern), replacement) for pattern, replacement in (
+        (r'ph', 'f'), (r'[cs]h', 'x'), (r'lh', 'l'), (r'nh', 'n'), (r'qu', 'k'), (r'gu(?=[ei])', 'g'),
+        (r'c(?=[ei])', 's'), (r'g(?=[ei])', 'j'), (r'[cqk]', 'k'), (r'z', 's'), (r'y', 'i'), (r'w', 'v'),
+        (r'h', ''), (r'(.)\1+', r'\1'),
+    )
+]
+
+
+def only_digits(value):
+    return NON_DIGITS.sub('', value or '')
+
+
+def normalize_phone(value):
+    """Dígitos do telefone sem o código do país (+55), para DDD + número casarem com ou sem ele."""
+    digits = only_digits(value)
+    # Com '+' o código é explícito (também vale para buscas por prefixo); sem ele, só pelo tamanho
+    explicit = (value or '').lstrip().startswith('+')
+    if digits.startswith(COUNTRY_CODE) and (explicit or len(digits) in (12, 13)):
+        digits = digits[len(COUNTRY_CODE):]
+    return digits
+
+
+def name_words(value):
+    """Palavras do nome em minúsculas, sem acentos e sem 'da', 'de', 'dos'..."""
+    text = unicodedata.normalize('NFKD', (value or '').lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return [word for word in re.findall(r'[a-z]+', text) if word not in NAME_STOPWORDS]
+
+
+def phonetic(word):
+    """
+    Código fonético da palavra: regras do português e, depois da primeira letra, sem vogais.
+    'Thiago' e 'Tiago', 'Souza' e 'Sousa', 'Luiz' e 'Luis' têm o mesmo código.
+    """
+    for pattern, replacement in PHONETIC_RULES:
+        word = pattern.sub(replacement, word)
+    return word[:1] + re.sub(r'[aeiou]', '', word[1:])
+
+
+def name_key(value):
+    """Chave de bloco do nome: código fonético do primeiro e do último nome."""
+    words = name_words(value)
+    if not words:
+        return ''
+    return ' '.join(phonetic(word) for word in dict.fromkeys((words[0], words[-1])))
+
+
+def email_key(value):
+    """Parte local do email sem pontos e sem o sufixo '+...' (joao.silva+pet@ e joaosilva@ casam)."""
+    local = (value or '').strip().lower().partition('@')[0]
+    return local.partition('+')[0].replace('.', '')
+
+
+def prefix_range(field, prefix):
+    """Filtro de prefixo como intervalo (campo >= prefixo e < próximo prefixo), que usa o índice do campo."""
+    if not prefix:
+        raise ValueError('O prefixo da busca não pode ser vazio.')
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return Q(**{f'{field}__gte': prefix, f'{field}__lt': upper})
+
+
+def contact_condition(query, prefix=''):
+    """
+    Condição de busca do tutor por CPF ou telefone a partir do texto digitado.
+    `prefix` é o caminho até o tutor (ex.: 'tutor__'). Retorna None se o texto não for um CPF ou
+    telefone (tiver letras, por exemplo): nesse caso a busca é pelo nome. As duas não são
+    combinadas num OR, porque o LIKE do nome impediria o uso dos índices de dígitos.
+    """
+    if not CONTACT_QUERY.fullmatch(query or ''):
+        return None
+    digits = only_digits(query)
+    condition = prefix_range(f'{prefix}cpf_digits', digits)
+    # '+55' sozinho é só o código do país: não sobra prefixo de telefone para buscar
+    phone = normalize_phone(query)
+    if phone:
+        condition |= prefix_range(f'{prefix}phone_digits', phone)
+    return condition
+
+
+def backfill_contact_digits(model, batch_size=500):
+    """
+    Preenche cpf_digits e phone_digits dos tutores em lotes por pk (também usado na migração).
+    Se dois tutores da mesma filial tiverem o mesmo CPF escrito de formas diferentes, só o mais
+    antigo recebe os dígitos. Retorna (quantidade atualizada, pks em conflito).
+    """
+    claimed = set()
+    conflicts = []
+    updated = 0
+    last_pk = 0
+    while True:
+        batch = list(model._base_manager.filter(pk__gt=last_pk).order_by('pk')[:batch_size])
+        if not batch:
+            break
+        changed = []
+        for tutor in batch:
+            cpf_digits = only_digits(tutor.cpf) or None
+            if cpf_digits is not None:
+                if (tutor.branch_id, cpf_digits) in claimed:
+                    conflicts.append(tutor.pk)
+                    cpf_digits = None
+                else:
+                    claimed.add((tutor.branch_id, cpf_digits))
+            phone_digits = normalize_phone(tutor.phone_number)
+            if (tutor.cpf_digits, tutor.phone_digits) != (cpf_digits, phone_digits):
+                tutor.cpf_digits, tutor.phone_digits = cpf_digits, phone_digits
+                changed.append(tutor)
+        model._base_manager.bulk_update(changed, ['cpf_digits', 'phone_digits'])
+        updated += len(changed)
+        last_pk = batch[-1].pk
+    return updated, conflicts
+
+
+def backfill_duplicate_keys(model, batch_size=500):
+    """Preenche name_key e email_key dos tutores em lotes por pk (também usado na migração)."""
+    updated = 0
+    last_pk = 0
+    while True:
+        batch = list(model._base_manager.filter(pk__gt=last_pk).order_by('pk')[:batch_size])
+        if not batch:
+            break
+        changed = []
+        for tutor in batch:
+            keys = (name_key(tutor.name), email_key(tutor.email))
+            if (tutor.name_key, tutor.email_key) != keys:
+                tutor.name_key, tutor.email_key = keys
+                changed.append(tutor)
+        model._base_manager.bulk_update(changed, ['name_key', 'email_key'])
+        updated += len(changed)
+        last_pk = batch[-1].pk
+    return updated
@@ -0,0 +1,211 @@
+"""
+Log de consultas lentas com o plano de execução.
+
+O SlowQueryMiddleware instala um execute_wrapper nas conexões durante a requisição. Toda
+consulta que passar de settings.SLOW_QUERY_MS é registrada no logger 'daycare.slow_queries'
+(um arquivo rotativo por processo, configurado em LOGGING) como uma linha JSON com o SQL, o
+tipo e o tamanho de cada parâmetro (nunca o valor: sessões, CPFs e emails não vão para o log),
+a rota que a executou e a impressão digital do formato da consulta: o SQL sem valores
+literais e com as listas do IN recolhidas. O EXPLAIN QUERY PLAN é capturado só na primeira
+vez que cada formato aparece no processo. `python manage.py slow_queries` agrupa o log por
+formato e ordena pelo tempo total.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import ExitStack
+from logging.handlers import RotatingFileHandler
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+logger = logging.getLogger('daycare.slow_queries')
+
+UNMATCHED = 'unmatched'
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+WHITESPACE = re.compile(r'\s+')
+
+explained = set()
+explained_lock = threading.Lock()
+
+
+def normalize(sql):
+    """Formato da consulta: valores trocados por '?' e listas do IN recolhidas em '(...)'."""
+    shape = STRING_LITERAL.sub('?', sql)
+    shape = shape.replace('%s', '?')
+    shape = NUMBER_LITERAL.sub('?', shape)
+    shape = PLACEHOLDER_LIST.sub('(...)', shape)
+    return WHITESPACE.sub(' ', shape).strip()
+
+
+def fingerprint(shape):
+    return hashlib.sha1(shape.encode()).hexdigest()[:12]
+
+
+def describe_param(value):
+    """Tipo do parâmetro e, em textos e bytes, o tamanho: 'str(14)', 'int', 'None'."""
+    if value is None:
+        return 'None'
+    if isinstance(value, (str, bytes)):
+        return f'{type(value).__name__}({len(value)})'
+    return type(value).__name__
+
+
+def format_params(params):
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {name: describe_param(value) for name, value in params.items()}
+    return [describe_param(value) for value in params]
+
+
+def explain(connection, sql, params):
+    """Plano da consulta; None se o banco não conseguir explicá-la."""
+    prefix = connection.ops.explain_query_prefix()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}', params)
+            # No SQLite as primeiras colunas são ids da árvore do plano; o texto fica na última
+            return [str(row[-1]) for row in cursor.fetchall()]
+    except Exception:
+        return None
+
+
+def first_time(key):
+    with explained_lock:
+        if key in explained:
+            return False
+        explained.add(key)
+        return True
+
+
+class ProcessFileHandler(RotatingFileHandler):
+    """
+    RotatingFileHandler com um arquivo por processo (`<filename>.<pid>`): a rotação renomeia o
+    arquivo, o que não é seguro com vários workers gravando no mesmo. Um processo criado por
+    fork depois da configuração do logging passa a gravar no próprio arquivo na primeira linha.
+    """
+
+    def __init__(self, filename, *args, **kwargs):
+        self.base_filename = os.fspath(filename)
+        self.pid = os.getpid()
+        super().__init__(f'{self.base_filename}.{self.pid}', *args, **kwargs)
+
+    def emit(self, record):
+        if self.pid != os.getpid():
+            self.acquire()
+            try:
+                if self.stream:
+                    self.stream.close()
+                    self.stream = None
+                self.pid = os.getpid()
+                self.baseFilename = os.path.abspath(f'{self.base_filename}.{self.pid}')
+            finally:
+                self.release()
+        super().emit(record)
+
+
+class SlowQueryLogger:
+    """execute_wrapper que registra as consultas acima do limite de uma requisição."""
+
+    def __init__(self, connection, request, threshold_ms):
+        self.connection = connection
+        self.request = request
+        self.threshold = threshold_ms / 1000
+        self.explain_prefix = connection.ops.explain_query_prefix()
+
+    def view_name(self):
+        match = getattr(self.request, 'resolver_match', None)
+        return (match.view_name if match else None) or UNMATCHED
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.startswith(self.explain_prefix):
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        failed = True
+        try:
+            result = execute(sql, params, many, context)
+            failed = False
+            return result
+        finally:
+            duration = time.perf_counter() - start
+            if duration >= self.threshold:
+                self.log(sql, params, many, duration, failed)
+
+    def log(self, sql, params, many, duration, failed):
+        shape = normalize(sql)
+        key = fingerprint(shape)
+        record = {
+            'time': timezone.now().isoformat(),
+            'fingerprint': key,
+            'duration_ms': round(duration * 1000, 3),
+            'view': self.view_name(),
+            'sql': sql,
+            'params': None if many else format_params(params),
+            'shape': shape,
+        }
+        # Não explica executemany nem consultas que falharam (a transação pode estar quebrada)
+        if not many and not failed and first_time((self.connection.alias, key)):
+            record['plan'] = explain(self.connection, sql, params)
+        logger.warning(json.dumps(record, ensure_ascii=False, default=str))
+
+
+class SlowQueryMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        threshold = getattr(settings, 'SLOW_QUERY_MS', None)
+        if threshold is None:
+            return self.get_response(request)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(SlowQueryLogger(connection, request, threshold)))
+            return self.get_response(request)
+
+
+# ==================================================================================== #
+# Relatório
+# ==================================================================================== #
+def read_log(paths):
+    """Registros das linhas JSON dos arquivos; linhas que não são JSON são ignoradas."""
+    for path in paths:
+        try:
+            source = open(path, encoding='utf-8')
+        except FileNotFoundError:
+            continue
+        with source:
+            for line in source:
+                start = line.find('{')
+                if start == -1:
+                    continue
+                try:
+                    yield json.loads(line[start:])
+                except ValueError:
+                    continue
+
+
+def rank(records):
+    """Agrupa por formato de consulta, ordenado pelo tempo total (maior primeiro)."""
+    shapes = {}
+    for record in records:
+        shape = shapes.setdefault(record['fingerprint'], {
+            'fingerprint': record['fingerprint'], 'shape': record.get('shape', ''), 'count': 0,
+            'total_ms': 0.0, 'max_ms': 0.0, 'views': set(), 'plan': None,
+        })
+        shape['count'] += 1
+        shape['total_ms'] += record['duration_ms']
+        shape['max_ms'] = max(shape['max_ms'], record['duration_ms'])
+        shape['views'].add(record.get('view', UNMATCHED))
+        if shape['plan'] is None and record.get('plan'):
+            shape['plan'] = record['plan']
+    return sorted(shapes.values(), key=lambda shape: shape['total_ms'], reverse=True)
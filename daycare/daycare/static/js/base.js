@@ -0,0 +1,53 @@
+// Sidebar: recolher/expandir no desktop, abrir/fechar no mobile e lembrar o estado.
+document.addEventListener('DOMContentLoaded', () => {
+    const sidebar = document.getElementById('sidebar');
+    const desktopToggle = document.getElementById('desktop-sidebar-toggle');
+    const mobileToggle = document.getElementById('mobile-sidebar-toggle');
+    const overlay = document.querySelector('.overlay');
+    const sidebarLogo = document.getElementById('sidebar-logo');
+    const SIDEBAR_STATE_KEY = 'sidebarCollapsedState';
+
+    if (sidebar) {
+        const toggleLogo = () => {
+            if (!sidebarLogo) return;
+            const isCollapsed = sidebar.classList.contains('collapsed');
+            sidebarLogo.src = isCollapsed ? sidebarLogo.dataset.collapsedSrc : sidebarLogo.dataset.fullSrc;
+        };
+
+        const applySavedState = () => {
+            const savedState = localStorage.getItem(SIDEBAR_STATE_KEY);
+            if (savedState === 'true') sidebar.classList.add('collapsed');
+            else sidebar.classList.remove('collapsed');
+            toggleLogo();
+        };
+
+        const saveNewState = () => {
+            localStorage.setItem(SIDEBAR_STATE_KEY, sidebar.classList.contains('collapsed').toString());
+        };
+
+        applySavedState();
+
+        desktopToggle?.addEventListener('click', () => {
+            sidebar.classList.toggle('collapsed');
+            toggleLogo();
+            saveNewState();
+        });
+
+        mobileToggle?.addEventListener('click', () => {
+            sidebar.classList.toggle('open');
+            if (overlay) overlay.style.display = sidebar.classList.contains('open') ? 'block' : 'none';
+        });
+
+        overlay?.addEventListener('click', () => {
+            sidebar.classList.remove('open');
+            overlay.style.display = 'none';
+        });
+
+        window.addEventListener('resize', () => {
+            if (window.innerWidth >= 992 && sidebar.classList.contains('open')) {
+                sidebar.classList.remove('open');
+                overlay.style.display = 'none';
+            }
+        });
+    }
+});
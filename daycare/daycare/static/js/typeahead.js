@@ -0,0 +1,85 @@
+// Busca incremental para selects com data-lookup-url (ver TypeaheadSelect em forms.py).
+// O <select> só contém a opção escolhida; as sugestões vêm do endpoint JSON.
+document.addEventListener('DOMContentLoaded', function () {
+    const DEBOUNCE_MS = 250;
+    const MIN_LENGTH = 2;
+
+    document.querySelectorAll('select[data-lookup-url]').forEach(select => {
+        const wrapper = document.createElement('div');
+        wrapper.className = 'position-relative mb-1';
+
+        const input = document.createElement('input');
+        input.type = 'search';
+        input.className = 'form-control';
+        input.placeholder = 'Digite para buscar...';
+        input.autocomplete = 'off';
+
+        const menu = document.createElement('div');
+        menu.className = 'list-group position-absolute w-100 shadow-sm d-none';
+        menu.style.zIndex = 1050;
+
+        wrapper.append(input, menu);
+        select.parentNode.insertBefore(wrapper, select);
+
+        let timer = null;
+        let controller = null;
+
+        const hideMenu = () => menu.classList.add('d-none');
+
+        const choose = (item) => {
+            select.innerHTML = '';
+            select.add(new Option(item.text, item.id, true, true));
+            // O smart_selects escuta o change do tutor para recarregar os pets
+            select.dispatchEvent(new Event('change', { bubbles: true }));
+            input.value = '';
+            hideMenu();
+        };
+
+        const render = (results) => {
+            menu.innerHTML = '';
+            if (!results.length) {
+                const empty = document.createElement('span');
+                empty.className = 'list-group-item text-muted small';
+                empty.textContent = 'Nenhum resultado encontrado.';
+                menu.appendChild(empty);
+            }
+            results.forEach(item => {
+                const option = document.createElement('button');
+                option.type = 'button';
+                option.className = 'list-group-item list-group-item-action';
+                option.textContent = item.text;
+                option.addEventListener('mousedown', (event) => {
+                    event.preventDefault();
+                    choose(item);
+                });
+                menu.appendChild(option);
+            });
+            menu.classList.remove('d-none');
+        };
+
+        const search = (term) => {
+            if (controller) controller.abort();
+            controller = new AbortController();
+            const url = select.dataset.lookupUrl + '?q=' + encodeURIComponent(term);
+            fetch(url, { signal: controller.signal, headers: { 'Accept': 'application/json' } })
+                .then(response => response.json())
+                .then(data => render(data.results))
+                .catch(error => { if (error.name !== 'AbortError') hideMenu(); });
+        };
+
+        input.addEventListener('input', () => {
+            clearTimeout(timer);
+            const term = input.value.trim();
+            if (term.length < MIN_LENGTH) {
+                hideMenu();
+                return;
+            }
+            timer = setTimeout(() => search(term), DEBOUNCE_MS);
+        });
+
+        input.addEventListener('blur', hideMenu);
+        input.addEventListener('keydown', (event) => {
+            if (event.key === 'Escape') hideMenu();
+        });
+    });
+});
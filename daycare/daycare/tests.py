@@ -1,3 +1,1124 @@
-from django.test import TestCase
+import gzip
+import importlib
+import io
+import json
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import zipfile
+from contextlib import closing
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import Permission, User
+from django.core import mail
+from django.core.exceptions import ImproperlyConfigured
+from django.core.mail.backends import locmem
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, connections, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import assets, backup, jobs, metrics, note_pdfs, slowlog, views
+from .archive import archive_before
+from .forecast import refresh_forecast
+from .deletion import purge_deleted
+from .duplicates import find_duplicates, merge_tutors
+from .forms import PetForm
+from .localities import load_localities
+from .models import (
+    ArchivedNote, ArchivedScheduling, Branch, BranchMembership, ChangeLog, Job, Note, NoteSequence, Pet, Reminder, Scheduling, Service, Tutor,
+    State, City, DemandForecast, TutorDuplicate, PetDuplicate, SchedulingSeries, Statistic, NameField,
+)
+from .reminders import send_reminders
+from .search import contact_condition, prefix_range
+from .totals import verify_totals
+
+
+def create_scheduling(tutor, pet, status='Sim'):
+    return Scheduling.objects.create(tutor=tutor, pet=pet, date_scheduling=date(2025, 1, 1), status=status)
+
+
+class NoteIssueTests(TestCase):
+
+    def setUp(self):
+        self.tutor = Tutor.objects.create(name='Ana', cpf='111.111.111-11')
+        self.pet = Pet.objects.create(name='Rex', species='Cão', tutor=self.tutor)
+
+    def test_issue_is_idempotent(self):
+        scheduling = create_scheduling(self.tutor, self.pet)
+        note, created = Note.objects.issue(scheduling)
+        again, created_again = Note.objects.issue(scheduling)
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertEqual(note.pk, again.pk)
+        self.assertEqual(Note.objects.count(), 1)
+
+    def test_issue_many_continues_sequence(self):
+        first, _ = Note.objects.issue(create_scheduling(self.tutor, self.pet))
+        for _ in range(3):
+            create_scheduling(self.tutor, self.pet)
+        create_scheduling(self.tutor, self.pet, status='Não')
+        notes = Scheduling.objects.all().issue_notes()
+        self.assertEqual([n.note_number for n in notes], [first.note_number + i for i in (1, 2, 3)])
+        self.assertEqual(NoteSequence.objects.get(name='note').last_value, first.note_number + 3)
+
+    def test_number_collision_is_not_taken_for_an_existing_note(self):
+        first = create_scheduling(self.tutor, self.pet)
+        # Nota gravada por fora da sequência, com o próximo número
+        Note.objects.create(
+            scheduling=first, note_number=NoteSequence.lock().last_value + 1,
+            branch_id=first.branch_id, branch_number=1000,
+        )
+        with self.assertRaises(IntegrityError):
+            Note.objects.issue(create_scheduling(self.tutor, self.pet))
+
+    def test_admin_cannot_add_or_change_notes(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        note, _ = Note.objects.issue(create_scheduling(self.tutor, self.pet))
+        self.assertEqual(self.client.get(reverse('admin:daycare_note_add')).status_code, 403)
+        self.client.post(reverse('admin:daycare_note_change', args=[note.pk]), {'branch_number': 99})
+        self.assertEqual(Note.objects.get(pk=note.pk).branch_number, note.branch_number)
+
+    def test_issue_notes_view_rejects_invalid_period(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        create_scheduling(self.tutor, self.pet)
+        url = reverse('issue_notes')
+        for data in ({'start': 'abc'}, {'start': '2025-01-01', 'end': '2025-13-01'}, {'start': '2025-01-02', 'end': '2025-01-01'}):
+            self.assertEqual(self.client.post(url, data).status_code, 400, data)
+        self.assertFalse(Note.objects.exists())
+
+        response = self.client.post(url, {'start': '2025-01-01'}).json()
+        self.assertEqual((response['end'], response['count']), ('2025-01-01', 1))
+        self.assertEqual(response['notes'], [{'branch': Branch.DEFAULT_NAME, 'number': 1}])
+
+    def test_issue_notes_command(self):
+        create_scheduling(self.tutor, self.pet)
+        Scheduling.objects.create(tutor=self.tutor, pet=self.pet, date_scheduling=date(2025, 1, 3), status='Sim')
+        for options in ({'start': 'abc'}, {'start': '2025-01-02', 'end': '2025-01-01'}):
+            with self.assertRaises(CommandError):
+                call_command('issue_notes', **options)
+
+        out = io.StringIO()
+        call_command('issue_notes', start='2025-01-01', end='2025-01-02', stdout=out)
+        self.assertIn(f'{Branch.DEFAULT_NAME} 1\n', out.getvalue())
+        self.assertIn('1 nota(s) emitida(s) entre 01/01/2025 e 02/01/2025.', out.getvalue())
+        self.assertEqual(Note.objects.get().scheduling.date_scheduling, date(2025, 1, 1))
+
+
+class ConcurrentNoteIssueTests(TransactionTestCase):
+    THREADS = 16
+    SCHEDULINGS = 40
+
+    def test_concurrent_issue_has_no_duplicates_or_gaps(self):
+        tutor = Tutor.objects.create(name='Ana', cpf='111.111.111-11')
+        pet = Pet.objects.create(name='Rex', species='Cão', tutor=tutor)
+        schedulings = [create_scheduling(tutor, pet) for _ in range(self.SCHEDULINGS)]
+        start_value = NoteSequence.lock().last_value
+
+        barrier = threading.Barrier(self.THREADS)
+        errors = []
+
+        def cashier():
+            try:
+                barrier.wait()
+                # Todos os caixas tentam emitir todas as notas, na mesma ordem
+                for scheduling in schedulings:
+                    Note.objects.issue(scheduling)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=cashier) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        numbers = sorted(Note.objects.values_list('note_number', flat=True))
+        self.assertEqual(numbers, list(range(start_value + 1, start_value + self.SCHEDULINGS + 1)))
+        self.assertEqual(Note.objects.values('scheduling').distinct().count(), self.SCHEDULINGS)
+
+
+class ChangeFeedTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        self.start = ChangeLog.objects.order_by('sequence').values_list('sequence', flat=True).last() or 0
+        self.tutor = Tutor.objects.create(name='Ana', cpf='111.111.111-11')
+        self.pet = Pet.objects.create(name='Rex', species='Cão', tutor=self.tutor)
+        self.scheduling = create_scheduling(self.tutor, self.pet, status='Não')
+        Tutor.objects.filter(pk=self.tutor.pk).update(name='Ana Souza')
+
+    def get_feed(self, **params):
+        self.response = self.client.get(reverse('changes_feed'), {'since': self.start, **params}, HTTP_ACCEPT_ENCODING='gzip')
+        # Respostas muito curtas não compensam a compressão
+        if self.response.get('Content-Encoding') != 'gzip':
+            return json.loads(self.response.content)
+        return json.loads(gzip.decompress(self.response.content))
+
+    def test_feed_pages_by_cursor(self):
+        first = self.get_feed(limit=2)
+        self.assertEqual(self.response['Content-Encoding'], 'gzip')
+        self.assertEqual([(c[1], c[3]) for c in first['changes']], [('tutor', 'I'), ('scheduling', 'I')])
+        self.assertTrue(first['has_more'])
+        self.assertEqual(first['next'], first['changes'][-1][0])
+
+        rest = self.get_feed(since=first['next'])
+        self.assertEqual([(c[1], c[3]) for c in rest['changes']], [('tutor', 'U')])
+        self.assertEqual(rest['changes'][0][4]['name'], 'Ana Souza')
+        self.assertFalse(rest['has_more'])
+        self.assertEqual(self.get_feed(since=rest['next'])['changes'], [])
+        self.assertEqual(self.client.get(reverse('changes_feed'), {'limit': 'x'}).status_code, 400)
+
+    def test_changes_command_reads_every_batch(self):
+        out, err = io.StringIO(), io.StringIO()
+        call_command('changes', since=self.start, limit=1, all=True, stdout=out, stderr=err)
+        lines = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([line[3] for line in lines], ['I', 'I', 'U'])
+        self.assertEqual(err.getvalue().strip(), f'next={lines[-1][0]}')
+
+    def test_archiving_is_published_as_archive_not_delete(self):
+        Scheduling.objects.filter(pk=self.scheduling.pk).mark_as_paid()
+        note, _ = Note.objects.issue(Scheduling.objects.get(pk=self.scheduling.pk))
+        archive_before(date(2026, 1, 1))
+        actions = {(c[1], c[2]): c[3] for c in self.get_feed(limit=100)['changes']}
+        self.assertEqual(actions[('scheduling', self.scheduling.pk)], 'A')
+        self.assertEqual(actions[('note', note.pk)], 'A')
+
+
+class SchedulingSeriesTests(TestCase):
+
+    def setUp(self):
+        # Próxima segunda-feira, dentro do horizonte padrão da expansão
+        self.monday = date.today() + timedelta(days=7 - date.today().weekday())
+        self.tutor = Tutor.objects.create(name='Ana', cpf='111.111.111-11')
+        self.pet = Pet.objects.create(name='Rex', species='Cão', tutor=self.tutor)
+        self.services = [Service.objects.create(name='Banho', price='50.00'), Service.objects.create(name='Tosa', price='30.00')]
+
+    def create_series(self, **kwargs):
+        series = SchedulingSeries.objects.create(
+            tutor=self.tutor, pet=self.pet, weekdays='02', start_date=self.monday, percentage_discount=10, **kwargs,
+        )
+        series.services.set(self.services)
+        return series
+
+    def assert_occurrences(self, series, days):
+        schedulings = Scheduling.objects.filter(series=series).order_by('date_scheduling')
+        self.assertEqual([s.date_scheduling for s in schedulings], [self.monday + timedelta(days=d) for d in days])
+        for scheduling in schedulings:
+            self.assertEqual(set(scheduling.services.all()), set(self.services))
+            self.assertEqual((scheduling.gross_total_value, scheduling.total_value), (Decimal('80.00'), Decimal('72.00')))
+            self.assertEqual((scheduling.branch_id, scheduling.status), (self.tutor.branch_id, 'Não'))
+
+    def test_expands_only_the_chosen_weekdays_with_services_and_totals(self):
+        series = self.create_series()
+        self.assertEqual(series.expand(self.monday + timedelta(days=13)), 4)
+        # Segundas e quartas de duas semanas
+        self.assert_occurrences(series, [0, 2, 7, 9])
+        self.assertEqual(Scheduling.services.through.objects.filter(scheduling__series=series).count(), 8)
+
+    def test_end_date_clamps_and_reexpansion_is_idempotent(self):
+        series = self.create_series(end_date=self.monday + timedelta(days=7))
+        self.assertEqual(series.expand(self.monday + timedelta(days=60)), 3)
+        self.assertEqual(series.expanded_until, series.end_date)
+        self.assertEqual(series.expand(self.monday + timedelta(days=60)), 0)
+
+        # Mesmo sem saber até onde já gerou, não repete as datas
+        SchedulingSeries.objects.filter(pk=series.pk).update(expanded_until=None)
+        series.refresh_from_db()
+        self.assertEqual(series.expand(self.monday + timedelta(days=60)), 0)
+        self.assert_occurrences(series, [0, 2, 7])
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Scheduling.objects.create(tutor=self.tutor, pet=self.pet, series=series, date_scheduling=self.monday)
+
+    def test_create_view_and_admin_expand_the_new_series(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        data = {
+            'tutor': self.tutor.pk, 'pet': self.pet.pk, 'services': [s.pk for s in self.services],
+            'start_date': self.monday.isoformat(), 'end_date': (self.monday + timedelta(days=7)).isoformat(),
+            'percentage_discount': '10',
+        }
+        self.client.post(reverse('scheduling_series_create'), {**data, 'weekdays': ['0', '2']})
+        self.assert_occurrences(SchedulingSeries.objects.get(), [0, 2, 7])
+
+        self.client.post(reverse('admin:daycare_schedulingseries_add'), {**data, 'weekdays': '02'})
+        self.assert_occurrences(SchedulingSeries.objects.latest('pk'), [0, 2, 7])
+
+
+@jobs.task('test_flaky')
+def flaky_task(job, fail_times=0):
+    if job.attempts <= fail_times:
+        raise RuntimeError('falha temporária')
+    return {'attempts': job.attempts}
+
+
+class JobQueueTests(TestCase):
+
+    def run_next(self):
+        job = jobs.claim('test')
+        jobs.execute(job.pk)
+        job.refresh_from_db()
+        return job
+
+    def test_retry_with_backoff_then_success(self):
+        jobs.enqueue('test_flaky', fail_times=1)
+        job = self.run_next()
+        self.assertEqual(job.status, 'pending')
+        self.assertGreater(job.run_at, job.started_at)
+        self.assertIsNone(jobs.claim('test'))
+
+        Job.objects.filter(pk=job.pk).update(run_at=job.started_at)
+        job = self.run_next()
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(job.result, {'attempts': 2})
+
+    def test_fails_after_max_attempts(self):
+        jobs.enqueue('test_flaky', max_attempts=1, fail_times=5)
+        job = self.run_next()
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('falha temporária', job.error)
+
+    def test_only_jobs_without_heartbeat_are_requeued(self):
+        long_ago = timezone.now() - timedelta(hours=1)
+        jobs.enqueue('test_flaky')
+        jobs.enqueue('test_flaky')
+        alive, dead = jobs.claim('vivo'), jobs.claim('morto')
+        Job.objects.update(started_at=long_ago, heartbeat_at=long_ago)
+        alive.set_progress(1, 2)
+
+        self.assertEqual(jobs.requeue_stale(600), 1)
+        self.assertEqual(Job.objects.get(pk=alive.pk).status, 'running')
+        self.assertEqual(Job.objects.get(pk=dead.pk).status, 'pending')
+
+        Job.objects.filter(pk=alive.pk).update(heartbeat_at=long_ago)
+        jobs.heartbeat([alive.pk])
+        self.assertEqual(jobs.requeue_stale(600), 0)
+
+
+class BouncingEmailBackend(locmem.EmailBackend):
+    """Backend de teste que recusa os endereços com 'bounce'."""
+
+    def send_messages(self, messages):
+        if any('bounce' in address for message in messages for address in message.to):
+            raise ConnectionError('servidor recusou a mensagem')
+        return super().send_messages(messages)
+
+
+class ReminderTests(TestCase):
+
+    def setUp(self):
+        self.tomorrow = date.today() + timedelta(days=1)
+        with_email = Tutor.objects.create(name='Ana', cpf='111.111.111-11', email='ana@example.com')
+        without_email = Tutor.objects.create(name='Bia', cpf='222.222.222-22')
+        for tutor in (with_email, without_email):
+            pet = Pet.objects.create(name='Rex', species='Cão', tutor=tutor)
+            Scheduling.objects.create(tutor=tutor, pet=pet, date_scheduling=self.tomorrow, status='Não')
+
+    def test_sends_once_per_booking(self):
+        self.assertEqual(send_reminders(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['ana@example.com'])
+        self.assertIn(self.tomorrow.strftime('%d/%m/%Y'), mail.outbox[0].body)
+
+        self.assertEqual(send_reminders(), (0, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(Reminder.objects.get().status, 'sent')
+
+    @override_settings(EMAIL_BACKEND='daycare.tests.BouncingEmailBackend')
+    def test_failure_in_the_middle_of_a_batch_keeps_the_delivered_ones(self):
+        for name in ('bounce', 'carla'):
+            tutor = Tutor.objects.create(name=name, cpf=f'{name}-cpf', email=f'{name}@example.com')
+            pet = Pet.objects.create(name='Mel', species='Gato', tutor=tutor)
+            Scheduling.objects.create(tutor=tutor, pet=pet, date_scheduling=self.tomorrow, status='Não')
+
+        self.assertEqual(send_reminders(), (2, 1))
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ['ana@example.com', 'carla@example.com'])
+        self.assertEqual(Reminder.objects.get(status='failed').email, 'bounce@example.com')
+
+        # Só a que falhou é tentada de novo
+        self.assertEqual(send_reminders(), (0, 1))
+        self.assertEqual(len(mail.outbox), 2)
+
+
+class StaticAssetTests(TestCase):
+    HASHED = 'css/base.0123456789ab.css'
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        os.makedirs(os.path.join(root.name, 'css'))
+        for name, content in ((self.HASHED, b'identity'), (self.HASHED + '.gz', b'gzip'),
+                              (self.HASHED + '.br', b'brotli'), ('css/base.css', b'identity')):
+            with open(os.path.join(root.name, name), 'wb') as target:
+                target.write(content)
+        settings = override_settings(STATIC_ROOT=root.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def get(self, path, **headers):
+        response = self.client.get('/static/' + path, headers=headers)
+        return response, b''.join(response.streaming_content) if response.status_code == 200 else b''
+
+    def test_serves_the_best_accepted_encoding(self):
+        for accepted, encoding, body in (('gzip, deflate, br', 'br', b'brotli'), ('gzip', 'gzip', b'gzip'),
+                                         ('identity', None, b'identity'), ('', None, b'identity')):
+            response, content = self.get(self.HASHED, accept_encoding=accepted)
+            self.assertEqual((response.get('Content-Encoding'), content), (encoding, body), accepted)
+            self.assertEqual(response['Vary'], 'Accept-Encoding')
+            self.assertEqual(response['Content-Type'], 'text/css')
+
+    def test_only_hashed_names_are_immutable(self):
+        response, _ = self.get(self.HASHED)
+        self.assertEqual(response['Cache-Control'], f'public, max-age={assets.IMMUTABLE_MAX_AGE}, immutable')
+        response, _ = self.get('css/base.css')
+        self.assertEqual(response['Cache-Control'], f'public, max-age={assets.MUTABLE_MAX_AGE}')
+
+        response, _ = self.get(self.HASHED, if_modified_since=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+        for path in ('css/missing.css', '../settings.py'):
+            self.assertEqual(self.get(path)[0].status_code, 404, path)
+
+    def test_manifest_is_strict(self):
+        with self.assertRaisesMessage(ValueError, "Missing staticfiles manifest entry for 'css/base.css'"):
+            assets.PrecompressedManifestStaticFilesStorage().stored_name('css/base.css')
+
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        self.tutor = Tutor.objects.create(name='Ana', cpf='111.111.111-11')
+        self.pet = Pet.objects.create(name='Rex', species='Cão', tutor=self.tutor)
+        self.scheduling = create_scheduling(self.tutor, self.pet, status='Não')
+
+    def test_pet_detail_revalidates_with_single_lookup(self):
+        url = reverse('pet_detail', args=[self.pet.pk])
+        etag = self.client.get(url)['ETag']
+        # Sessão + usuário + filial do usuário + versão do pet
+        with self.assertNumQueries(4):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # Alterações fora do save() (queryset.update) também mudam a versão
+        Scheduling.objects.filter(pk=self.scheduling.pk).mark_as_paid()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_note_is_cached_and_revalidated(self):
+        Scheduling.objects.filter(pk=self.scheduling.pk).mark_as_paid()
+        note, _ = Note.objects.issue(Scheduling.objects.get(pk=self.scheduling.pk))
+        response = self.client.get(reverse('note_print', args=[note.pk]))
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('max-age=', response['Cache-Control'])
+        response = self.client.get(
+            reverse('note_print', args=[note.pk]), HTTP_IF_MODIFIED_SINCE=response['Last-Modified'],
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_pages_with_forms_are_not_reused_across_logins_or_with_messages(self):
+        Scheduling.objects.filter(pk=self.scheduling.pk).mark_as_paid()
+        note, _ = Note.objects.issue(Scheduling.objects.get(pk=self.scheduling.pk))
+        for url in (reverse('pet_detail', args=[self.pet.pk]), reverse('note_detail', args=[note.pk])):
+            response = self.client.get(url)
+            self.assertIn('no-cache', response['Cache-Control'])
+            etag = response['ETag']
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+            # Sair e entrar de novo troca o token CSRF do formulário de sair
+            self.client.post(reverse('logout'))
+            self.client.post(reverse('login'), {'username': 'admin', 'password': 'x'})
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200, url)
+            etag = response['ETag']
+
+        # O aviso de uma ação anterior vem numa resposta nova, sem ETag
+        self.client.get(reverse('generate_note', args=[self.scheduling.pk]))
+        response = self.client.get(reverse('note_detail', args=[note.pk]), HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'já foi emitida')
+        self.assertFalse(response.has_header('ETag'))
+
+
+class PetHistoryTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        tutor = Tutor.objects.create(name='Ana', cpf='111.111.111-11')
+        self.pet = Pet.objects.create(name='Rex', species='Cão', tutor=tutor)
+        bath = Service.objects.create(name='Banho', price=50)
+        grooming = Service.objects.create(name='Tosa', price=70)
+        for i in range(30):
+            scheduling = Scheduling.objects.create(
+                tutor=tutor, pet=self.pet, date_scheduling=date(2025, 1, 1) + timedelta(days=i),
+                status='Sim' if i % 2 else 'Não',
+            )
+            scheduling.services.set([bath, grooming] if i % 3 == 0 else [bath])
+        Scheduling.objects.all().reprice()
+
+    def test_summary(self):
+        summary = self.pet.visit_summary()
+        self.assertEqual(summary['visits'], 30)
+        self.assertEqual(summary['total_spent'], 15 * 50 + 5 * 70)
+        self.assertEqual(summary['last_visit'], date(2025, 1, 30))
+        self.assertEqual([(s.name, s.uses) for s in summary['top_services']], [('Banho', 30), ('Tosa', 10)])
+
+    def test_history_is_paginated_and_prefetched(self):
+        url = reverse('pet_history', args=[self.pet.pk])
+        # Sessão + usuário + filial + versão (ETag) + pet + contagem + página + agendamentos + serviços
+        with self.assertNumQueries(9):
+            response = self.client.get(url, {'page': 2}, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(len(response.context['page_obj']), 10)
+        self.assertTemplateNotUsed(response, 'base.html')
+
+
+class SchedulingAdminTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        self.bath = Service.objects.create(name='Banho', price='50.00')
+
+    def add_schedulings(self, count):
+        schedulings = []
+        for _ in range(count):
+            tutor = Tutor.objects.create(name='Ana', cpf=f'{Tutor.objects.count():011d}')
+            scheduling = create_scheduling(tutor, Pet.objects.create(name='Rex', species='Cão', tutor=tutor), status='Não')
+            scheduling.services.set([self.bath])
+            schedulings.append(scheduling)
+        return schedulings
+
+    def test_changelist_query_count_does_not_grow_with_rows(self):
+        url = reverse('admin:daycare_scheduling_changelist')
+        self.add_schedulings(5)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.add_schedulings(5)
+        with self.assertNumQueries(len(queries)):
+            response = self.client.get(url)
+        self.assertEqual(response.context['cl'].result_count, 10)
+
+    def test_bulk_actions_on_selection(self):
+        url = reverse('admin:daycare_scheduling_changelist')
+        schedulings = self.add_schedulings(3)
+        selected = [scheduling.pk for scheduling in schedulings[:2]]
+        for action in ('reprice', 'mark_as_paid', 'issue_notes'):
+            self.client.post(url, {'action': action, '_selected_action': selected})
+        self.assertEqual(
+            list(Scheduling.objects.order_by('pk').values_list('status', 'total_value')),
+            [('Sim', Decimal('50.00')), ('Sim', Decimal('50.00')), ('Não', Decimal('0.00'))],
+        )
+        self.assertEqual(sorted(Note.objects.values_list('scheduling_id', flat=True)), selected)
+
+    def test_prices_once_after_the_services_are_saved(self):
+        tutor = Tutor.objects.create(name='Ana', cpf='111.111.111-11')
+        pet = Pet.objects.create(name='Rex', species='Cão', tutor=tutor)
+        data = {
+            'tutor': tutor.pk, 'pet': pet.pk, 'date_scheduling': '2025-01-01', 'services': [self.bath.pk],
+            'status': 'Não', 'percentage_discount': '10',
+        }
+        self.client.post(reverse('scheduling_create'), data)
+        scheduling = Scheduling.objects.get()
+        self.assertEqual((scheduling.gross_total_value, scheduling.total_value), (Decimal('50.00'), Decimal('45.00')))
+
+        self.client.post(reverse('scheduling_update', args=[scheduling.pk]), {**data, 'percentage_discount': '20'})
+        scheduling.refresh_from_db()
+        self.assertEqual(scheduling.total_value, Decimal('40.00'))
+
+        self.client.post(reverse('admin:daycare_scheduling_change', args=[scheduling.pk]), {**data, 'percentage_discount': '0'})
+        scheduling.refresh_from_db()
+        self.assertEqual(scheduling.total_value, Decimal('50.00'))
+
+        # save() sozinho só grava o agendamento: os valores ficam para o reprice()
+        scheduling.services.clear()
+        with self.assertNumQueries(1):
+            scheduling.save()
+        scheduling.refresh_from_db()
+        self.assertEqual(scheduling.total_value, Decimal('50.00'))
+
+
+class BranchTests(TestCase):
+
+    def setUp(self):
+        self.north = Branch.objects.create(name='Norte')
+        self.south = Branch.objects.create(name='Sul')
+        self.user = User.objects.create_user('caixa', password='x', is_staff=True)
+        self.user.user_permissions.add(*Permission.objects.filter(content_type__app_label='daycare'))
+        BranchMembership.objects.create(user=self.user, branch=self.north)
+        self.client.force_login(self.user)
+
+        self.pets = {}
+        for branch in (self.north, self.south):
+            # O mesmo CPF pode existir em filiais diferentes
+            tutor = Tutor.objects.create(name='Ana', cpf='111.111.111-11', branch=branch)
+            self.pets[branch] = Pet.objects.create(name='Rex', species='Cão', tutor=tutor)
+
+    def test_user_only_sees_own_branch(self):
+        response = self.client.get(reverse('pet_list'))
+        self.assertEqual(list(response.context['pet_list']), [self.pets[self.north]])
+        self.assertEqual(self.client.get(reverse('pet_detail', args=[self.pets[self.south].pk])).status_code, 404)
+
+        self.client.post(reverse('tutor_create'), {'name': 'Bia', 'cpf': '222.222.222-22'})
+        self.assertEqual(Tutor.objects.get(name='Bia').branch, self.north)
+
+    def test_note_numbers_are_per_branch(self):
+        for pet in self.pets.values():
+            for _ in range(2):
+                create_scheduling(pet.tutor, pet)
+        notes = Scheduling.objects.all().issue_notes()
+        self.assertEqual(
+            sorted((note.branch_id, note.branch_number) for note in notes),
+            [(self.north.pk, 1), (self.north.pk, 2), (self.south.pk, 1), (self.south.pk, 2)],
+        )
+        self.assertEqual(
+            sorted((note['branch'], note['number']) for note in Note.branch_numbers(notes)),
+            [(self.north.name, 1), (self.north.name, 2), (self.south.name, 1), (self.south.name, 2)],
+        )
+        self.assertEqual(NoteSequence.objects.get(name=NoteSequence.branch_name(self.south.pk)).last_value, 2)
+
+
+class ArchiveTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        tutor = Tutor.objects.create(name='Ana', cpf='111.111.111-11')
+        self.pet = Pet.objects.create(name='Rex', species='Cão', tutor=tutor)
+        service = Service.objects.create(name='Banho', price=50)
+        for day, status in ((date(2020, 1, 1), 'Sim'), (date(2020, 1, 2), 'Não'), (date(2025, 1, 1), 'Sim')):
+            scheduling = Scheduling.objects.create(tutor=tutor, pet=self.pet, date_scheduling=day, status=status)
+            scheduling.services.set([service])
+        self.notes = Scheduling.objects.all().issue_notes()
+
+    def test_archives_old_noted_bookings_and_keeps_them_reachable(self):
+        self.assertEqual(archive_before(date(2024, 1, 1), chunk_size=1), 1)
+        # Só o agendamento antigo, pago e com nota sai da tabela principal
+        self.assertEqual(Scheduling.objects.count(), 2)
+        archived = ArchivedScheduling.objects.get()
+        self.assertEqual(archived.date_scheduling, date(2020, 1, 1))
+        self.assertEqual([s.name for s in archived.services.all()], ['Banho'])
+        self.assertEqual(ArchivedNote.objects.get().scheduling, archived)
+        self.assertFalse(ChangeLog.objects.filter(model='scheduling', object_pk=archived.pk, action='D').exists())
+
+        self.assertEqual(self.client.get(reverse('note_print', args=[self.notes[0].pk])).status_code, 200)
+        response = self.client.get(reverse('pet_history', args=[self.pet.pk]))
+        self.assertEqual([s.date_scheduling.year for s in response.context['page_obj']], [2025, 2020, 2020])
+        self.assertEqual(self.pet.visit_summary()['visits'], 3)
+
+
+class SoftDeleteTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        self.tutor = Tutor.objects.create(name='Ana', cpf='111.111.111-11')
+        pet = Pet.objects.create(name='Rex', species='Cão', tutor=self.tutor)
+        for day in (date(2020, 1, 1), date(2025, 1, 1), date(2025, 1, 2)):
+            Scheduling.objects.create(tutor=self.tutor, pet=pet, date_scheduling=day, status='Sim')
+        Scheduling.objects.all().issue_notes()
+        archive_before(date(2024, 1, 1))
+
+    def test_delete_hides_at_once_and_purge_removes_in_chunks(self):
+        response = self.client.post(reverse('tutor_delete', args=[self.tutor.pk]))
+        self.assertRedirects(response, reverse('tutor_list'))
+        self.assertFalse(Tutor.objects.exists())
+        self.assertFalse(Pet.objects.exists())
+        self.assertFalse(Scheduling.objects.exists())
+        self.assertEqual(Scheduling.all_objects.count(), 2)
+        self.assertEqual(Job.objects.get().name, 'purge_deleted')
+
+        purged = purge_deleted(chunk_size=1)
+        self.assertEqual(purged, {
+            'agendamentos': 2, 'agendamentos arquivados': 1, 'recorrências': 0, 'pets': 1, 'tutores': 1,
+        })
+        self.assertFalse(Tutor.all_objects.exists())
+        self.assertFalse(Note.objects.exists())
+        self.assertFalse(ArchivedNote.objects.exists())
+
+    def test_only_deleted_rows_are_indexed(self):
+        # O `deleted_at IS NULL` do manager padrão não tira o índice das buscas
+        plan = Tutor.objects.filter(cpf_digits__gte='111', cpf_digits__lt='112').explain()
+        self.assertNotIn('deleted', plan)
+        self.assertIn('tutor_deleted_idx', Tutor.all_objects.filter(deleted_at__isnull=False).explain())
+
+
+class ProductionSettingsTests(TestCase):
+    ENVIRON = {'DJANGO_SECRET_KEY': 'segredo', 'DJANGO_EMAIL_HOST': 'smtp.example.com'}
+
+    def load(self, environ, missing=None):
+        sys.modules.pop('app.settings_production', None)
+        self.addCleanup(sys.modules.pop, 'app.settings_production', None)
+        with mock.patch.dict(os.environ, environ):
+            if missing:
+                del os.environ[missing]
+            return importlib.import_module('app.settings_production')
+
+    def test_production_profile(self):
+        settings = self.load(self.ENVIRON)
+        self.assertEqual((settings.SECRET_KEY, settings.EMAIL_HOST, settings.DEBUG), ('segredo', 'smtp.example.com', False))
+        self.assertEqual(settings.DATABASES['default']['CONN_MAX_AGE'], 600)
+        self.assertEqual(settings.SESSION_ENGINE, 'django.contrib.sessions.backends.cached_db')
+        template = settings.TEMPLATES[0]
+        self.assertFalse(template['APP_DIRS'])
+        self.assertEqual(template['OPTIONS']['loaders'][0][0], 'django.template.loaders.cached.Loader')
+        self.assertEqual(
+            settings.STORAGES['staticfiles']['BACKEND'], 'daycare.assets.PrecompressedManifestStaticFilesStorage',
+        )
+
+    def test_missing_required_variables(self):
+        for name in self.ENVIRON:
+            with self.assertRaisesMessage(ImproperlyConfigured, f'Defina a variável de ambiente {name}'):
+                self.load(self.ENVIRON, missing=name)
+
+
+class MetricsTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        tutor = Tutor.objects.create(name='Ana', cpf='111.111.111-11')
+        pet = Pet.objects.create(name='Rex', species='Cão', tutor=tutor)
+        for status in ('Sim', 'Não', 'Não'):
+            create_scheduling(tutor, pet, status)
+        Scheduling.objects.filter(status='Sim').issue_notes()
+        Scheduling.objects.filter(status='Não')[:1].get().delete()
+        metrics.registry.reset()
+
+    def test_aggregates_workers_and_reads_counters(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            # Estado gravado por outro worker
+            with open(os.path.join(directory, 'other.json'), 'w') as target:
+                json.dump({'daycare_http_errors_total': [[['pet_list', '500'], 2]]}, target)
+            self.client.get(reverse('pet_list'))
+            self.client.get(reverse('pet_detail', args=[999]))
+            self.client.get(reverse('pet_detail', args=[999]))
+            body = self.client.get(reverse('metrics')).content.decode()
+
+        self.assertIn('daycare_http_request_duration_seconds_bucket{view="pet_list",le="+Inf"} 1', body)
+        self.assertIn('daycare_db_queries_per_request_count{view="pet_detail"} 2', body)
+        self.assertIn('daycare_http_errors_total{view="pet_detail",status="404"} 2', body)
+        self.assertIn('daycare_http_errors_total{view="pet_list",status="500"} 2', body)
+        self.assertIn('daycare_pending_schedulings 1', body)
+        self.assertIn('daycare_notes_issued_today 1', body)
+
+    def test_requires_token_or_staff(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        with override_settings(METRICS_TOKEN='s3cr3t'):
+            response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer s3cr3t')
+        self.assertEqual(response.status_code, 200)
+
+
+class SlowQueryLogTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        tutor = Tutor.objects.create(name='Ana', cpf='111.111.111-11')
+        Pet.objects.create(name='Rex', species='Cão', tutor=tutor)
+        slowlog.explained.clear()
+
+    def test_normalizes_literals_and_in_lists(self):
+        self.assertEqual(
+            slowlog.normalize('SELECT * FROM "t" WHERE "a" = \'x\' AND "b" IN (%s, %s,  %s) LIMIT 21'),
+            'SELECT * FROM "t" WHERE "a" = ? AND "b" IN (...) LIMIT ?',
+        )
+        self.assertEqual(slowlog.normalize('"id" IN (%s)'), slowlog.normalize('"id" IN (%s, %s)'))
+
+    def test_logs_queries_over_threshold_with_plan_once_per_shape(self):
+        with override_settings(SLOW_QUERY_MS=0), self.assertLogs('daycare.slow_queries') as logs:
+            self.client.get(reverse('pet_list'))
+            self.client.get(reverse('pet_list'))
+        records = [json.loads(line.split(':', 2)[2]) for line in logs.output]
+        pets = [r for r in records if r['view'] == 'pet_list' and 'FROM "daycare_pet"' in r['sql']]
+        self.assertTrue(pets)
+        plans = [r for r in pets if 'plan' in r]
+        self.assertEqual(len({r['fingerprint'] for r in plans}), len(plans))
+        self.assertTrue(any('daycare_pet' in line for r in plans for line in r['plan']))
+
+        ranked = slowlog.rank(records)
+        self.assertEqual(sum(shape['count'] for shape in ranked), len(records))
+        self.assertGreaterEqual(ranked[0]['total_ms'], ranked[-1]['total_ms'])
+
+    def test_params_are_redacted_and_each_process_writes_its_own_file(self):
+        self.assertEqual(slowlog.format_params(['111.111.111-11', 42, None, b'xy']), ['str(14)', 'int', 'None', 'bytes(2)'])
+        with override_settings(SLOW_QUERY_MS=0), self.assertLogs('daycare.slow_queries') as logs:
+            self.client.get(reverse('tutor_list'), {'q': '111.111.111-11'})
+        # Nem o texto digitado nem os dígitos do CPF usados no filtro
+        self.assertFalse([line for line in logs.output if '111.111' in line or '11111111111' in line])
+        self.assertTrue(any('"str(' in line for line in logs.output))
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'slow.log')
+            handler = slowlog.ProcessFileHandler(path, delay=True)
+            handler.emit(logging.makeLogRecord({'msg': json.dumps({'fingerprint': 'a', 'duration_ms': 1.0})}))
+            handler.close()
+            self.assertEqual(os.listdir(directory), [f'slow.log.{os.getpid()}'])
+            out = io.StringIO()
+            call_command('slow_queries', file=path, stdout=out)
+            self.assertIn('1 formato(s) de consulta em 1 registro(s).', out.getvalue())
+
+
+class LocalityLoadTests(TestCase):
+
+    def test_load_is_idempotent_and_keeps_existing_rows(self):
+        sp = State.objects.create(name='Sao Paulo', abbreviation='SP')
+        City.objects.create(state=sp, name='são paulo')
+
+        result = load_localities()
+        self.assertEqual(result, {'states_created': 26, 'states_updated': 1, 'cities_created': 5570})
+        self.assertEqual(State.objects.get(abbreviation='SP').name, 'São Paulo')
+        self.assertEqual(City.objects.filter(state=sp, name__iexact='são paulo').count(), 1)
+        self.assertTrue(City.objects.filter(state__abbreviation='MG', name='Belo Horizonte').exists())
+
+        self.assertEqual(load_localities(), {'states_created': 0, 'states_updated': 0, 'cities_created': 0})
+        self.assertEqual(City.objects.count(), 5571)
+
+
+class TypeaheadTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        self.tutors = [Tutor.objects.create(name=f'Ana {i:02}', cpf=f'{i:011d}') for i in range(25)]
+        Tutor.objects.create(name='Bruno', cpf='98765432100')
+
+    def test_widget_renders_only_the_selected_option(self):
+        form = PetForm(initial={'tutor': self.tutors[3].pk})
+        with self.assertNumQueries(1):
+            html = str(form['tutor'])
+        self.assertEqual(html.count('<option'), 2)
+        self.assertIn(f'<option value="{self.tutors[3].pk}" selected>Ana 03</option>', html)
+        self.assertIn(f'data-lookup-url="{reverse("tutor_lookup")}"', html)
+        self.assertEqual(str(PetForm()['tutor']).count('<option'), 1)
+
+    def test_lookup_is_limited_to_prefix_matches(self):
+        url = reverse('tutor_lookup')
+        results = self.client.get(url, {'q': 'an'}).json()['results']
+        self.assertEqual(len(results), views.LOOKUP_LIMIT)
+        self.assertEqual(results[0], {'id': self.tutors[0].pk, 'text': f'Ana 00 ({self.tutors[0].cpf})'})
+        self.assertTrue(all(r['text'].startswith('Ana') for r in results))
+        self.assertEqual(self.client.get(url, {'q': 'a'}).json()['results'], [])
+
+    def test_nocase_collation_only_on_sqlite(self):
+        field = NameField(max_length=100)
+        self.assertEqual(field.db_parameters(connection)['collation'], 'NOCASE')
+        with mock.patch.object(type(connections['default']), 'vendor', 'postgresql'):
+            self.assertIsNone(field.db_parameters(connection)['collation'])
+
+
+class ContactSearchTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        self.tutor = Tutor.objects.create(name='Ana', cpf='123.456.789-00', phone_number='+55 (11) 98765-4321')
+        Tutor.objects.create(name='Bruno', cpf='98765432100', phone_number='(21) 3333-4444')
+
+    def test_digits_are_filled_and_any_formatting_finds_the_tutor(self):
+        self.assertEqual((self.tutor.cpf_digits, self.tutor.phone_digits), ('12345678900', '11987654321'))
+        for query in ('12345678900', '123.456', '(11) 98765', '+55 11 9876'):
+            response = self.client.get(reverse('tutor_list'), {'q': query})
+            self.assertEqual([t.name for t in response.context['tutor_list']], ['Ana'], query)
+        results = self.client.get(reverse('tutor_lookup'), {'q': '123.456.789-00'}).json()['results']
+        self.assertEqual([r['id'] for r in results], [self.tutor.pk])
+
+    def test_same_cpf_with_other_formatting_is_rejected(self):
+        response = self.client.post(reverse('tutor_create'), {'name': 'Outra Ana', 'cpf': '12345678900'})
+        self.assertFormError(response.context['form'], 'cpf', 'Já existe um tutor com este CPF nesta filial.')
+
+    def test_contact_query_is_not_mixed_with_the_name_lookup(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('tutor_list'), {'q': '123.456'})
+        self.assertEqual([t.name for t in response.context['tutor_list']], ['Ana'])
+        search = [q['sql'] for q in queries if 'cpf_digits" >=' in q['sql']]
+        self.assertTrue(search)
+        self.assertNotIn('LIKE', search[0])
+        self.assertIn('MULTI-INDEX OR', Tutor.objects.filter(contact_condition('123.456')).explain())
+
+        # Texto com letras é nome
+        self.assertIsNone(contact_condition('Ana 2'))
+        response = self.client.get(reverse('admin:daycare_tutor_changelist'), {'q': '(21) 3333'})
+        self.assertEqual([t.name for t in response.context['cl'].result_list], ['Bruno'])
+
+    def test_country_code_alone_searches_only_the_cpf(self):
+        Tutor.objects.create(name='Carla', cpf='555.123.456-78')
+        for url in ('tutor_list', 'tutor_lookup', 'scheduling_list', 'admin:daycare_tutor_changelist'):
+            self.assertEqual(self.client.get(reverse(url), {'q': '+55'}).status_code, 200, url)
+        response = self.client.get(reverse('tutor_list'), {'q': '+55'})
+        self.assertEqual([t.name for t in response.context['tutor_list']], ['Carla'])
+        with self.assertRaises(ValueError):
+            prefix_range('phone_digits', '')
+
+
+class NotePdfExportTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        tutor = Tutor.objects.create(name='João', cpf='111.111.111-11')
+        pet = Pet.objects.create(name='Rex', species='Cão', tutor=tutor)
+        service = Service.objects.create(name='Banho (grande)', price=50)
+        for day in (date(2020, 1, 1), date(2025, 1, 1)):
+            scheduling = Scheduling.objects.create(tutor=tutor, pet=pet, date_scheduling=day, status='Sim')
+            scheduling.services.set([service])
+        Scheduling.objects.all().reprice()
+        Scheduling.objects.all().issue_notes()
+        archive_before(date(2024, 1, 1))
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+
+    def test_exports_zip_and_merged_pdf_and_reuses_cache(self):
+        today = date.today().isoformat()
+        with override_settings(NOTE_PDF_CACHE_DIR=self.cache_dir.name):
+            response = self.client.get(reverse('notes_export'), {'start': today, 'end': today, 'format': 'zip'})
+            archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+            self.assertEqual(len(archive.namelist()), 2)
+            self.assertTrue(all(archive.read(name).startswith(b'%PDF-1.4') for name in archive.namelist()))
+
+            response = self.client.get(reverse('notes_export'), {'start': today, 'end': today})
+            merged = b''.join(response.streaming_content)
+            self.assertEqual(merged.count(b'/Type /Page '), 2)
+            self.assertTrue(merged.rstrip().endswith(b'%%EOF'))
+
+            notes = note_pdfs.notes_in_period(date.today(), date.today())
+            _, stats = note_pdfs.render_notes(notes)
+        self.assertEqual((stats['notes'], stats['rendered'], stats['cached']), (2, 0, 2))
+
+    def test_uses_the_values_recorded_at_issue_and_rejects_unknown_branch(self):
+        note = Note.objects.get()
+        Scheduling.objects.filter(pk=note.scheduling_id).update(gross_total_value=80, total_value=80)
+        payload = note_pdfs.note_payload(note_pdfs.notes_in_period(date.today(), date.today())[-1])
+        self.assertEqual((payload['gross_total'], payload['total']), ('50,00', '50,00'))
+        with self.assertRaisesMessage(CommandError, 'Filial 999 não encontrada.'):
+            call_command('export_notes', branch=999, output=os.devnull)
+
+    def test_command_rejects_invalid_period(self):
+        for options in ({'start': '2026-02-30'}, {'end': 'abc'}, {'start': '2025-01-02', 'end': '2025-01-01'}):
+            with self.assertRaises(CommandError):
+                call_command('export_notes', output=os.devnull, **options)
+
+
+class DemandForecastTests(TestCase):
+
+    def setUp(self):
+        tutor = Tutor.objects.create(name='Ana', cpf='111.111.111-11')
+        pet = Pet.objects.create(name='Rex', species='Cão', tutor=tutor)
+        self.service = Service.objects.create(name='Banho', price=50)
+        self.today = date.today()
+        # Oito semanas de histórico só às segundas-feiras, com dois banhos por dia
+        last_monday = self.today - timedelta(days=self.today.weekday() or 7)
+        days = [last_monday - timedelta(weeks=week) for week in range(8) for _ in range(2)]
+        self.next_monday = last_monday + timedelta(weeks=1)
+        days.append(self.next_monday)
+        for day in days:
+            Scheduling.objects.create(tutor=tutor, pet=pet, date_scheduling=day).services.set([self.service])
+
+    def test_forecast_follows_weekday_and_counts_booked(self):
+        result = refresh_forecast()
+        self.assertEqual((result['booked_services'], result['series']), (17, 1))
+        monday = DemandForecast.objects.get(service=self.service, date=self.next_monday)
+        self.assertAlmostEqual(monday.expected, 2, delta=0.5)
+        self.assertEqual(monday.booked, 1)
+        self.assertFalse(DemandForecast.objects.filter(date=self.next_monday + timedelta(days=1)).exists())
+
+    def test_dashboard_shows_forecast_and_task_reschedules_itself(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        job = jobs.enqueue('forecast_demand')
+        jobs.execute(jobs.claim('test').pk)
+        self.assertEqual(Job.objects.get(pk=job.pk).status, 'done')
+        self.assertEqual(Job.objects.filter(name='forecast_demand', status='pending', run_at__gt=job.run_at).count(), 1)
+
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['previsao'][0]['date'], self.next_monday)
+        self.assertContains(response, 'Previsão de Demanda')
+
+    def test_future_only_bookings_give_zero_expectation(self):
+        Scheduling.objects.filter(date_scheduling__lt=self.today).delete()
+        result = refresh_forecast()
+        self.assertEqual((result['booked_services'], result['series']), (1, 1))
+        monday = DemandForecast.objects.get()
+        self.assertEqual((monday.date, monday.expected, monday.booked), (self.next_monday, 0, 1))
+
+    def test_failed_run_still_schedules_the_next_night(self):
+        job = jobs.enqueue('forecast_demand', max_attempts=1)
+        with mock.patch.object(jobs, 'refresh_forecast', side_effect=RuntimeError('sem dados')):
+            jobs.execute(jobs.claim('test').pk)
+        self.assertEqual(Job.objects.get(pk=job.pk).status, 'failed')
+        self.assertEqual(Job.objects.filter(name='forecast_demand', status='pending', run_at__gt=job.run_at).count(), 1)
+
+
+class ReferenceCacheTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        self.state = State.objects.create(name='São Paulo', abbreviation='SP')
+        self.city = City.objects.create(name='Campinas', state=self.state)
+        Service.objects.create(name='Banho', price=50)
+
+    def reference_queries(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(url, data)
+        tables = ('"daycare_state"', '"daycare_city"', '"daycare_service"')
+        return response, [q['sql'] for q in context.captured_queries if any(t in q['sql'] for t in tables)]
+
+    def test_forms_are_served_from_memory_until_the_data_changes(self):
+        self.client.get(reverse('tutor_create'))
+        self.client.get(reverse('scheduling_create'))
+
+        _, queries = self.reference_queries('get', reverse('scheduling_create'))
+        self.assertEqual(queries, [])
+        response, queries = self.reference_queries(
+            'post', reverse('tutor_create'), {'name': 'Ana', 'cpf': '1', 'state': self.state.pk, 'city': self.city.pk},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse([sql for sql in queries if not sql.startswith('SELECT 1 AS')])  # só a validação do modelo
+        self.assertEqual(Tutor.objects.get(name='Ana').city, self.city)
+
+        # update() não passa pelos signals, mas o trigger troca a versão e o cache é relido
+        State.objects.filter(pk=self.state.pk).update(name='Estado de São Paulo')
+        self.assertContains(self.client.get(reverse('tutor_create')), 'Estado de São Paulo')
+
+
+class DuplicateDetectionTests(TestCase):
+
+    def setUp(self):
+        self.tutor = Tutor.objects.create(name='Thiago Gonçalves de Souza', cpf='123.456.789-00', phone_number='(11) 98765-4321')
+        self.pet = Pet.objects.create(name='Rex', species='Cachorro', tutor=self.tutor)
+
+    def test_typo_and_reformatted_contact_are_flagged_on_save(self):
+        copy = Tutor.objects.create(name='Tiago Goncalves Sousa', cpf='12345678901', phone_number='11 987654321')
+        Tutor.objects.create(name='Thiago Pereira', cpf='98765432100', phone_number='(11) 98765-4321')
+        pair = TutorDuplicate.objects.get()
+        self.assertEqual((pair.first, pair.second), (self.tutor, copy))
+        self.assertIn('mesmo telefone', pair.reasons)
+
+        # Dois pets quase iguais do mesmo tutor
+        Pet.objects.create(name='Rex ', species='cachorro', tutor=copy)
+        Pet.objects.create(name='Rexx', species='Cachorro', tutor=self.tutor)
+        self.assertEqual(PetDuplicate.objects.count(), 1)
+
+        # Corrigido o nome, o par deixa de existir
+        copy.name = 'Maria Souza'
+        copy.phone_number = ''
+        copy.save()
+        self.assertFalse(TutorDuplicate.objects.exists())
+
+    def test_batch_keeps_dismissed_pairs_and_merge_moves_everything(self):
+        copy = Tutor.objects.create(name='Thiago G. Souza', cpf='123.456.789-10', email='thiago.souza+pet@example.com')
+        self.tutor.email = 'thiagosouza@example.com'
+        self.tutor.save()
+        other_pet = Pet.objects.create(name='Mel', species='Gato', tutor=copy)
+        create_scheduling(copy, other_pet)
+        SchedulingSeries.objects.create(tutor=copy, pet=other_pet, weekdays='0', start_date=date(2025, 1, 1))
+
+        TutorDuplicate.objects.update(status='dismissed')
+        result = find_duplicates()
+        self.assertEqual(result['tutors'], 1)
+        self.assertEqual(TutorDuplicate.objects.get().status, 'dismissed')
+
+        moved = merge_tutors(self.tutor, copy)
+        self.assertEqual((moved['pets'], moved['schedulings'], moved['series']), (1, 1, 1))
+        self.assertFalse(Tutor.all_objects.filter(pk=copy.pk).exists())
+        self.assertEqual(set(self.tutor.pet_set.values_list('name', flat=True)), {'Rex', 'Mel'})
+        self.assertFalse(TutorDuplicate.objects.exists())
+        with self.assertRaises(ValueError):
+            merge_tutors(self.tutor, self.tutor)
+
+    def test_admin_merge_of_pairs_with_the_same_kept_tutor_keeps_every_filled_field(self):
+        with_email = Tutor.objects.create(name='Maria Lima', cpf='222.222.222-22', email='thiago@example.com')
+        with_address = Tutor.objects.create(name='Paula Reis', cpf='333.333.333-33', address='Rua A, 10')
+        TutorDuplicate.objects.all().delete()
+        for copy in (with_email, with_address):
+            TutorDuplicate.objects.create(first=self.tutor, second=copy, score=0.9)
+
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        self.client.post(reverse('admin:daycare_tutorduplicate_changelist'), {
+            'action': 'merge', '_selected_action': list(TutorDuplicate.objects.values_list('pk', flat=True)),
+        })
+        self.tutor.refresh_from_db()
+        self.assertEqual((self.tutor.email, self.tutor.address), ('thiago@example.com', 'Rua A, 10'))
+        self.assertEqual(self.tutor.email_key, 'thiago')
+        self.assertEqual(Tutor.all_objects.count(), 1)
+
+
+class TotalsVerifierTests(TestCase):
+
+    def setUp(self):
+        tutor = Tutor.objects.create(name='Ana', cpf='111.111.111-11')
+        pet = Pet.objects.create(name='Rex', species='Cão', tutor=tutor)
+        self.bath = Service.objects.create(name='Banho', price='50.00')
+        self.grooming = Service.objects.create(name='Tosa', price='35.50')
+        self.schedulings = []
+        for discount in (0, '10.5', 0):
+            scheduling = create_scheduling(tutor, pet)
+            scheduling.percentage_discount = discount
+            scheduling.services.set([self.bath])
+            scheduling.save()
+            self.schedulings.append(scheduling)
+        Scheduling.objects.all().reprice()
+
+    def test_consistent_totals_pass(self):
+        stats, mismatches, drifted = verify_totals()
+        self.assertEqual((stats['schedulings'], mismatches, drifted), (3, [], []))
+
+    def test_drift_is_reported_and_repaired_except_for_noted_bookings(self):
+        fixed, noted, priced = self.schedulings
+        Note.objects.issue(Scheduling.objects.get(pk=noted.pk))
+        fixed.services.add(self.grooming)  # sem novo save(): os valores ficam desatualizados
+        noted.services.add(self.grooming)
+        Service.objects.filter(pk=self.bath.pk).update(price='60.00')
+
+        stats, mismatches, drifted = verify_totals(fix=True, chunk_size=1)
+        self.assertEqual({pk: expected for pk, _, _, expected in mismatches}, {
+            fixed.pk: (9550, 9550), noted.pk: (9550, 8547), priced.pk: (6000, 6000),
+        })
+        self.assertEqual(stats['repaired'], 2)
+        fixed.refresh_from_db()
+        self.assertEqual((fixed.gross_total_value, fixed.total_value), (Decimal('95.50'), Decimal('95.50')))
+        self.assertEqual(Scheduling.objects.get(pk=noted.pk).total_value, Decimal('44.75'))
+        self.assertEqual(drifted, [])
+
+        # Corrigido à mão depois da nota: o agendamento passa a divergir da nota emitida
+        Scheduling.objects.filter(pk=noted.pk).reprice()
+        stats, mismatches, drifted = verify_totals()
+        self.assertEqual(mismatches, [])
+        note = (Branch.DEFAULT_NAME, noted.note.branch_number)
+        self.assertEqual(drifted, [(noted.pk, note, (5000, 4475), (9550, 8547))])
+
+
+class BackupTests(TransactionTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_backup_rotates_and_restore_brings_data_back(self):
+        tutor = Tutor.objects.create(name='Ana', cpf='111.111.111-11')
+        results = [
+            backup.backup_database(self.directory.name, keep=2, pages=4, measure=(i == 0)) for i in range(3)
+        ]
+        self.assertEqual(backup.snapshots(self.directory.name), [result['path'] for result in results[1:]])
+        self.assertIsNotNone(results[0]['baseline'])
+        self.assertFalse(Statistic.objects.filter(name=backup.PROBE_NAME).exists())
+        # Nem a cópia medida guarda a linha de medição
+        measured = backup.backup_database(self.directory.name, keep=3, pages=4)
+        with closing(sqlite3.connect(measured['path'])) as db:
+            rows = db.execute(f'SELECT COUNT(*) FROM "{Statistic._meta.db_table}" WHERE name = ?', [backup.PROBE_NAME])
+            self.assertEqual(rows.fetchone(), (0,))
+        self.assertEqual(len(os.listdir(self.directory.name)), 3)
+
+        Tutor.all_objects.filter(pk=tutor.pk).delete()
+        backup.restore_database(results[-1]['path'], self.directory.name)
+        self.assertTrue(Tutor.objects.filter(pk=tutor.pk).exists())
+        self.assertEqual(len(backup.snapshots(self.directory.name, prefix=backup.SAFETY_PREFIX)), 1)
+        for _ in range(2):
+            backup.restore_database(results[-1]['path'], self.directory.name, keep=2)
+        self.assertEqual(len(backup.snapshots(self.directory.name, prefix=backup.SAFETY_PREFIX)), 2)
+
+    def test_damaged_copy_is_not_restored(self):
+        damaged = os.path.join(self.directory.name, 'db-damaged.sqlite3')
+        with open(damaged, 'wb') as target:
+            target.write(b'SQLite format 3\x00' + b'\xff' * 4096)
+        with self.assertRaises(backup.BackupError):
+            backup.restore_database(damaged, self.directory.name)
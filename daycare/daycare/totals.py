@@ -0,0 +1,146 @@
+"""
+Verificação dos valores denormalizados dos agendamentos.
+
+Scheduling.gross_total_value e total_value são cópias: são recalculadas pelo reprice() nos
+formulários e no admin, mas não quando os serviços do agendamento mudam por fora (services.add()
+direto, carga de dados) nem quando o preço de um serviço é alterado. verify_totals percorre os
+agendamentos em faixas de id; cada faixa é lida e recalculada por um processo do pool, com a
+própria conexão (o WAL permite leituras simultâneas), direto do cursor e em centavos inteiros,
+sem instanciar modelos. Só as divergências voltam para o processo principal, que as corrige
+com bulk_update quando pedido.
+
+Agendamentos com nota não são corrigidos: a nota guarda os valores da emissão, e os que
+mudaram depois dela são listados à parte para revisão.
+"""
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+
+from django.db import connection, connections, transaction
+
+from .models import Scheduling, Service
+
+CHUNK_SIZE = 20_000
+UPDATE_BATCH_SIZE = 500
+# A expansão das recorrências calcula em Decimal e reprice() no SQLite, que arredondam meio centavo de formas diferentes
+TOLERANCE_CENTS = 1
+
+
+def cents(value):
+    return None if value is None else round(float(value) * 100)
+
+
+def discounted(gross, discount):
+    """Valor com desconto, em centavos, arredondado; `discount` é o percentual em centésimos (10,5% = 1050)."""
+    return (gross * (10_000 - discount) * 2 + 10_000) // 20_000
+
+
+def fetch(queryset):
+    """Linhas do queryset direto do cursor, sem os conversores do Django."""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        while rows := cursor.fetchmany(5000):
+            yield from rows
+
+
+def check_range(task):
+    """
+    (primeiro id, último id, preços em centavos por serviço) -> (agendamentos lidos,
+    divergências, notas alteradas). É a unidade de trabalho do pool.
+    """
+    first, last, prices = task
+    services = Scheduling.services.through.objects.filter(
+        scheduling_id__gte=first, scheduling_id__lte=last,
+    ).order_by().values_list('scheduling_id', 'service_id')
+    schedulings = Scheduling.objects.filter(pk__range=(first, last)).order_by().values_list(
+        'pk', 'percentage_discount', 'gross_total_value', 'total_value',
+        'note__branch__name', 'note__branch_number', 'note__gross_total_value', 'note__total_value',
+    )
+
+    gross = defaultdict(int)
+    for scheduling_id, service_id in fetch(services):
+        gross[scheduling_id] += prices.get(service_id, 0)
+
+    checked = 0
+    mismatches = []
+    drifted = []
+    for pk, discount, stored_gross, stored_total, branch, number, note_gross, note_total in fetch(schedulings):
+        checked += 1
+        # A nota é identificada pelo número na filial, o mesmo impresso nela
+        note = (branch, number) if number is not None else None
+        expected = (gross[pk], discounted(gross[pk], cents(discount)))
+        stored = (cents(stored_gross), cents(stored_total))
+        if any(abs(a - b) > TOLERANCE_CENTS for a, b in zip(stored, expected)):
+            mismatches.append((pk, note, stored, expected))
+        issued = (cents(note_gross), cents(note_total))
+        if note is not None and issued[0] is not None and issued != stored:
+            drifted.append((pk, note, issued, stored))
+    return checked, mismatches, drifted
+
+
+def id_ranges(chunk_size):
+    bounds = Scheduling.objects.order_by('pk').values_list('pk', flat=True)
+    first, last = bounds.first(), bounds.last()
+    if first is None:
+        return []
+    return [(start, min(start + chunk_size - 1, last)) for start in range(first, last + 1, chunk_size)]
+
+
+def repair(mismatches):
+    """Grava os valores recalculados dos agendamentos divergentes sem nota. Retorna quantos foram corrigidos."""
+    fixes = [
+        Scheduling(pk=pk, gross_total_value=Decimal(gross) / 100, total_value=Decimal(total) / 100)
+        for pk, note, _, (gross, total) in mismatches
+        if note is None
+    ]
+    with transaction.atomic():
+        Scheduling.all_objects.bulk_update(fixes, ['gross_total_value', 'total_value'], batch_size=UPDATE_BATCH_SIZE)
+    return len(fixes)
+
+
+def run_checks(tasks, workers):
+    """Resultados de check_range para cada faixa, na ordem, num pool de processos quando há mais de uma."""
+    if workers > 1 and len(tasks) > 1:
+        from .jobs import setup_process  # jobs importa este módulo
+
+        # Os processos filhos não podem herdar a conexão aberta do processo principal
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=setup_process) as pool:
+            yield from pool.map(check_range, tasks)
+    else:
+        yield from map(check_range, tasks)
+
+
+def verify_totals(fix=False, workers=1, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Recalcula os valores de todos os agendamentos ativos. Retorna (estatísticas, divergências,
+    notas alteradas); as duas listas têm (id, nota, (bruto, total) gravados ou emitidos,
+    (bruto, total) esperados ou atuais), em centavos. A nota é (filial, número na filial) ou None.
+    """
+    started = time.perf_counter()
+    prices = {pk: cents(price) for pk, price in Service.objects.values_list('pk', 'price')}
+    tasks = [(first, last, prices) for first, last in id_ranges(chunk_size)]
+
+    checked = 0
+    mismatches = []
+    drifted = []
+    for done, (count, found, changed) in enumerate(run_checks(tasks, workers), start=1):
+        checked += count
+        mismatches.extend(found)
+        drifted.extend(changed)
+        if progress:
+            progress(done, len(tasks))
+
+    repaired = repair(mismatches) if fix else 0
+    elapsed = time.perf_counter() - started
+    stats = {
+        'schedulings': checked,
+        'mismatches': len(mismatches),
+        'repaired': repaired,
+        'drifted_notes': len(drifted),
+        'seconds': round(elapsed, 3),
+        'schedulings_per_second': round(checked / elapsed) if elapsed else 0,
+    }
+    return stats, mismatches, drifted
@@ -7,6 +7,7 @@ from .views import (
     PetUpdateView,
     PetListView, 
     PetDetailView,    
+    pet_history_view,
     PetDeleteView,
 
     TutorCreateView, 
@@ -23,11 +24,21 @@ from .views import (
     SchedulingUpdateView,
     SchedulingListView, 
     SchedulingDeleteView,
+    SchedulingSeriesCreateView,
 
     generate_note_view,
+    issue_notes_view,
     note_print_view,
+    notes_export_view,
     NoteDetailView,
 
+    tutor_lookup_view,
+
+    changes_feed_view,
+
+    job_enqueue_view,
+    job_status_view,
+
     politica_privacidade,
     termos_de_uso,
     faq,
@@ -48,6 +59,7 @@ urlpatterns = [
     path('pets/editar/<int:pk>/', PetUpdateView.as_view(), name='pet_update'),
     path('pets/', PetListView.as_view(), name='pet_list'),
     path('pets/<int:pk>/', PetDetailView.as_view(), name='pet_detail'),
+    path('pets/<int:pk>/historico/', pet_history_view, name='pet_history'),
     path('pets/excluir/<int:pk>/', PetDeleteView.as_view(), name='pet_delete'),
     
     # 4. Tutores
@@ -67,13 +79,26 @@ urlpatterns = [
     path('agendamentos/editar/<int:pk>/', SchedulingUpdateView.as_view(), name='scheduling_update'),
     path('agendamentos/', SchedulingListView.as_view(), name='scheduling_list'),
     path('agendamentos/excluir/<int:pk>/', SchedulingDeleteView.as_view(), name='scheduling_delete'),
+    path('agendamentos/recorrente/novo/', SchedulingSeriesCreateView.as_view(), name='scheduling_series_create'),
     
     # 7. Notas de Serviço
     path('agendamentos/gerar-nota/<int:pk>/', generate_note_view, name='generate_note'),
+    path('agendamentos/emitir-notas/', issue_notes_view, name='issue_notes'),
     path('nota/<int:pk>/', NoteDetailView.as_view(), name='note_detail'),
     path('nota/<int:pk>/print/', note_print_view, name='note_print'),
+    path('notas/exportar/', notes_export_view, name='notes_export'),
+
+    # 8. Busca Incremental (typeahead)
+    path('busca/tutores/', tutor_lookup_view, name='tutor_lookup'),
+
+    # 9. Feed de Alterações
+    path('alteracoes/', changes_feed_view, name='changes_feed'),
+
+    # 10. Tarefas em Segundo Plano
+    path('tarefas/', job_enqueue_view, name='job_enqueue'),
+    path('tarefas/<int:pk>/', job_status_view, name='job_status'),
 
-    # 8. Links do Footer
+    # 11. Links do Footer
     path('politica-de-privacidade/', politica_privacidade, name='politica_privacidade'),
     path('termos-de-uso/', termos_de_uso, name='termos_de_uso'),
     path('faq/', faq, name='faq'),
@@ -0,0 +1,103 @@
+"""
+Versão por objeto para GET condicional (ETag) da página do pet.
+
+Pet.version é incrementada por triggers do SQLite sempre que muda algo exibido na
+página do pet: o próprio pet, o tutor (e sua cidade/estado), os agendamentos do pet ou
+os serviços desses agendamentos. Como os triggers ficam no
+banco, queryset.update() e bulk_create também invalidam a versão. Como os de
+changelog.py, saem antes das migrações e são recriados ao final de cada migrate.
+"""
+from django.db import connections, router
+
+from .models import City, Pet, Scheduling, Service, State, Tutor
+
+
+def bump_pets(condition):
+    return f'UPDATE "{Pet._meta.db_table}" SET "version" = "version" + 1 WHERE {condition};'
+
+
+def all_triggers():
+    pet = Pet._meta.db_table
+    scheduling = Scheduling._meta.db_table
+    through = Scheduling.services.through._meta.db_table
+    tutor = Tutor._meta.db_table
+    service = Service._meta.db_table
+    city = City._meta.db_table
+    state = State._meta.db_table
+
+    pets_of_service = (
+        f'"id" IN (SELECT s."pet_id" FROM "{scheduling}" s '
+        f'INNER JOIN "{through}" ss ON ss."scheduling_id" = s."id" WHERE ss."service_id" = NEW."id")'
+    )
+    by_tutor = '"tutor_id" = NEW."id"'
+    by_city = f'"tutor_id" IN (SELECT "id" FROM "{tutor}" WHERE "city_id" = NEW."id")'
+    by_state = f'"tutor_id" IN (SELECT "id" FROM "{tutor}" WHERE "state_id" = NEW."id")'
+    by_new_pet = '"id" = NEW."pet_id"'
+    by_old_pet = '"id" = OLD."pet_id"'
+    by_both_pets = '"id" IN (OLD."pet_id", NEW."pet_id")'
+    triggers = [
+        # Qualquer UPDATE no pet (inclusive um save() com a versão antiga em memória) avança a versão
+        ('version_pet_update',
+         f'CREATE TRIGGER "version_pet_update" AFTER UPDATE ON "{pet}" WHEN NEW."version" <= OLD."version" '
+         f'BEGIN UPDATE "{pet}" SET "version" = OLD."version" + 1 WHERE "id" = NEW."id"; END'),
+        ('version_tutor_update',
+         f'CREATE TRIGGER "version_tutor_update" AFTER UPDATE ON "{tutor}" '
+         f'BEGIN {bump_pets(by_tutor)} END'),
+        ('version_city_update',
+         f'CREATE TRIGGER "version_city_update" AFTER UPDATE ON "{city}" '
+         f'BEGIN {bump_pets(by_city)} END'),
+        ('version_state_update',
+         f'CREATE TRIGGER "version_state_update" AFTER UPDATE ON "{state}" '
+         f'BEGIN {bump_pets(by_state)} END'),
+        ('version_service_update',
+         f'CREATE TRIGGER "version_service_update" AFTER UPDATE ON "{service}" '
+         f'BEGIN {bump_pets(pets_of_service)} END'),
+        ('version_scheduling_insert',
+         f'CREATE TRIGGER "version_scheduling_insert" AFTER INSERT ON "{scheduling}" '
+         f'BEGIN {bump_pets(by_new_pet)} END'),
+        ('version_scheduling_update',
+         f'CREATE TRIGGER "version_scheduling_update" AFTER UPDATE ON "{scheduling}" '
+         f'BEGIN {bump_pets(by_both_pets)} END'),
+        ('version_scheduling_delete',
+         f'CREATE TRIGGER "version_scheduling_delete" AFTER DELETE ON "{scheduling}" '
+         f'BEGIN {bump_pets(by_old_pet)} END'),
+    ]
+    for event, alias in (('insert', 'NEW'), ('delete', 'OLD')):
+        name = f'version_scheduling_services_{event}'
+        condition = f'"id" = (SELECT "pet_id" FROM "{scheduling}" WHERE "id" = {alias}."scheduling_id")'
+        triggers.append((
+            name,
+            f'CREATE TRIGGER "{name}" AFTER {event.upper()} ON "{through}" BEGIN {bump_pets(condition)} END',
+        ))
+    return triggers
+
+
+def drop_triggers(using='default', **kwargs):
+    """
+    Remove os triggers antes das migrações (pre_migrate): o SQLite não consegue reconstruir
+    uma tabela citada no corpo de um trigger de outra tabela.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite' or not router.allow_migrate_model(using, Pet):
+        return
+    with connection.cursor() as cursor:
+        for name, _ in all_triggers():
+            cursor.execute(f'DROP TRIGGER IF EXISTS "{name}"')
+
+
+def install_triggers(using='default', **kwargs):
+    """Recria os triggers de versão. Conectado ao post_migrate em apps.py."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite' or not router.allow_migrate_model(using, Pet):
+        return
+    tables = set(connection.introspection.table_names())
+    required = {
+        model._meta.db_table for model in (Pet, Scheduling, Tutor, Service, City, State)
+    }
+    required.add(Scheduling.services.through._meta.db_table)
+    if not required <= tables:
+        return
+    with connection.cursor() as cursor:
+        for name, sql in all_triggers():
+            cursor.execute(f'DROP TRIGGER IF EXISTS "{name}"')
+            cursor.execute(sql)
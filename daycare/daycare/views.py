@@ -1,15 +1,31 @@
 from django.views.generic import CreateView, ListView, DetailView, UpdateView, DeleteView
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.utils.decorators import method_decorator
-from django.db.models import Sum, Avg
-from .models import Pet, Scheduling, Tutor, Service, Note
-from .forms import SchedulingForm
+from django.db.models import Sum, Avg, Q, Value
+from django.core.paginator import Paginator
+from django.http import FileResponse, Http404, JsonResponse
+from django.middleware.csrf import get_token
+from django.utils.dateparse import parse_date
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET, require_POST
+from django.views.decorators.vary import vary_on_headers
+from .models import (
+    ArchivedNote, ArchivedScheduling, Branch, BranchMembership, Pet, Scheduling, SchedulingSeries, Tutor, Service,
+    Note, Job,
+)
+from .forms import SchedulingForm, SchedulingSeriesForm, PetForm, TutorForm
+from .changelog import read_changes, FEED_LIMIT
+from .search import contact_condition
+from .refdata import cached
 from datetime import date
 from decimal import Decimal
+import hashlib
 import json
+import tempfile
 
 # ==================================================================================== #
 # FUNÇÃO DE TESTE DE PERMISSÃO POR MODELO
@@ -18,25 +34,67 @@ def has_model_permission(user, perm_name):
 
     return user.is_authenticated and user.has_perm(perm_name)
 
+# ==================================================================================== #
+# FILIAL DO USUÁRIO
+# ==================================================================================== #
+def current_branch(request):
+    """
+    Filial cujos dados o usuário enxerga (guardada na requisição).
+    Usuários sem vínculo ficam na Matriz; superusuários sem vínculo veem todas (None).
+    """
+    if not hasattr(request, '_branch'):
+        membership = BranchMembership.objects.select_related('branch').filter(user_id=request.user.pk).first()
+        if membership is not None:
+            request._branch = membership.branch
+        elif request.user.is_superuser:
+            request._branch = None
+        else:
+            request._branch = Branch.default()
+    return request._branch
+
+class BranchScopedMixin:
+    """Limita listas, detalhes e formulários à filial do usuário e grava a filial nos registros novos."""
+
+    def get_queryset(self):
+        return super().get_queryset().for_branch(current_branch(self.request))
+
+    def get_form(self, form_class=None):
+        form = super().get_form(form_class)
+        branch = current_branch(self.request)
+        for field in form.fields.values():
+            queryset = getattr(field, 'queryset', None)
+            if hasattr(queryset, 'for_branch'):
+                field.queryset = queryset.for_branch(branch)
+        instance = getattr(form, 'instance', None)
+        if branch is not None and instance is not None and instance._state.adding and hasattr(instance, 'branch_id'):
+            instance.branch = branch
+        return form
+
+def services_json(request):
+    services = cached(Service.objects.for_branch(current_branch(request)))
+    return json.dumps([{'id': s.pk, 'price': str(s.price)} for s in services])
+
 # ==================================================================================== #
 # 1. Views do Sistema
 # ==================================================================================== #
 @login_required(login_url='login')
 def home_view(request):
-    total_pets = Pet.objects.count()
-    total_agendamentos = Scheduling.objects.filter(status='Não').count()
+    branch = current_branch(request)
+    total_pets = Pet.objects.for_branch(branch).count()
+    total_agendamentos = Scheduling.objects.for_branch(branch).filter(status='Não').count()
     context = {'total_pets': total_pets, 'total_agendamentos': total_agendamentos}
     return render(request, 'home.html', context)
 
 @login_required(login_url='login')
 @user_passes_test(lambda u: u.is_superuser or u.is_staff, login_url='login')
 def dashboard_view(request):
-    todos_agendamentos = Scheduling.objects.all()
+    branch = current_branch(request)
+    todos_agendamentos = Scheduling.objects.for_branch(branch)
     agendamentos_pagos = todos_agendamentos.filter(status='Sim')
     agendamentos_pendentes = todos_agendamentos.filter(status='Não')
 
-    total_pets = Pet.objects.count()
-    total_tutors = Tutor.objects.count()
+    total_pets = Pet.objects.for_branch(branch).count()
+    total_tutors = Tutor.objects.for_branch(branch).count()
     count_pendentes = agendamentos_pendentes.count()
 
     soma_total_pago = agendamentos_pagos.aggregate(Sum('total_value'))['total_value__sum'] or Decimal('0.00')
@@ -48,6 +106,9 @@ def dashboard_view(request):
     proximos_agendamentos = todos_agendamentos.filter(date_scheduling__gte=date.today()).order_by('date_scheduling')[:5]
     count_pagos = agendamentos_pagos.count()
 
+    from .forecast import daily_forecast  # numpy só é carregado quando o dashboard é aberto
+    previsao = daily_forecast(branch)
+
     chart_data = {'labels': ['Pagos', 'Pendentes'],
                 'data': [int(count_pagos), int(count_pendentes)],
                 'colors': ['#198754', '#dc3545']}
@@ -60,6 +121,7 @@ def dashboard_view(request):
         'soma_total_pendente': soma_total_pendente,
         'ticket_medio': ticket_medio,
         'proximos_agendamentos': proximos_agendamentos,
+        'previsao': previsao,
         'chart_data_json': json.dumps(chart_data),
     }
     return render(request, 'dashboard.html', context)
@@ -68,9 +130,9 @@ def dashboard_view(request):
 # 2. Views de Pets
 # ==================================================================================== #
 @method_decorator(login_required, name='dispatch')
-class PetCreateView(CreateView):
+class PetCreateView(BranchScopedMixin, CreateView):
     model = Pet
-    fields = ['name', 'species', 'race', 'age', 'sex', 'weight', 'medical_observations', 'photo', 'tutor']
+    form_class = PetForm
     template_name = 'pet_form.html'
     success_url = reverse_lazy('pet_list')
 
@@ -81,9 +143,9 @@ class PetCreateView(CreateView):
         return super().dispatch(request, *args, **kwargs)
 
 @method_decorator(login_required, name='dispatch')
-class PetUpdateView(UpdateView):
+class PetUpdateView(BranchScopedMixin, UpdateView):
     model = Pet
-    fields = ['name', 'species', 'race', 'age', 'sex', 'weight', 'medical_observations', 'photo', 'tutor']
+    form_class = PetForm
     template_name = 'pet_form.html'
     success_url = reverse_lazy('pet_list')
 
@@ -93,8 +155,14 @@ class PetUpdateView(UpdateView):
             return redirect('pet_list')
         return super().dispatch(request, *args, **kwargs)
 
+def schedule_purge():
+    """Enfileira a remoção em lotes dos registros excluídos, se ainda não houver uma pendente."""
+    from . import jobs
+    if not Job.objects.filter(name='purge_deleted', status='pending').exists():
+        jobs.enqueue('purge_deleted')
+
 @method_decorator(login_required, name='dispatch')
-class PetDeleteView(DeleteView):
+class PetDeleteView(BranchScopedMixin, DeleteView):
     model = Pet
     template_name = 'pet_confirm_delete.html'
     success_url = reverse_lazy('pet_list')
@@ -106,8 +174,15 @@ class PetDeleteView(DeleteView):
             return redirect('pet_list')
         return super().dispatch(request, *args, **kwargs)
 
+    def form_valid(self, form):
+        # Some da tela na hora; agendamentos e notas são apagados em lotes pela fila de tarefas
+        self.object.soft_delete()
+        schedule_purge()
+        messages.success(self.request, f"Pet {self.object.name} excluído.")
+        return redirect(self.get_success_url())
+
 @method_decorator(login_required, name='dispatch')
-class PetListView(ListView):
+class PetListView(BranchScopedMixin, ListView):
     model = Pet
     template_name = 'pet_list.html'
     context_object_name = 'pet_list'
@@ -124,19 +199,90 @@ class PetListView(ListView):
         context["search_term"] = self.request.GET.get('q', '')
         return context
 
+def page_etag(request, etag):
+    """
+    Completa o ETag de uma página com formulários (o de sair, no base.html): o token CSRF gravado
+    no HTML muda a cada login. Com mensagens pendentes não há ETag, para a página com o aviso não
+    ser reaproveitada depois.
+    """
+    if etag is None or len(messages.get_messages(request)):
+        return None
+    get_token(request)  # garante o segredo CSRF que o template vai usar
+    secret = hashlib.sha256(request.META['CSRF_COOKIE'].encode()).hexdigest()[:12]
+    return f'{etag}-c{secret}'
+
+# A página do pet é revalidada a cada acesso: se a versão não mudou, responde 304 com uma
+# única consulta pela chave primária, sem montar o contexto nem renderizar o template.
+# O resumo de visitas depende da data de hoje, que também entra no ETag.
+def pet_etag(request, pk):
+    version = Pet.objects.for_branch(current_branch(request)).filter(pk=pk).values_list('version', flat=True).first()
+    if version is None:
+        return None
+    return page_etag(request, f'pet-{pk}-v{version}-u{request.user.pk}-d{date.today():%Y%m%d}')
+
 @method_decorator(login_required, name='dispatch')
-class PetDetailView(DetailView):
+@method_decorator(cache_control(private=True, no_cache=True), name='dispatch')
+@method_decorator(condition(etag_func=pet_etag), name='dispatch')
+class PetDetailView(BranchScopedMixin, DetailView):
     model = Pet
     template_name = 'pet_detail.html'
     context_object_name = 'pet'
+    queryset = Pet.objects.select_related('tutor__city', 'tutor__state')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # O histórico completo é carregado sob demanda por pet_history_view
+        context['summary'] = self.object.visit_summary()
+        return context
+
+HISTORY_PAGE_SIZE = 20
+
+def is_fragment_request(request):
+    return request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+
+def pet_history_etag(request, pk):
+    etag = pet_etag(request, pk)
+    if etag is None:
+        return None
+    return f"{etag}-{'fragment' if is_fragment_request(request) else 'page'}"
+
+@login_required(login_url='login')
+@vary_on_headers('X-Requested-With')
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=pet_history_etag)
+def pet_history_view(request, pk):
+    """
+    Histórico de agendamentos do pet (tabela principal e arquivo), paginado e com os serviços
+    pré-carregados. A paginação roda sobre um UNION só de (data, id) e os registros da página
+    são buscados em seguida. Pedidos via fetch recebem só o bloco do histórico.
+    """
+    pet = get_object_or_404(Pet.objects.for_branch(current_branch(request)), pk=pk)
+    keys = (
+        pet.scheduling_set.annotate(archived=Value(False)).values_list('date_scheduling', 'id', 'archived')
+        .union(
+            pet.archivedscheduling_set.annotate(archived=Value(True)).values_list('date_scheduling', 'id', 'archived'),
+            all=True,
+        )
+        .order_by('-date_scheduling', '-id')
+    )
+    page_obj = Paginator(keys, HISTORY_PAGE_SIZE).get_page(request.GET.get('page'))
+    loaded = {}
+    for archived, model in ((False, Scheduling), (True, ArchivedScheduling)):
+        ids = [pk for _, pk, is_archived in page_obj if is_archived == archived]
+        if ids:
+            for obj in model.objects.filter(pk__in=ids).prefetch_related('services'):
+                loaded[archived, obj.pk] = obj
+    page_obj.object_list = [loaded[bool(archived), pk] for _, pk, archived in page_obj]
+    template = 'pet_history.html' if is_fragment_request(request) else 'pet_history_page.html'
+    return render(request, template, {'pet': pet, 'page_obj': page_obj})
 
 # ==================================================================================== #
 # 3. Views de Tutores
 # ==================================================================================== #
 @method_decorator(login_required, name='dispatch')
-class TutorCreateView(CreateView):
+class TutorCreateView(BranchScopedMixin, CreateView):
     model = Tutor
-    fields = ['name', 'cpf', 'phone_number', 'email', 'address', 'state', 'city', 'know']
+    form_class = TutorForm
     template_name = 'tutor_form.html'
     success_url = reverse_lazy('tutor_list')
 
@@ -147,9 +293,9 @@ class TutorCreateView(CreateView):
         return super().dispatch(request, *args, **kwargs)
 
 @method_decorator(login_required, name='dispatch')
-class TutorUpdateView(UpdateView):
+class TutorUpdateView(BranchScopedMixin, UpdateView):
     model = Tutor
-    fields = ['name', 'cpf', 'phone_number', 'email', 'address', 'state', 'city', 'know']
+    form_class = TutorForm
     template_name = 'tutor_form.html'
     success_url = reverse_lazy('tutor_list')
 
@@ -160,7 +306,7 @@ class TutorUpdateView(UpdateView):
         return super().dispatch(request, *args, **kwargs)
 
 @method_decorator(login_required, name='dispatch')
-class TutorDeleteView(DeleteView):
+class TutorDeleteView(BranchScopedMixin, DeleteView):
     model = Tutor
     template_name = 'tutor_confirm_delete.html'
     success_url = reverse_lazy('tutor_list')
@@ -172,8 +318,15 @@ class TutorDeleteView(DeleteView):
             return redirect('tutor_list')
         return super().dispatch(request, *args, **kwargs)
 
+    def form_valid(self, form):
+        # Some da tela na hora; pets, agendamentos e notas são apagados em lotes pela fila de tarefas
+        self.object.soft_delete()
+        schedule_purge()
+        messages.success(self.request, f"Tutor {self.object.name} excluído.")
+        return redirect(self.get_success_url())
+
 @method_decorator(login_required, name='dispatch')
-class TutorListView(ListView):
+class TutorListView(BranchScopedMixin, ListView):
     model = Tutor
     template_name = 'tutor_list.html'
     context_object_name = 'tutor_list'
@@ -184,7 +337,10 @@ class TutorListView(ListView):
         queryset = super().get_queryset()
         query = self.request.GET.get('q')
         if query:
-            queryset = queryset.filter(name__icontains=query)
+            # CPF e telefone em qualquer formatação, pelas colunas só com dígitos (indexadas);
+            # qualquer outro texto busca pelo nome
+            contact = contact_condition(query)
+            queryset = queryset.filter(contact if contact is not None else Q(name__icontains=query))
         return queryset
 
     def get_context_data(self, **kwargs):
@@ -196,7 +352,7 @@ class TutorListView(ListView):
 # 4. Views de Agendamentos
 # ==================================================================================== #
 @method_decorator(login_required, name='dispatch')
-class SchedulingCreateView(CreateView):
+class SchedulingCreateView(BranchScopedMixin, CreateView):
     model = Scheduling
     form_class = SchedulingForm
     template_name = 'scheduling_form.html'
@@ -210,19 +366,16 @@ class SchedulingCreateView(CreateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        services = Service.objects.all().values('id', 'price')
-        context['services_json'] = json.dumps([{'id': s['id'], 'price': str(s['price'])} for s in services])
+        context['services_json'] = services_json(self.request)
         return context
 
     def form_valid(self, form):
-        self.object = form.save()
-        if hasattr(self.object, 'calculate_values'):
-            self.object.calculate_values()
-            self.object.save()
-        return super().form_valid(form)
+        response = super().form_valid(form)
+        Scheduling.objects.filter(pk=self.object.pk).reprice()
+        return response
 
 @method_decorator(login_required, name='dispatch')
-class SchedulingUpdateView(UpdateView):
+class SchedulingUpdateView(BranchScopedMixin, UpdateView):
     model = Scheduling
     form_class = SchedulingForm
     template_name = 'scheduling_form.html'
@@ -236,12 +389,16 @@ class SchedulingUpdateView(UpdateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        services = Service.objects.all().values('id', 'price')
-        context['services_json'] = json.dumps([{'id': s['id'], 'price': str(s['price'])} for s in services])
+        context['services_json'] = services_json(self.request)
         return context
 
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        Scheduling.objects.filter(pk=self.object.pk).reprice()
+        return response
+
 @method_decorator(login_required, name='dispatch')
-class SchedulingDeleteView(DeleteView):
+class SchedulingDeleteView(BranchScopedMixin, DeleteView):
     model = Scheduling
     template_name = 'scheduling_confirm_delete.html'
     success_url = reverse_lazy('scheduling_list')
@@ -254,7 +411,7 @@ class SchedulingDeleteView(DeleteView):
         return super().dispatch(request, *args, **kwargs)
 
 @method_decorator(login_required, name='dispatch')
-class SchedulingListView(ListView):
+class SchedulingListView(BranchScopedMixin, ListView):
     model = Scheduling
     template_name = 'scheduling_list.html'
     context_object_name = 'scheduling_list'
@@ -265,7 +422,8 @@ class SchedulingListView(ListView):
         query = self.request.GET.get('q')
         status = self.request.GET.get('status')
         if query:
-            queryset = queryset.filter(tutor__name__icontains=query)
+            contact = contact_condition(query, prefix='tutor__')
+            queryset = queryset.filter(contact if contact is not None else Q(tutor__name__icontains=query))
         if status in ['Sim', 'Não']:
             queryset = queryset.filter(status=status)
         return queryset
@@ -276,11 +434,33 @@ class SchedulingListView(ListView):
         context["selected_status"] = self.request.GET.get('status', '')
         return context
 
+@method_decorator(login_required, name='dispatch')
+class SchedulingSeriesCreateView(BranchScopedMixin, CreateView):
+    model = SchedulingSeries
+    form_class = SchedulingSeriesForm
+    template_name = 'scheduling_series_form.html'
+    success_url = reverse_lazy('scheduling_list')
+
+    def dispatch(self, request, *args, **kwargs):
+        if not has_model_permission(request.user, 'daycare.add_schedulingseries'):
+            messages.warning(request, "Você não tem permissão para criar agendamentos recorrentes.")
+            return redirect('scheduling_list')
+        return super().dispatch(request, *args, **kwargs)
+
+    def form_valid(self, form):
+        self.object = form.save()
+        created = self.object.expand()
+        messages.success(
+            self.request,
+            f"Recorrência criada com {created} agendamento(s) até {self.object.expanded_until:%d/%m/%Y}.",
+        )
+        return redirect(self.get_success_url())
+
 # ==================================================================================== #
 # 5. Views de Serviços
 # ==================================================================================== #
 @method_decorator(login_required, name='dispatch')
-class ServiceCreateView(CreateView):
+class ServiceCreateView(BranchScopedMixin, CreateView):
     model = Service
     fields = ['name', 'description', 'price']
     template_name = 'service_form.html'
@@ -293,7 +473,7 @@ class ServiceCreateView(CreateView):
         return super().dispatch(request, *args, **kwargs)
 
 @method_decorator(login_required, name='dispatch')
-class ServiceUpdateView(UpdateView):
+class ServiceUpdateView(BranchScopedMixin, UpdateView):
     model = Service
     fields = ['name', 'description', 'price']
     template_name = 'service_form.html'
@@ -306,7 +486,7 @@ class ServiceUpdateView(UpdateView):
         return super().dispatch(request, *args, **kwargs)
 
 @method_decorator(login_required, name='dispatch')
-class ServiceDeleteView(DeleteView):
+class ServiceDeleteView(BranchScopedMixin, DeleteView):
     model = Service
     template_name = 'service_confirm_delete.html'
     success_url = reverse_lazy('service_list')
@@ -319,7 +499,7 @@ class ServiceDeleteView(DeleteView):
         return super().dispatch(request, *args, **kwargs)
 
 @method_decorator(login_required, name='dispatch')
-class ServiceListView(ListView):
+class ServiceListView(BranchScopedMixin, ListView):
     model = Service
     template_name = 'service_list.html'
     context_object_name = 'service_list'
@@ -343,7 +523,7 @@ class ServiceListView(ListView):
 # ==================================================================================== #
 @login_required(login_url='login')
 def generate_note_view(request, pk):
-    scheduling = get_object_or_404(Scheduling, pk=pk)
+    scheduling = get_object_or_404(Scheduling.objects.for_branch(current_branch(request)), pk=pk)
     if not has_model_permission(request.user, 'daycare.add_note'):
         messages.warning(request, "Você não tem permissão para gerar notas.")
         return redirect('scheduling_list')
@@ -353,16 +533,92 @@ def generate_note_view(request, pk):
     if scheduling.status != 'Sim':
         messages.warning(request, f"Não é possível emitir a nota. O Agendamento {pk} está com pagamento pendente.")
         return redirect('scheduling_list')
-    new_note = Note.objects.create(scheduling=scheduling)
-    messages.success(request, f"Nota de Serviço Nº {new_note.note_number} gerada com sucesso!")
+    new_note, created = Note.objects.issue(scheduling)
+    if not created:
+        messages.warning(request, f"A Nota de Serviço para o Agendamento {pk} já foi emitida.")
+        return redirect('scheduling_list')
+    messages.success(request, f"Nota de Serviço Nº {new_note.branch_number} gerada com sucesso!")
     return redirect('note_detail', pk=new_note.pk)
 
+def parse_date_param(value, default):
+    """Data AAAA-MM-DD de um parâmetro da requisição; `default` se vazio. ValueError se inválida."""
+    if not value:
+        return default
+    parsed = parse_date(value)
+    if parsed is None:
+        raise ValueError(value)
+    return parsed
+
+@require_POST
+@login_required(login_url='login')
+def issue_notes_view(request):
+    if not has_model_permission(request.user, 'daycare.add_note'):
+        return JsonResponse({'error': 'Você não tem permissão para gerar notas.'}, status=403)
+    try:
+        start = parse_date_param(request.POST.get('start'), date.today())
+        end = parse_date_param(request.POST.get('end'), start)
+    except ValueError:
+        return JsonResponse({'error': 'Data inválida. Use o formato AAAA-MM-DD.'}, status=400)
+    if start > end:
+        return JsonResponse({'error': 'A data inicial deve ser anterior ou igual à data final.'}, status=400)
+
+    notes = (
+        Scheduling.objects.for_branch(current_branch(request))
+        .filter(date_scheduling__range=(start, end))
+        .issue_notes()
+    )
+    return JsonResponse({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'count': len(notes),
+        'notes': Note.branch_numbers(notes),
+    })
+
+# Nota emitida não muda: o navegador pode guardar a versão de impressão (sem formulários nem
+# mensagens) por muito tempo e, depois disso, revalidar pela data de emissão. A página da nota
+# tem o menu do base.html e é revalidada a cada acesso.
+NOTE_MAX_AGE = 60 * 60 * 24 * 30
+
+def note_last_modified(request, pk):
+    # ETag e Last-Modified saem da mesma consulta, guardada na requisição
+    if not hasattr(request, '_note_issue_date'):
+        branch = current_branch(request)
+        request._note_issue_date = (
+            Note.objects.for_branch(branch).filter(pk=pk).values_list('issue_date', flat=True).first()
+            or ArchivedNote.objects.for_branch(branch).filter(pk=pk).values_list('issue_date', flat=True).first()
+        )
+    return request._note_issue_date
+
+def note_etag(request, pk):
+    issue_date = note_last_modified(request, pk)
+    if issue_date is None:
+        return None
+    return f'note-{pk}-{int(issue_date.timestamp())}-u{request.user.pk}'
+
+def note_page_etag(request, pk):
+    return page_etag(request, note_etag(request, pk))
+
+def find_note(request, pk):
+    """Nota da filial do usuário, procurando também entre as notas arquivadas."""
+    branch = current_branch(request)
+    note = Note.objects.for_branch(branch).filter(pk=pk).first()
+    if note is None:
+        note = ArchivedNote.objects.for_branch(branch).filter(pk=pk).first()
+    if note is None:
+        raise Http404("Nota não encontrada.")
+    return note
+
 @method_decorator(login_required, name='dispatch')
-class NoteDetailView(DetailView):
+@method_decorator(cache_control(private=True, no_cache=True), name='dispatch')
+@method_decorator(condition(etag_func=note_page_etag), name='dispatch')
+class NoteDetailView(BranchScopedMixin, DetailView):
     model = Note
     template_name = 'note_detail.html'
     context_object_name = 'note'
 
+    def get_object(self, queryset=None):
+        return find_note(self.request, self.kwargs['pk'])
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         note = context['note']
@@ -371,13 +627,136 @@ class NoteDetailView(DetailView):
         return context
 
 @login_required(login_url='login')
+@cache_control(private=True, max_age=NOTE_MAX_AGE)
+@condition(etag_func=note_etag, last_modified_func=note_last_modified)
 def note_print_view(request, pk):
-    note = get_object_or_404(Note, pk=pk)
+    note = find_note(request, pk)
     discount_amount = note.scheduling.gross_total_value - note.scheduling.total_value
     return render(request, 'note_print.html', {'note': note, 'discount_amount': discount_amount})
 
+@require_GET
+@login_required(login_url='login')
+def notes_export_view(request):
+    """Notas emitidas no período em PDF único (format=pdf) ou ZIP com um PDF por nota (format=zip)."""
+    if not has_model_permission(request.user, 'daycare.view_note'):
+        return JsonResponse({'error': 'Você não tem permissão para exportar notas.'}, status=403)
+    try:
+        start = parse_date_param(request.GET.get('start'), date.today().replace(day=1))
+        end = parse_date_param(request.GET.get('end'), date.today())
+    except ValueError:
+        return JsonResponse({'error': 'Data inválida. Use o formato AAAA-MM-DD.'}, status=400)
+    if start > end:
+        return JsonResponse({'error': 'A data inicial deve ser anterior ou igual à data final.'}, status=400)
+    output = request.GET.get('format', 'pdf')
+    if output not in ('pdf', 'zip'):
+        return JsonResponse({'error': 'Formato inválido. Use pdf ou zip.'}, status=400)
+
+    # Fora da inicialização do servidor, como jobs e forecast (numpy)
+    from . import note_pdfs
+    notes = note_pdfs.notes_in_period(start, end, current_branch(request))
+    # Em série: um pool de processos criado dentro do servidor (com threads) não é seguro.
+    # Fechamentos grandes usam o comando export_notes, que renderiza em paralelo
+    rendered, _ = note_pdfs.render_notes(notes, workers=1)
+    target = tempfile.TemporaryFile()
+    if output == 'zip':
+        note_pdfs.write_zip(target, notes, rendered)
+    else:
+        note_pdfs.write_merged(target, rendered)
+    target.seek(0)
+    filename = f'notas-{start.isoformat()}-{end.isoformat()}.{output}'
+    return FileResponse(target, as_attachment=True, filename=filename)
+
+# ==================================================================================== #
+# 7. Busca Incremental (typeahead)
+# ==================================================================================== #
+LOOKUP_LIMIT = 20
+LOOKUP_MIN_LENGTH = 2
+
+@login_required(login_url='login')
+def tutor_lookup_view(request):
+    query = request.GET.get('q', '').strip()
+    if len(query) < LOOKUP_MIN_LENGTH:
+        return JsonResponse({'results': []})
+
+    # name é um NameField (NOCASE no SQLite), então o istartswith é resolvido pelo índice
+    contact = contact_condition(query)
+    condition = contact if contact is not None else Q(name__istartswith=query)
+
+    tutors = Tutor.objects.for_branch(current_branch(request)).filter(condition).order_by('name').values('id', 'name', 'cpf')[:LOOKUP_LIMIT]
+    results = [{'id': t['id'], 'text': f"{t['name']} ({t['cpf']})"} for t in tutors]
+    return JsonResponse({'results': results})
+
+# ==================================================================================== #
+# 8. Feed de Alterações (sincronização incremental)
+# ==================================================================================== #
+@require_GET
+@gzip_page
+@login_required(login_url='login')
+def changes_feed_view(request):
+    if not has_model_permission(request.user, 'daycare.view_changelog'):
+        return JsonResponse({'error': 'Você não tem permissão para ler o feed de alterações.'}, status=403)
+    try:
+        since = int(request.GET.get('since', 0))
+        limit = int(request.GET.get('limit', FEED_LIMIT))
+    except ValueError:
+        return JsonResponse({'error': 'Os parâmetros since e limit devem ser inteiros.'}, status=400)
+
+    changes, next_cursor, has_more = read_changes(since, limit)
+    data = {
+        'fields': ['sequence', 'model', 'pk', 'action', 'payload', 'changed_at'],
+        'changes': changes,
+        'next': next_cursor,
+        'has_more': has_more,
+    }
+    return JsonResponse(data, json_dumps_params={'separators': (',', ':'), 'ensure_ascii': False})
+
+# ==================================================================================== #
+# 9. Tarefas em Segundo Plano
+# ==================================================================================== #
+def job_as_dict(job):
+    return {
+        'id': job.pk,
+        'name': job.name,
+        'status': job.status,
+        'progress': job.progress,
+        'attempts': job.attempts,
+        'result': job.result,
+        'error': job.error.strip().splitlines()[-1] if job.error else None,
+        'created_at': job.created_at.isoformat(),
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+@require_POST
+@login_required(login_url='login')
+def job_enqueue_view(request):
+    # Importado sob demanda: o registro de tarefas (e o envio de email) fica fora da inicialização
+    from . import jobs
+    handler = jobs.registry.get(request.POST.get('name'))
+    if handler is None:
+        return JsonResponse({'error': 'Tarefa desconhecida.'}, status=400)
+    if not has_model_permission(request.user, handler.permission):
+        return JsonResponse({'error': 'Você não tem permissão para executar esta tarefa.'}, status=403)
+    try:
+        kwargs = json.loads(request.POST.get('kwargs') or '{}')
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Os parâmetros da tarefa devem ser um objeto JSON.'}, status=400)
+    if not isinstance(kwargs, dict):
+        return JsonResponse({'error': 'Os parâmetros da tarefa devem ser um objeto JSON.'}, status=400)
+
+    job = jobs.enqueue(handler.task_name, **kwargs)
+    return JsonResponse(job_as_dict(job), status=202, headers={'Location': reverse('job_status', args=[job.pk])})
+
+@require_GET
+@login_required(login_url='login')
+def job_status_view(request, pk):
+    if not has_model_permission(request.user, 'daycare.view_job'):
+        return JsonResponse({'error': 'Você não tem permissão para consultar tarefas.'}, status=403)
+    job = get_object_or_404(Job, pk=pk)
+    return JsonResponse(job_as_dict(job))
+
 # ==================================================================================== #
-# 7. Links do Footer
+# 10. Links do Footer
 # ==================================================================================== #
 
 def politica_privacidade(request):